@@ -10,6 +10,17 @@ Usage:
     python build.py --runtime-lib MT             # Windows runtime library
     python build.py --library zlib               # Build single library with deps
     python build.py --library zlib --no-deps     # Build single library only
+    python build.py --library zlib --rebuild     # Uninstall and rebuild one library
+    python build.py --library zlib --rebuild --dependents  # ... and affected dependents
+    python build.py --jobs 8                     # Build up to 8 libraries at once
+    python build.py --force                      # Rebuild even up-to-date libraries
+    python build.py --keep-going                 # Build everything a failure doesn't block
+    python build.py --compiler-cache ccache      # Compile through ccache/sccache
+    python build.py --no-cache                   # Don't restore/store the artifact cache
+    python build.py --remote-cache URL           # Share built libraries over HTTP
+    python build.py --trace build.trace.json     # Chrome/Perfetto timeline of the run
+    python build.py --analyze --jobs 8           # Critical path from previous timings
+    python build.py --history                    # Build history and regressions
     python build.py --list                       # List available libraries
     python build.py --clean                      # Clean build and output directories
 """
@@ -19,19 +30,23 @@ import shutil
 import subprocess
 import sys
 from pathlib import Path
-
-from builder.config import BuildConfig, Library, LibraryRegistry
-from builder.cmake_builder import CMakeBuilder
-from builder.autotools_builder import AutotoolsBuilder
-from builder.meson_builder import MesonBuilder
-from builder.msys2_builder import Msys2Builder
-from builder.platforms import get_platform
-from builder.tools_check import (
-    check_required_tools,
-    check_tool_versions,
-    report_missing_tools,
-    report_tool_version_errors,
+from typing import TYPE_CHECKING
+
+from builder.compiler_cache import TOOLS as COMPILER_CACHE_TOOLS
+from builder.config import (
+    CEF_CHECKOUT_DIRNAME,
+    REGISTRY_INDEX_FILENAME,
+    BuildConfig,
+    Library,
+    LibraryRegistry,
 )
+from builder.platforms import get_platform
+
+# The modules that build are imported by main() once it is past the
+# informational modes: --list, --dry-run and --clean start without them.
+if TYPE_CHECKING:
+    from builder.history import BuildHistory
+    from builder.timing import BuildTimings
 
 
 def parse_args() -> argparse.Namespace:
@@ -81,12 +96,128 @@ def parse_args() -> argparse.Namespace:
         help="Don't build dependencies when using --library",
     )
 
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="With --library: remove the files the library installed (from its "
+        "install manifest) and build it again, even if it is up to date",
+    )
+
+    parser.add_argument(
+        "--dependents",
+        action="store_true",
+        help="With --rebuild: also rebuild the libraries depending on it whose "
+        "fingerprint changed as a result",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Build up to N libraries concurrently, each as soon as its "
+        "dependencies are installed. With N > 1, every make/ninja/meson "
+        "process shares one jobserver pool of N job slots (default: 1)",
+    )
+
+    parser.add_argument(
+        "--link-jobs",
+        type=int,
+        metavar="N",
+        help="Limit concurrent link steps within each library's Ninja build "
+        "(link steps are the memory peak of large C++ projects)",
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild every selected library even if its input fingerprint "
+        "matches the one stored with the install",
+    )
+
+    parser.add_argument(
+        "-k",
+        "--keep-going",
+        action="store_true",
+        help="After a library fails, skip only the libraries depending on it "
+        "and keep building all the others",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        metavar="PATH",
+        help="Artifact cache of built libraries, keyed by input fingerprint "
+        "(default: $EXT_DEPS_CACHE_DIR, else $XDG_CACHE_HOME/ext-deps, "
+        "else ~/.cache/ext-deps)",
+    )
+
+    parser.add_argument(
+        "--remote-cache",
+        metavar="URL",
+        help="HTTP artifact cache shared between machines: archives missing "
+        "locally are fetched with GET, built ones are uploaded with PUT. "
+        "Checkouts at different paths share archives; the install prefix is "
+        "relocated on restore (default: $EXT_DEPS_REMOTE_CACHE; see cache_server.py)",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Neither restore libraries from nor store them in the artifact cache",
+    )
+
+    parser.add_argument(
+        "--compiler-cache",
+        choices=["auto", *COMPILER_CACHE_TOOLS],
+        help="Run compilers through ccache or sccache ('auto': the first one "
+        "installed). Not available for MSBuild-driven builds (Visual Studio "
+        "generator, libvpx on Windows)",
+    )
+
+    parser.add_argument(
+        "--compiler-cache-dir",
+        metavar="PATH",
+        help="Cache directory for --compiler-cache (default: the tool's own, "
+        "e.g. $CCACHE_DIR or ~/.cache/ccache)",
+    )
+
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Write a Chrome trace of the run (open in chrome://tracing or "
+        "https://ui.perfetto.dev), one row per parallel lane",
+    )
+
     parser.add_argument(
         "--list",
         action="store_true",
         help="List available libraries and exit",
     )
 
+    parser.add_argument(
+        "--analyze",
+        action="store_true",
+        help="Report the critical path, per-library slack and the best "
+        "possible wall-clock time from previous runs' timings, then exit",
+    )
+
+    parser.add_argument(
+        "--history",
+        action="store_true",
+        help="Report recorded build times and sizes per library, flagging "
+        "regressions, then exit",
+    )
+
+    parser.add_argument(
+        "--regression-threshold",
+        type=float,
+        default=25.0,
+        metavar="PERCENT",
+        help="Flag libraries whose latest build time or output size exceeds "
+        "the median of their previous builds by more than this (default: 25)",
+    )
+
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -133,8 +264,6 @@ def clean_directories(root_dir: Path) -> None:
     - Empties each subdirectory in output/ but keeps the directories themselves
       (symlinks may be attached to them)
     """
-    from build_cef import CEF_CHECKOUT_DIRNAME
-
     print(f"\n{'=' * 60}")
     print("Cleaning build directories")
     print(f"{'=' * 60}\n")
@@ -172,18 +301,48 @@ def clean_directories(root_dir: Path) -> None:
     else:
         print(f"\nNot found: {output_dir}")
 
-    # Reset validated libs cache (Windows)
-    try:
-        from builder.platforms.windows import WindowsPlatform
-        WindowsPlatform._validated_libs.clear()
-    except ImportError:
-        pass
-
     print(f"\n{'=' * 60}")
     print("Clean completed!")
     print(f"{'=' * 60}\n")
 
 
+def report_timings(timings: "BuildTimings", config: BuildConfig, trace: str | None) -> None:
+    """Print the per-library timing table and save the timings (and trace)."""
+    from builder.timing import TIMINGS_FILENAME, update_durations
+
+    timings.print_summary()
+    timings_path = config.builds_dir / TIMINGS_FILENAME
+    timings.write_json(timings_path)
+    update_durations(config.builds_dir, timings)
+    print(f"Timings written to {timings_path}")
+    if trace:
+        trace_path = Path(trace).expanduser().resolve()
+        timings.write_chrome_trace(trace_path)
+        print(f"Trace written to {trace_path}")
+
+
+def record_history(
+    history: "BuildHistory",
+    config: BuildConfig,
+    libraries: list[Library],
+    timings: "BuildTimings",
+    jobs: int,
+    success: bool,
+    threshold: float,
+) -> None:
+    """Append the run to the history database and report regressions it shows."""
+    import sqlite3
+
+    from builder.history import print_regressions
+
+    try:
+        history.record_run(config, libraries, timings, jobs, success)
+        built = list(timings.built_durations())
+        print_regressions(history.regressions(config.build_suffix, built, threshold), threshold)
+    except sqlite3.Error as e:
+        print(f"Warning: Could not update build history {history.path}: {e}", file=sys.stderr)
+
+
 def run_dependencies_test(config: BuildConfig, root_dir: Path) -> int:
     """Configure, build and run the DependenciesTest executable.
 
@@ -280,6 +439,7 @@ def main() -> int:
         macos_sdk=args.macos_sdk,
         runtime_lib=args.runtime_lib,
         root_dir=root_dir,
+        link_jobs=args.link_jobs,
     )
 
     # Get platform handler
@@ -291,6 +451,12 @@ def main() -> int:
 
     # Validate configuration
     errors = config.validate()
+    if args.jobs < 1:
+        errors.append(f"Invalid --jobs {args.jobs}. Must be 1 or more.")
+    if args.rebuild and not args.library:
+        errors.append("--rebuild requires --library.")
+    if args.dependents and not args.rebuild:
+        errors.append("--dependents requires --rebuild.")
     if errors:
         for error in errors:
             print(f"Error: {error}", file=sys.stderr)
@@ -298,7 +464,9 @@ def main() -> int:
 
     # Load library registry
     libraries_dir = root_dir / "libraries"
-    registry = LibraryRegistry(libraries_dir)
+    registry = LibraryRegistry(
+        libraries_dir, index_path=root_dir / "builds" / REGISTRY_INDEX_FILENAME
+    )
 
     # List mode
     if args.list:
@@ -326,6 +494,23 @@ def main() -> int:
             if not libraries:
                 print(f"Error: Unknown library '{args.library}'", file=sys.stderr)
                 return 1
+        if args.dependents:
+            # Their fingerprints include the rebuilt library's, so the ones
+            # it actually affects are rebuilt and the others stay up to date.
+            wanted = {lib.name for lib in libraries}
+            for dependent in registry.get_dependents(args.library, config.platform_name):
+                wanted.add(dependent.name)
+                if not args.no_deps:
+                    wanted.update(
+                        lib.name
+                        for lib in registry.get_with_dependencies(
+                            dependent.name, config.platform_name
+                        )
+                    )
+            libraries = [
+                lib for lib in registry.get_build_order(config.platform_name)
+                if lib.name in wanted
+            ]
     else:
         libraries = registry.get_build_order(config.platform_name)
 
@@ -342,10 +527,50 @@ def main() -> int:
         print(f"  - {lib.name}")
     print()
 
-    if args.dry_run:
+    if args.dry_run and not (args.analyze or args.history):
         print("Dry run - no builds performed.")
         return 0
 
+    # Critical-path analysis of the selected set from recorded build times.
+    from builder.critical_path import CriticalPathAnalysis
+    from builder.timing import DURATIONS_FILENAME, load_durations
+
+    durations = load_durations(config.builds_dir)
+    analysis = CriticalPathAnalysis(libraries, durations)
+    if args.analyze:
+        analysis.print_report(args.jobs, str(config.builds_dir / DURATIONS_FILENAME))
+        return 0
+
+    from builder.artifact_cache import (
+        HttpArtifactCache,
+        LocalArtifactCache,
+        resolve_cache_dir,
+        resolve_remote_cache,
+    )
+    from builder.compiler_cache import find_compiler_cache, use_compiler_cache
+    from builder.fingerprint import Fingerprinter
+    from builder.history import HISTORY_FILENAME, BuildHistory
+    from builder.jobserver import start_jobserver
+    from builder.manifest import remove_installed
+    from builder.scheduler import BuildScheduler
+    from builder.timing import record_timings
+    from builder.toolprobe import PROBE_CACHE_FILENAME, enable_disk_cache
+    from builder.tools_check import (
+        check_required_tools,
+        check_tool_versions,
+        report_missing_tools,
+        report_tool_version_errors,
+    )
+
+    history = BuildHistory(resolve_cache_dir(args.cache_dir) / HISTORY_FILENAME)
+    threshold = args.regression_threshold / 100
+    if args.history:
+        history.print_report(config.build_suffix, [lib.name for lib in libraries], threshold)
+        return 0
+
+    # Compiler versions, vswhere and vcvarsall results are kept across runs.
+    enable_disk_cache(resolve_cache_dir(args.cache_dir) / PROBE_CACHE_FILENAME)
+
     # Verify required build tools are installed
     missing_tools = check_required_tools(config.platform_name)
     if missing_tools:
@@ -357,43 +582,113 @@ def main() -> int:
         report_tool_version_errors(version_errors)
         return 1
 
-    # Build libraries
-    cmake_builder = CMakeBuilder(config, platform)
-    autotools_builder = AutotoolsBuilder(config, platform)
-    meson_builder = MesonBuilder(config, platform)
-    msys2_builder = Msys2Builder(config, platform)
-    failed = []
-
-    for lib in libraries:
-        # Select the appropriate builder (can be platform-specific)
-        build_system = lib.get_build_system(config.platform_name)
-        if build_system == "autotools":
-            builder = autotools_builder
-        elif build_system == "meson":
-            builder = meson_builder
-        elif build_system == "msys2":
-            builder = msys2_builder
+    compiler_cache = None
+    if args.compiler_cache:
+        compiler_cache = find_compiler_cache(args.compiler_cache, args.compiler_cache_dir)
+        if compiler_cache is None:
+            wanted = " or ".join(COMPILER_CACHE_TOOLS) if args.compiler_cache == "auto" else args.compiler_cache
+            print(f"Error: --compiler-cache: {wanted} not found in PATH", file=sys.stderr)
+            return 1
+        print(f"Compiler cache: {compiler_cache.executable}")
+        if config.platform_name == "windows":
+            print("  (CMake libraries use the Visual Studio generator and build uncached)")
+
+    # Build libraries. Libraries whose input fingerprint matches the one
+    # stored with their install are skipped, and those with an archive in the
+    # artifact cache are restored from it. The scheduler stops launching new
+    # libraries on the first failure (builds already running in parallel are
+    # allowed to finish).
+    fingerprints = Fingerprinter(config, platform, registry)
+
+    # --rebuild: take exactly the library's own files out of the install
+    # before building it again; everything else in output/ stays.
+    if args.rebuild:
+        target = registry.get(args.library)
+        result = remove_installed(config.output_dir, target.name)
+        if result is None:
+            print(
+                f"No install manifest for '{target.name}'; its installed files are "
+                "left in place and overwritten by the rebuild."
+            )
         else:
-            builder = cmake_builder
-
-        if not builder.build(lib):
-            failed.append(lib.name)
-            print(f"\nError: Failed to build '{lib.name}'", file=sys.stderr)
-            break  # Stop on first failure
-
-    if failed:
-        print(f"\nBuild failed for: {', '.join(failed)}", file=sys.stderr)
+            removed, kept = result
+            print(f"Removed {len(removed)} files installed by '{target.name}'")
+            for rel in kept:
+                print(f"  Kept {rel} (replaced since, or installed by another library too)")
+        fingerprints.invalidate(target)
+
+    cache = None
+    if not args.no_cache:
+        remote_url = resolve_remote_cache(args.remote_cache)
+        remote = HttpArtifactCache(remote_url) if remote_url else None
+        cache = LocalArtifactCache(resolve_cache_dir(args.cache_dir), remote)
+    scheduler = BuildScheduler(
+        config,
+        platform,
+        libraries,
+        jobs=args.jobs,
+        fingerprints=fingerprints,
+        force=args.force,
+        cache=cache,
+        # Without any recorded timing every bottom level would be an equal
+        # guess; keep the hand-maintained order then.
+        priorities=analysis.priorities if durations else None,
+        keep_going=args.keep_going,
+        rebuild=[args.library] if args.rebuild else (),
+    )
+    try:
+        with (
+            record_timings() as timings,
+            start_jobserver(args.jobs),
+            use_compiler_cache(compiler_cache, root_dir),
+        ):
+            success = scheduler.run()
+    finally:
+        # Uploads run in the background during the build; let them finish
+        # so the next agent finds these archives.
+        if cache is not None:
+            cache.close()
+    report_timings(timings, config, args.trace)
+    record_history(history, config, libraries, timings, args.jobs, success, threshold)
+    if not success:
+        if scheduler.failed:
+            print(f"\nBuild failed for: {', '.join(scheduler.failed)}", file=sys.stderr)
+        if scheduler.skipped:
+            print("Skipped because a dependency failed:", file=sys.stderr)
+            for name, failed_dep in scheduler.skipped.items():
+                print(f"  - {name} (needs {failed_dep})", file=sys.stderr)
+        if scheduler.not_built:
+            print(f"Not built: {', '.join(scheduler.not_built)}", file=sys.stderr)
+        if args.keep_going:
+            print(
+                f"{len(scheduler.succeeded) + len(scheduler.up_to_date)} of "
+                f"{len(libraries)} libraries are built and up to date.",
+                file=sys.stderr,
+            )
         return 1
 
     print(f"\n{'=' * 60}")
     print("All builds completed successfully!")
+    if scheduler.up_to_date or scheduler.restored:
+        print(
+            f"  {len(scheduler.succeeded) - len(scheduler.restored)} built, "
+            f"{len(scheduler.restored)} restored from cache, "
+            f"{len(scheduler.up_to_date)} already up to date"
+        )
     print(f"{'=' * 60}\n")
 
     # Final validation: only when we built the full set. A targeted build
     # (--library X) is for iterating on a single lib; the test binary links
     # against every library and only makes sense once everything is present.
+    # It is skipped when it already passed against these exact libraries.
     if not args.library:
-        return run_dependencies_test(config, root_dir)
+        if not args.force and fingerprints.test_passed(libraries):
+            print("Dependencies test already passed for this set of libraries, skipping.")
+            return 0
+        rc = run_dependencies_test(config, root_dir)
+        if rc == 0:
+            fingerprints.record_test(libraries)
+        return rc
 
     return 0
 
@@ -72,7 +72,7 @@ import sys
 import tarfile
 from pathlib import Path
 
-from builder.config import BuildConfig
+from builder.config import CEF_CHECKOUT_DIRNAME, BuildConfig
 
 
 # ---------------------------------------------------------------------------
@@ -106,9 +106,9 @@ DEPOT_TOOLS_URL = "https://chromium.googlesource.com/chromium/tools/depot_tools.
 # repo keeps it invisible to git (no .gitignore entry needed) and to IDEs that would
 # otherwise try to index the giant tree (CLion), and puts it out of reach of
 # `build.py --clean` (which only touches paths inside the repo) without special-casing.
-# build.py still imports this name to preserve any legacy in-repo checkout under
-# builds/. Overridable via --download-dir / $CEF_DOWNLOAD_DIR.
-CEF_CHECKOUT_DIRNAME = "cef-chromium"
+# The name (CEF_CHECKOUT_DIRNAME) lives in builder.config so that build.py --clean can
+# preserve a legacy in-repo checkout under builds/ without importing this script.
+# Overridable via --download-dir / $CEF_DOWNLOAD_DIR.
 
 
 # ---------------------------------------------------------------------------
@@ -1,15 +1,27 @@
 """
 Unified build system for external dependencies.
+
+The names below are imported on first access: `build.py --list` and
+`--dry-run` only need the configuration, not the builders.
 """
 
-from .config import BuildConfig, Library, LibraryRegistry
-from .cmake_builder import CMakeBuilder
-from .autotools_builder import AutotoolsBuilder
-
-__all__ = [
-    "BuildConfig",
-    "Library",
-    "LibraryRegistry",
-    "CMakeBuilder",
-    "AutotoolsBuilder",
-]
+from importlib import import_module
+
+_EXPORTS = {
+    "BuildConfig": ".config",
+    "Library": ".config",
+    "LibraryRegistry": ".config",
+    "CMakeBuilder": ".cmake_builder",
+    "AutotoolsBuilder": ".autotools_builder",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,116 @@
+"""
+Members of `ar` archives (Unix .a, MSVC .lib), read through a memory map.
+
+Every variant uses the same 60-byte member header; they differ in where long
+member names go:
+
+- System V / GNU and MSVC keep them in a "//" member and name the member
+  "/<offset>" (GNU ends each name with "/\\n", MSVC with a NUL);
+- BSD (macOS) names the member "#1/<length>" and stores the name at the
+  start of the member data, counted in the member size.
+
+Thin archives ("!<thin>\\n", `ar --thin`) store only the member headers and
+the index tables. builder.coff, builder.macho and the object counts of the
+build history all walk archives with `iter_members`.
+"""
+
+import mmap
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+AR_MAGIC = b"!<arch>\n"
+THIN_MAGIC = b"!<thin>\n"
+HEADER_SIZE = 60
+
+
+class ArchiveFormatError(ValueError):
+    """The file is not an ar archive, or its member headers are corrupt."""
+
+
+@dataclass
+class Member:
+    """One archive member; its data is data[start:end]."""
+
+    name: str
+    start: int
+    end: int
+    # The symbol tables ("/", "/SYM64/", "__.SYMDEF", MSVC's "/<ECSYMBOLS>/")
+    # and the long-name table ("//") rather than an object.
+    index: bool
+
+
+def _long_name(long_names: bytes, offset: int) -> str:
+    end = long_names.find(b"\0", offset)
+    if end == -1:
+        end = long_names.find(b"/\n", offset)
+    return long_names[offset:end if end != -1 else None].decode("utf-8", "replace")
+
+
+def iter_members(
+    data: Union[bytes, mmap.mmap], start: int = 0, end: Optional[int] = None, name: str = ""
+) -> Iterator[Member]:
+    """Members of the archive at data[start:end] (magic included), in order.
+
+    Raises ArchiveFormatError when there is no archive magic or a member
+    header is corrupt; `name` prefixes the message.
+    """
+    if end is None:
+        end = len(data)
+    magic = data[start:start + len(AR_MAGIC)]
+    if magic not in (AR_MAGIC, THIN_MAGIC):
+        raise ArchiveFormatError(f"{name}: not an ar archive")
+    thin = magic == THIN_MAGIC
+    long_names = b""
+    offset = start + len(AR_MAGIC)
+    while offset + HEADER_SIZE <= end:
+        header = data[offset:offset + HEADER_SIZE]
+        if header[58:60] != b"`\n":
+            raise ArchiveFormatError(f"{name}: corrupt member header at {offset - start}")
+        try:
+            size = int(header[48:58].decode("ascii"))
+        except ValueError:
+            raise ArchiveFormatError(f"{name}: corrupt member size at {offset - start}") from None
+        raw_name = header[:16].rstrip()
+        member = offset + HEADER_SIZE
+        name_length = 0
+        if raw_name.startswith(b"#1/") and raw_name[3:].isdigit() and not thin:
+            # BSD symbol tables ("__.SYMDEF SORTED") have long names too.
+            name_length = int(raw_name[3:])
+            raw_name = data[member:member + name_length].rstrip(b"\0")
+        index = raw_name.startswith(b"__.SYMDEF") or (
+            raw_name.startswith(b"/") and not raw_name[1:2].isdigit()
+        )
+        # Objects of a thin archive are files of their own.
+        stored = size if index or not thin else 0
+        member_end = min(member + stored, end)
+        member = min(member + name_length, member_end)
+
+        if raw_name == b"//":
+            long_names = data[member:member_end]
+        if name_length or index:
+            member_name = raw_name.decode("utf-8", "replace")
+        elif raw_name[:1] == b"/" and raw_name[1:].isdigit() and long_names:
+            member_name = _long_name(long_names, int(raw_name[1:]))
+        else:
+            member_name = raw_name.decode("latin-1").rstrip("/")
+        yield Member(member_name, member, member_end, index)
+
+        offset += HEADER_SIZE + stored + (stored & 1)
+
+
+def count_objects(path: Path) -> Optional[int]:
+    """Number of object members of the archive at `path`, or None if not an archive.
+
+    Only the member headers are read. Import libraries count their short
+    import members like objects.
+    """
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < len(AR_MAGIC):
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return sum(not member.index for member in iter_members(data, name=path.name))
+    except (OSError, ArchiveFormatError):
+        return None
@@ -0,0 +1,322 @@
+"""
+Cache of built libraries, keyed by input fingerprint.
+
+After a library builds, the files it installed into `output/<suffix>` are
+packed into `<cache dir>/<library>/<fingerprint>.tar.gz`. When a later build
+computes the same fingerprint (switching back to a previous configuration,
+a fresh clone of the same revision, another `build_suffix` tree on the same
+host), the archive is unpacked into the install directory instead of
+rebuilding the library.
+
+Installed CMake, pkg-config and libtool files embed the absolute install
+prefix. Text files that contain it are stored with a placeholder instead and
+get the prefix of the restoring checkout back on extraction, so archives are
+shared between checkouts at different paths (the fingerprint only names the
+prefix relative to the checkout). Binary files are stored unchanged: the
+prefix they may hold is the debug-info path of headers.
+
+A remote backend can sit behind the local directory: a local miss is looked
+up with `GET <url>/<library>/<fingerprint>.tar.gz` (streamed into the local
+cache), and every archive stored locally is uploaded with `PUT` to the same
+path on a background thread. Any server that stores PUT bodies and serves
+them back on GET works (nginx WebDAV, a Bazel HTTP cache, S3 presigned
+proxies, or the bundled `cache_server.py`).
+"""
+
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import urllib.error
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+# A good balance for object archives: level 9 costs several times the CPU
+# for a few percent of size.
+_COMPRESSLEVEL = 6
+
+_PREFIX_PLACEHOLDER = b"@EXT_DEPS_INSTALL_PREFIX@"
+_NATIVE_PREFIX_PLACEHOLDER = b"@EXT_DEPS_INSTALL_PREFIX_NATIVE@"
+# Marks the archive members that hold placeholders.
+_RELOCATE_PAX_KEY = "EXT_DEPS.relocate"
+# A NUL byte in the first block means a binary file.
+_TEXT_PROBE_SIZE = 8192
+
+
+def _prefix_forms(prefix: Path) -> list[tuple[bytes, bytes]]:
+    """(placeholder, prefix as written in files), native form first on Windows."""
+    forms = [(_PREFIX_PLACEHOLDER, prefix.as_posix().encode("utf-8"))]
+    if str(prefix) != prefix.as_posix():
+        forms.insert(0, (_NATIVE_PREFIX_PLACEHOLDER, str(prefix).encode("utf-8")))
+    return forms
+
+
+def _relocatable_content(path: Path, forms: list[tuple[bytes, bytes]]) -> Optional[bytes]:
+    """Content of the text file `path` with the prefix replaced, None if unchanged."""
+    if path.is_symlink() or not path.is_file():
+        return None
+    with path.open("rb") as f:
+        head = f.read(_TEXT_PROBE_SIZE)
+        if b"\0" in head:
+            return None
+        data = head + f.read()
+    if not any(value in data for _, value in forms):
+        return None
+    for placeholder, value in forms:
+        data = data.replace(value, placeholder)
+    return data
+
+
+def resolve_cache_dir(arg: Optional[str]) -> Path:
+    """--cache-dir > $EXT_DEPS_CACHE_DIR > $XDG_CACHE_HOME/ext-deps > ~/.cache/ext-deps.
+
+    The default lives outside the repository so that `build.py --clean`
+    never reaches it and several checkouts share one cache.
+    """
+    if arg:
+        return Path(arg).expanduser().resolve()
+    env = os.environ.get("EXT_DEPS_CACHE_DIR")
+    if env:
+        return Path(env).expanduser().resolve()
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    base = Path(xdg).expanduser() if xdg else Path.home() / ".cache"
+    return (base / "ext-deps").resolve()
+
+
+def resolve_remote_cache(arg: Optional[str]) -> Optional[str]:
+    """--remote-cache > $EXT_DEPS_REMOTE_CACHE > no remote cache."""
+    url = arg or os.environ.get("EXT_DEPS_REMOTE_CACHE")
+    return url.rstrip("/") if url else None
+
+
+# Remote requests must never hang a build: a slow or unreachable server only
+# costs a cache miss.
+_REMOTE_TIMEOUT = 30
+_CHUNK_SIZE = 1 << 20
+
+
+class HttpArtifactCache:
+    """Remote archive store speaking plain HTTP GET/PUT/HEAD.
+
+    Downloads stream to disk in chunks. Uploads are queued on a small
+    background pool so the scheduler never waits for them; `close()` waits
+    for the queue to drain. After the first connection error the remote is
+    disabled for the rest of the run instead of timing out on every library.
+    """
+
+    def __init__(self, base_url: str, upload_workers: int = 2):
+        self.base_url = base_url.rstrip("/")
+        self.enabled = True
+        self._uploads: list[Future] = []
+        self._pool = ThreadPoolExecutor(
+            max_workers=upload_workers, thread_name_prefix="cache-upload"
+        )
+
+    def _url(self, lib_name: str, fingerprint: str) -> str:
+        return f"{self.base_url}/{lib_name}/{fingerprint}.tar.gz"
+
+    def _disable(self, error: Exception) -> None:
+        if self.enabled:
+            print(f"Warning: Remote cache {self.base_url} unavailable ({error}), disabling it")
+        self.enabled = False
+
+    def fetch(self, lib_name: str, fingerprint: str, dest: Path) -> bool:
+        """Download an archive to `dest`. Returns False on a miss or any error."""
+        if not self.enabled:
+            return False
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(
+            prefix=f".{fingerprint}.", suffix=".download", dir=dest.parent
+        )
+        try:
+            request = urllib.request.Request(self._url(lib_name, fingerprint))
+            with os.fdopen(fd, "wb") as out:
+                with urllib.request.urlopen(request, timeout=_REMOTE_TIMEOUT) as response:
+                    shutil.copyfileobj(response, out, _CHUNK_SIZE)
+            os.replace(tmp_name, dest)
+            return True
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                print(f"Warning: Remote cache GET for '{lib_name}' failed: HTTP {e.code}")
+        except (urllib.error.URLError, OSError) as e:
+            self._disable(e)
+        Path(tmp_name).unlink(missing_ok=True)
+        return False
+
+    def upload(self, lib_name: str, fingerprint: str, archive: Path) -> None:
+        """Queue `archive` for upload; returns immediately."""
+        if self.enabled:
+            self._uploads.append(
+                self._pool.submit(self._put, lib_name, fingerprint, archive)
+            )
+
+    def _exists(self, url: str) -> bool:
+        request = urllib.request.Request(url, method="HEAD")
+        try:
+            with urllib.request.urlopen(request, timeout=_REMOTE_TIMEOUT):
+                return True
+        except urllib.error.HTTPError:
+            return False
+
+    def _put(self, lib_name: str, fingerprint: str, archive: Path) -> None:
+        if not self.enabled:
+            return
+        url = self._url(lib_name, fingerprint)
+        try:
+            # Another agent may have uploaded the same fingerprint already.
+            if self._exists(url):
+                return
+            with open(archive, "rb") as body:
+                request = urllib.request.Request(
+                    url,
+                    data=body,
+                    method="PUT",
+                    headers={
+                        "Content-Type": "application/gzip",
+                        "Content-Length": str(archive.stat().st_size),
+                    },
+                )
+                with urllib.request.urlopen(request, timeout=_REMOTE_TIMEOUT):
+                    pass
+        except urllib.error.HTTPError as e:
+            print(f"Warning: Remote cache PUT for '{lib_name}' failed: HTTP {e.code}")
+        except (urllib.error.URLError, OSError) as e:
+            self._disable(e)
+
+    def close(self) -> None:
+        """Wait for queued uploads to finish."""
+        pending = [future for future in self._uploads if not future.done()]
+        if pending:
+            print(f"Waiting for {len(pending)} remote cache upload(s)...")
+        self._pool.shutdown(wait=True)
+
+
+class LocalArtifactCache:
+    """Fingerprint-addressed archives of library installs in a local directory.
+
+    With a `remote`, local misses fall back to it and stored archives are
+    uploaded to it.
+    """
+
+    def __init__(self, cache_dir: Path, remote: Optional[HttpArtifactCache] = None):
+        self.cache_dir = cache_dir
+        self.remote = remote
+
+    def _archive(self, lib_name: str, fingerprint: str) -> Path:
+        return self.cache_dir / lib_name / f"{fingerprint}.tar.gz"
+
+    def contains(self, lib_name: str, fingerprint: str) -> bool:
+        return self._archive(lib_name, fingerprint).is_file()
+
+    def store(
+        self,
+        lib_name: str,
+        fingerprint: str,
+        install_dir: Path,
+        files: list[str],
+    ) -> Optional[Path]:
+        """Pack `files` (relative to `install_dir`) into the cache.
+
+        `install_dir` is the prefix the files were built for; text files
+        naming it are stored relocatable. The archive is written to a temporary file and renamed into place, so
+        concurrent builds and interrupted runs never leave a truncated entry.
+        Returns the archive path, or None if nothing was stored.
+        """
+        if not files:
+            return None
+        archive = self._archive(lib_name, fingerprint)
+        archive.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(
+            prefix=f".{fingerprint}.", suffix=".tmp", dir=archive.parent
+        )
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                with tarfile.open(
+                    fileobj=raw, mode="w:gz", compresslevel=_COMPRESSLEVEL
+                ) as tar:
+                    forms = _prefix_forms(install_dir)
+                    for rel in files:
+                        path = install_dir / rel
+                        content = _relocatable_content(path, forms)
+                        if content is None:
+                            tar.add(path, arcname=rel, recursive=False)
+                            continue
+                        info = tar.gettarinfo(path, arcname=rel)
+                        info.size = len(content)
+                        info.pax_headers[_RELOCATE_PAX_KEY] = "1"
+                        tar.addfile(info, io.BytesIO(content))
+            os.replace(tmp_name, archive)
+        except OSError as e:
+            Path(tmp_name).unlink(missing_ok=True)
+            print(f"Warning: Could not store '{lib_name}' in cache: {e}")
+            return None
+        if self.remote is not None:
+            self.remote.upload(lib_name, fingerprint, archive)
+        return archive
+
+    def restore(
+        self,
+        lib_name: str,
+        fingerprint: str,
+        install_dir: Path,
+        prefix: Optional[Path] = None,
+    ) -> Optional[list[str]]:
+        """Unpack the archive for `fingerprint` into `install_dir`.
+
+        Relocated text files get `prefix` (default: `install_dir`), where
+        the files are published, in place of the one they were built for.
+        Returns the restored files (relative to `install_dir`), or None on a
+        cache miss or an unreadable archive (which is then discarded). The
+        scheduler restores into the library's stage and publishes from there,
+        so nothing here touches the shared prefix.
+        """
+        archive = self._archive(lib_name, fingerprint)
+        if not archive.is_file():
+            if self.remote is None or not self.remote.fetch(lib_name, fingerprint, archive):
+                return None
+            print(f"Downloaded '{lib_name}' from remote cache")
+        return extract_archive(archive, install_dir, lib_name, prefix or install_dir)
+
+    def close(self) -> None:
+        """Flush pending remote uploads."""
+        if self.remote is not None:
+            self.remote.close()
+
+
+def extract_archive(
+    archive: Path, install_dir: Path, lib_name: str, prefix: Path
+) -> Optional[list[str]]:
+    """Extract a cache archive, returning its member files or None if it is unusable.
+
+    Placeholders in relocated members are replaced with `prefix`.
+    """
+    install_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        with tarfile.open(archive, mode="r:gz") as tar:
+            members = tar.getmembers()
+            if hasattr(tarfile, "data_filter"):
+                tar.extractall(install_dir, members=members, filter="data")
+            else:
+                for member in members:
+                    if member.name.startswith("/") or ".." in Path(member.name).parts:
+                        raise tarfile.TarError(f"unsafe member {member.name}")
+                tar.extractall(install_dir, members=members)
+        for member in members:
+            if member.pax_headers.get(_RELOCATE_PAX_KEY):
+                path = install_dir / member.name
+                data = path.read_bytes()
+                for placeholder, value in _prefix_forms(prefix):
+                    data = data.replace(placeholder, value)
+                # Installed files may be read-only.
+                mode = path.stat().st_mode
+                path.unlink()
+                path.write_bytes(data)
+                path.chmod(mode)
+    except (OSError, tarfile.TarError, EOFError) as e:
+        print(f"Warning: Discarding unusable cache archive for '{lib_name}': {e}")
+        archive.unlink(missing_ok=True)
+        return None
+    return sorted(member.name for member in members if not member.isdir())
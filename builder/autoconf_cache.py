@@ -0,0 +1,139 @@
+"""
+Shared Autoconf check results.
+
+Autoconf's cached checks (AC_CACHE_CHECK) skip their test when the result
+variable, e.g. `ac_cv_header_stdint_h`, is already set in the environment.
+Every Autoconf-generated configure run writes its results to a fresh
+`config.cache` in the build dir; a conservative subset is merged into a
+per-toolchain store under `builds/<suffix>/.autoconf-cache/`, and later
+configure runs of any autotools library get them back as environment
+variables.
+
+The store is keyed on the compiler signature, CC/CFLAGS/LDFLAGS & co. and
+the --build/--host/--target triplets, so every target architecture has its
+own. Only results that depend on the toolchain alone are shared: system
+headers and builtin types from the allow-lists of builder.cmake_checks,
+compiler characteristics, libtool and automake probes. Any other header or
+type check depends on the include paths and defines a package adds itself
+(or on a dependency being installed yet), and function and library checks
+on its LIBS, so they are not shared. A variable two libraries recorded with
+different values is dropped for good.
+
+Seeding through the environment rather than a shared --cache-file keeps
+Autoconf's precious-variable check ("CFLAGS has changed since the previous
+run") out of the way: each package validates against its own fresh cache.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Optional
+
+from .cmake_checks import BUILTIN_TYPES, SYSTEM_HEADERS
+
+CACHE_DIRNAME = ".autoconf-cache"
+CACHE_FILENAME = "config.cache"
+
+_SHARED_RE = re.compile(
+    rf"ac_cv_header_(?:{'|'.join(sorted(SYSTEM_HEADERS))})_h|ac_cv_header_stdc"
+    rf"|ac_cv_(?:sizeof|alignof|type)_(?:{BUILTIN_TYPES})"
+    r"|ac_cv_c_\w+|ac_cv_cxx_compiler_gnu"
+    r"|ac_cv_prog_(?:cc|cxx|CPP|CXXCPP|AWK|ac_ct_\w+)\w*"
+    r"|ac_cv_path_(?:E?GREP|FGREP|SED)"
+    r"|ac_cv_(?:objext|exeext|build|host)"
+    r"|ac_cv_sys_(?:largefile_\w+|file_offset_bits|large_files)"
+    r"|lt_cv_\w+|am_cv_\w+"
+)
+
+# `name=${name=value}` (Autoconf < 2.70 also writes
+# `test "${name+set}" = set || name=value`, 2.70+ `test ${name+y} || name=value`).
+_LINE_RE = re.compile(
+    r"^(?:test \"?\$\{\w+\+(?:set|y)\}\"?(?: = set)? \|\| )?(\w+)=(.*)$"
+)
+
+# Parallel library builds read and update the same store.
+_lock = threading.Lock()
+
+
+def is_autoconf_script(configure: Path) -> bool:
+    """True for a configure script generated by GNU Autoconf (libvpx's is not)."""
+    try:
+        with configure.open("r", encoding="utf-8", errors="replace") as f:
+            head = f.read(4096)
+    except OSError:
+        return False
+    return "Generated by GNU Autoconf" in head
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == "'":
+        return value[1:-1].replace("'\\''", "'")
+    return value
+
+
+def read_cache_file(path: Path) -> dict[str, str]:
+    """Shareable results of a config.cache written by configure."""
+    try:
+        text = path.read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return {}
+    results = {}
+    for line in text.splitlines():
+        match = _LINE_RE.match(line)
+        if not match or not _SHARED_RE.fullmatch(match.group(1)):
+            continue
+        name, value = match.groups()
+        wrapped = re.fullmatch(rf"\$\{{{name}=(.*)\}}", value)
+        results[name] = _unquote(wrapped.group(1) if wrapped else value)
+    return results
+
+
+class AutoconfCache:
+    """The shared check results of one toolchain and target."""
+
+    def __init__(self, builds_dir: Path, inputs: dict):
+        key = json.dumps(inputs, sort_keys=True, default=str)
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        self.path = builds_dir / CACHE_DIRNAME / f"{digest}.json"
+
+    def _load(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"results": {}, "conflicts": []}
+        if not isinstance(data, dict) or not isinstance(data.get("results"), dict):
+            return {"results": {}, "conflicts": []}
+        return data
+
+    def environment(self) -> dict[str, str]:
+        """Cached results to export to configure."""
+        with _lock:
+            results = self._load()["results"]
+        # Stores written before the allow-lists narrowed may hold more.
+        return {name: value for name, value in results.items() if _SHARED_RE.fullmatch(name)}
+
+    def record(self, cache_file: Path, seeded: Optional[dict[str, str]] = None) -> None:
+        """Merge a configure run's config.cache into the store."""
+        results = read_cache_file(cache_file)
+        if not results:
+            return
+        with _lock:
+            data = self._load()
+            stored = data["results"]
+            conflicts = set(data.get("conflicts", []))
+            for name, value in results.items():
+                if name in conflicts or (seeded and seeded.get(name) == value):
+                    continue
+                if name in stored and stored[name] != value:
+                    del stored[name]
+                    conflicts.add(name)
+                else:
+                    stored[name] = value
+            data["conflicts"] = sorted(conflicts)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+            os.replace(tmp, self.path)
@@ -2,16 +2,23 @@
 Autotools build orchestration for libraries like hwloc.
 """
 
+import hashlib
 import os
 import platform as platform_module
 import shutil
-import subprocess
 import sys
 from pathlib import Path
 from typing import TYPE_CHECKING
 
+from . import toolprobe
+from .autoconf_cache import CACHE_FILENAME, AutoconfCache, is_autoconf_script
 from .cmake_builder import PatchManager
+from .compiler_cache import active as active_compiler_cache
 from .config import BuildConfig, Library
+from .execution import run_command
+from .jobserver import active as active_jobserver
+from .staging import Stage
+from .timing import phase
 
 if TYPE_CHECKING:
     from .platforms.base import Platform
@@ -25,6 +32,15 @@ def _get_host_arch() -> str:
     return "x86_64"
 
 
+def _default_compilers(platform_name: str) -> dict[str, str]:
+    """Compilers configure picks when CC/CXX are not set."""
+    if platform_name == "linux":
+        return {"CC": "gcc", "CXX": "g++"}
+    if platform_name == "macos":
+        return {"CC": "clang", "CXX": "clang++"}
+    return {"CC": "cc", "CXX": "c++"}
+
+
 def _toolchain_signature(platform_name: str) -> str:
     """Return a string that uniquely identifies the active C/C++ toolchain.
 
@@ -37,38 +53,111 @@ def _toolchain_signature(platform_name: str) -> str:
 
     The signature combines, for both CC and CXX, the resolved binary path and
     its --version banner — enough to catch a version bump or a different
-    compiler entirely.
+    compiler entirely. The banner is memoized through toolprobe.
     """
-    if platform_name == "linux":
-        defaults = {"CC": "gcc", "CXX": "g++"}
-    elif platform_name == "macos":
-        defaults = {"CC": "clang", "CXX": "clang++"}
-    else:
-        defaults = {"CC": "cc", "CXX": "c++"}
-
     parts: list[str] = []
-    for var, default in defaults.items():
+    for var, default in _default_compilers(platform_name).items():
         compiler = os.environ.get(var) or default
         resolved = shutil.which(compiler)
         if resolved is None:
             parts.append(f"{var}={compiler}:missing")
             continue
-        try:
-            banner = subprocess.run(
-                [resolved, "--version"],
-                capture_output=True,
-                text=True,
-                timeout=15,
-            ).stdout.splitlines()
-            version = banner[0].strip() if banner else ""
-        except (OSError, subprocess.SubprocessError):
-            version = ""
+        result = toolprobe.run([resolved, "--version"], timeout=15)
+        banner = result[1].splitlines() if result else []
+        version = banner[0].strip() if banner else ""
         real = os.path.realpath(resolved)
         parts.append(f"{var}={compiler}:{real}:{version}")
 
     return "\n".join(parts)
 
 
+# Files autogen.sh (autoreconf) generates `configure` and the Makefile.in
+# templates from. aclocal.m4 is one of its outputs.
+_AUTOGEN_INPUT_NAMES = {"configure.ac", "configure.in", "autogen.sh"}
+_AUTOGEN_INPUT_SUFFIXES = {".am", ".m4"}
+
+
+def _autogen_inputs_hash(source_dir: Path) -> str:
+    """Content hash of the autogen.sh inputs under `source_dir`."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(
+            d for d in dirs
+            if not d.startswith(("build-", ".git")) and d != "autom4te.cache"
+        )
+        for name in sorted(files):
+            if name == "aclocal.m4" or not (
+                name in _AUTOGEN_INPUT_NAMES or os.path.splitext(name)[1] in _AUTOGEN_INPUT_SUFFIXES
+            ):
+                continue
+            path = Path(root) / name
+            digest.update(path.relative_to(source_dir).as_posix().encode("utf-8") + b"\0")
+            digest.update(path.read_bytes())
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _depfile_rules(text: str) -> list[tuple[list[str], list[str]]]:
+    """(targets, prerequisites) of each rule in a make dependency file."""
+    rules = []
+    for line in text.replace("\\\n", " ").splitlines():
+        if not line.strip() or line.startswith(("#", "\t")):
+            continue
+        targets, sep, prereqs = line.partition(": ")
+        if not sep:
+            targets, sep, prereqs = line.rstrip().partition(":")
+        if sep:
+            rules.append((targets.split(), prereqs.split()))
+    return rules
+
+
+def _invalidate_stale_depfiles(build_dir: Path) -> int:
+    """Reset dependency files that name an absolute path which no longer exists.
+
+    Automake's `.deps/*.Po`/`*.Plo` files are included unconditionally, so
+    they are reset to the placeholder automake itself creates; plain `.d`
+    files (libvpx) are optional includes and are deleted. The objects they
+    describe are removed too, otherwise make would never rebuild them and
+    regenerate their dependencies. Returns the number of files invalidated.
+    """
+    count = 0
+    for root, _, files in os.walk(build_dir):
+        root_path = Path(root)
+        automake = root_path.name == ".deps"
+        for name in files:
+            if not (name.endswith(".d") or (automake and name.endswith((".Po", ".Plo")))):
+                continue
+            depfile = root_path / name
+            try:
+                rules = _depfile_rules(depfile.read_text(encoding="utf-8", errors="replace"))
+            except OSError:
+                continue
+            if not any(
+                os.path.isabs(path) and not os.path.exists(path)
+                for _, prereqs in rules
+                for path in prereqs
+            ):
+                continue
+
+            # Targets are relative to the directory make runs in: the
+            # Makefile next to `.deps`, or the top of the build dir.
+            make_dir = root_path.parent if automake else build_dir
+            for targets, _ in rules[:1]:
+                for target in targets:
+                    obj = make_dir / target
+                    obj.unlink(missing_ok=True)
+                    if obj.suffix == ".lo":
+                        # libtool objects: the .lo points at these.
+                        obj.with_suffix(".o").unlink(missing_ok=True)
+                        (obj.parent / ".libs" / f"{obj.stem}.o").unlink(missing_ok=True)
+            if automake:
+                depfile.write_text("# dummy\n", encoding="utf-8")
+            else:
+                depfile.unlink()
+            count += 1
+    return count
+
+
 class AutotoolsBuilder:
     """Handles autotools-based builds (configure/make/make install)."""
 
@@ -78,6 +167,8 @@ class AutotoolsBuilder:
         self.patch_manager = PatchManager(config.root_dir)
         self._lib_handles_cross = False
         self._current_lib: Library | None = None
+        # Files (relative to the install dir) written by the last install.
+        self.installed_files: list[str] = []
 
     def _has_custom_cross_targets(self, lib: Library) -> bool:
         """Check if the library handles cross-compilation itself via cross_compile_targets."""
@@ -90,8 +181,9 @@ class AutotoolsBuilder:
         print(f"\n{'=' * 20} Building '{lib.name}' (autotools) for '{self.config.build_suffix}' {'=' * 20}\n")
 
         self._current_lib = lib
-        source_dir = self.config.root_dir / lib.get_source_dir(self.config.platform_name)
-        install_dir = self.config.output_dir
+        paths = self.config.library_paths(lib)
+        source_dir = paths.source_dir
+        install_dir = paths.install_dir
 
         # Ensure install directory exists
         install_dir.mkdir(parents=True, exist_ok=True)
@@ -102,64 +194,78 @@ class AutotoolsBuilder:
         self._lib_handles_cross = self._has_custom_cross_targets(lib)
 
         # Get autotools options
-        autotools_opts = lib.platforms.get(self.config.platform_name, {}).get(
-            "autotools_options", {}
-        )
-        base_opts = getattr(lib, "autotools_options", {}) if hasattr(lib, "autotools_options") else {}
-        autotools_opts = {**base_opts, **autotools_opts}
+        autotools_opts = lib.get_autotools_options(self.config.platform_name)
 
         # Apply patches if any
-        if not self.patch_manager.apply_patch(lib.name, source_dir):
-            return False
-
-        # Run autogen if needed
-        if not self._run_autogen(source_dir):
-            return False
+        with phase("patch"):
+            if not self.patch_manager.apply_patch(lib.name, source_dir):
+                return False
 
-        # Create build directory (arch-specific to prevent cross-architecture contamination)
-        build_dir = source_dir / f"build-{self.config.arch}-{self.config.build_type}"
+        # Out-of-tree build dir, per configuration like the CMake and Meson
+        # builders: kept between runs so make only rebuilds what changed.
+        build_dir = paths.build_dir
         build_dir.mkdir(parents=True, exist_ok=True)
 
-        # Wipe the build dir if the active toolchain changed since the last
-        # build. Generated .d dependency files hardcode the compiler's internal
-        # header paths; reusing them after a gcc-12 -> gcc-14 swap makes `make`
-        # demand a header that no longer exists and abort.
+        # Run autogen if needed
+        with phase("autogen"):
+            if not self._run_autogen(source_dir, build_dir):
+                return False
+
+        # Dependency files hardcode the compiler's internal header paths;
+        # after a gcc-12 -> gcc-14 swap, make would demand a header that no
+        # longer exists and abort. Invalidate those if the toolchain changed.
         self._ensure_toolchain_match(build_dir)
 
         # Configure
         print(f"\n{'=' * 20} Configuring '{lib.name}' {'=' * 20}\n")
-        if not self._run_configure(source_dir, build_dir, install_dir, autotools_opts, lib):
-            return False
+        with phase("configure"):
+            if not self._run_configure(source_dir, build_dir, install_dir, autotools_opts, lib):
+                return False
 
         # Build
         print(f"\n{'=' * 20} Building {'=' * 20}\n")
-        if not self._run_make(build_dir):
-            return False
+        with phase("build"):
+            if not self._run_make(build_dir):
+                return False
+
+        # Install into the library's private stage; the shared prefix is only
+        # touched by the publish step once the staged files passed validation.
+        stage = Stage(self.config, lib.name)
+        stage.reset()
 
         # Install
         print(f"\n{'=' * 20} Installing {'=' * 20}\n")
-        if not self._run_make_install(build_dir):
-            return False
+        with phase("install"):
+            if not self._run_make_install(build_dir, stage.root):
+                return False
+        self.installed_files = stage.files()
 
         # Architecture validation (macOS only)
         if hasattr(self.platform, "validate_architecture"):
-            success, errors = self.platform.validate_architecture(self.config, install_dir)
+            with phase("validate_arch"):
+                success, errors = self.platform.validate_architecture(
+                    self.config, stage.prefix, self.installed_files
+                )
             if not success:
                 print(f"\nArchitecture validation failed for '{lib.name}':", file=sys.stderr)
                 for error in errors:
                     print(f"  - {error}", file=sys.stderr)
                 return False
 
+        with phase("publish"):
+            stage.publish()
+
         print(f"\n{'=' * 20} Success! {'=' * 20}\n")
         return True
 
     def _ensure_toolchain_match(self, build_dir: Path) -> None:
-        """Wipe and recreate build_dir if the toolchain changed since last build.
+        """Invalidate stale dependency files if the toolchain changed since last build.
 
         Compares the current toolchain signature against a stamp left by the
-        previous build. On mismatch (or a corrupt/missing stamp next to stale
-        artifacts), the build dir is cleared so configure/make regenerate
-        dependency files against the current compiler.
+        previous build. On mismatch (or a missing stamp next to existing
+        artifacts), every dependency file naming a file that no longer exists
+        is reset and its object removed, so make recompiles those sources and
+        regenerates their dependencies; the rest of the tree is kept.
         """
         stamp = build_dir / ".toolchain_stamp"
         signature = _toolchain_signature(self.config.platform_name)
@@ -169,25 +275,45 @@ class AutotoolsBuilder:
         # Treat a build dir that already holds artifacts but has no stamp as a
         # mismatch — it predates this mechanism and may carry stale .d files.
         has_artifacts = any(
-            child.name != ".toolchain_stamp" for child in build_dir.iterdir()
+            child.name not in (".toolchain_stamp", ".autogen_stamp")
+            for child in build_dir.iterdir()
         )
 
         if previous != signature and has_artifacts:
             reason = "toolchain changed" if previous else "no toolchain stamp"
-            print(f"  Toolchain check: {reason}; wiping {build_dir}")
-            shutil.rmtree(build_dir)
-            build_dir.mkdir(parents=True, exist_ok=True)
+            count = _invalidate_stale_depfiles(build_dir)
+            print(
+                f"  Toolchain check: {reason}; invalidated {count} dependency "
+                f"file(s) naming missing files in {build_dir}"
+            )
 
         stamp.write_text(signature)
 
-    def _run_autogen(self, source_dir: Path) -> bool:
-        """Run autogen.sh if it exists."""
+    def _run_autogen(self, source_dir: Path, build_dir: Path) -> bool:
+        """Run autogen.sh if it exists and its inputs changed since the last run.
+
+        The inputs (configure.ac, Makefile.am, m4 macros, autogen.sh itself)
+        are compared by content: submodule checkouts and patching leave
+        meaningless timestamps. The stamp lives in the build dir, so the
+        checkout stays clean and --clean forgets it.
+        """
         autogen_script = source_dir / "autogen.sh"
         if not autogen_script.exists():
             return True
 
+        stamp = build_dir / ".autogen_stamp"
+        if (source_dir / "configure").is_file() and stamp.is_file():
+            if stamp.read_text().strip() == _autogen_inputs_hash(source_dir):
+                print("autogen.sh inputs unchanged; skipping autogen.sh")
+                return True
+
+        stamp.unlink(missing_ok=True)
         print("Running autogen.sh...")
-        return self._run_command(["bash", "autogen.sh"], cwd=source_dir)
+        if not self._run_command(["bash", "autogen.sh"], cwd=source_dir):
+            return False
+        # Hashed after the run: libtoolize/aclocal copy m4 files into the tree.
+        stamp.write_text(_autogen_inputs_hash(source_dir) + "\n")
+        return True
 
     def _run_configure(
         self,
@@ -237,17 +363,59 @@ class AutotoolsBuilder:
 
         # Set environment for cross-compilation
         env = self._get_build_env()
-        return self._run_command(args, cwd=build_dir, env=env)
+
+        if not is_autoconf_script(configure_script):
+            return self._run_command(args, cwd=build_dir, env=env)
+
+        # Share check results with the other autotools libraries: configure
+        # writes a fresh config.cache, seeded from the toolchain's store.
+        checks = AutoconfCache(self.config.builds_dir, self._autoconf_cache_inputs(args, env))
+        seeded = {name: value for name, value in checks.environment().items() if name not in env}
+        if seeded:
+            print(f"Pre-seeding {len(seeded)} cached check results from earlier configures")
+        cache_file = build_dir / CACHE_FILENAME
+        cache_file.unlink(missing_ok=True)
+        args.append(f"--cache-file={CACHE_FILENAME}")
+        if not self._run_command(args, cwd=build_dir, env={**env, **seeded}):
+            return False
+        checks.record(cache_file, seeded)
+        return True
+
+    def _autoconf_cache_inputs(self, args: list[str], env: dict) -> dict:
+        """What decides the results of toolchain checks (see autoconf_cache)."""
+        return {
+            "platform": self.config.platform_name,
+            "arch": self.config.arch,
+            "triplets": [a for a in args if a.startswith(("--build=", "--host=", "--target="))],
+            "environment": {
+                var: env.get(var)
+                for var in ("CC", "CXX", "CPP", "CFLAGS", "CXXFLAGS", "CPPFLAGS", "LDFLAGS", "LIBS")
+            },
+            "toolchain": _toolchain_signature(self.config.platform_name),
+        }
 
     def _run_make(self, build_dir: Path) -> bool:
-        """Run make with appropriate flags."""
+        """Run make with appropriate flags.
+
+        Under a parallel build, make joins the shared jobserver instead of
+        picking its own job count; otherwise it runs one job per CPU (a bare
+        `-j` would spawn an unbounded number).
+        """
         env = self._get_build_env()
-        cmd = ["make", "-j"]
-        return self._run_command(cmd, cwd=build_dir, env=env)
+        jobserver = active_jobserver()
+        if jobserver is None:
+            cmd = ["make", f"-j{os.cpu_count() or 1}"]
+            return self._run_command(cmd, cwd=build_dir, env=env)
+        return self._run_command(
+            ["make"],
+            cwd=build_dir,
+            env=jobserver.make_env(env),
+            pass_fds=jobserver.pass_fds,
+        )
 
-    def _run_make_install(self, build_dir: Path) -> bool:
-        """Run make install."""
-        return self._run_command(["make", "install"], cwd=build_dir)
+    def _run_make_install(self, build_dir: Path, destdir: Path) -> bool:
+        """Run make install below `destdir` (DESTDIR)."""
+        return self._run_command(["make", "install", f"DESTDIR={destdir}"], cwd=build_dir)
 
     def _get_base_compile_flags(self) -> list[str]:
         """Get base compile flags shared between CFLAGS and CXXFLAGS."""
@@ -316,6 +484,12 @@ class AutotoolsBuilder:
         if ldflags:
             env["LDFLAGS"] = ldflags
 
+        # Compiler cache: configure and libtool accept a multi-word CC.
+        compiler_cache = active_compiler_cache()
+        if compiler_cache is not None:
+            for var, default in _default_compilers(self.config.platform_name).items():
+                env[var] = compiler_cache.wrap(os.environ.get(var) or default)
+
         return env
 
     def _run_command(
@@ -323,15 +497,7 @@ class AutotoolsBuilder:
         cmd: list[str],
         cwd: Path = None,
         env: dict = None,
+        pass_fds: tuple[int, ...] = (),
     ) -> bool:
         """Run a command and return success status."""
-        print(f"Running: {' '.join(cmd)}")
-        try:
-            result = subprocess.run(cmd, cwd=cwd, env=env, check=True)
-            return result.returncode == 0
-        except subprocess.CalledProcessError as e:
-            print(f"Command failed with return code {e.returncode}", file=sys.stderr)
-            return False
-        except FileNotFoundError:
-            print(f"Command not found: {cmd[0]}", file=sys.stderr)
-            return False
+        return run_command(cmd, cwd=cwd, env=env, pass_fds=pass_fds)
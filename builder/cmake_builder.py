@@ -2,17 +2,36 @@
 CMake build orchestration.
 """
 
+import json
+import os
 import re
+import shutil
 import subprocess
 import sys
+import time
 from pathlib import Path
 from typing import TYPE_CHECKING
 
+from .cmake_checks import CheckCache
+from .compiler_cache import active as active_compiler_cache
 from .config import BuildConfig, Library
+from .execution import run_command
+from .jobserver import active as active_jobserver, ninja_supports_jobserver
+from .staging import Stage
+from .timing import add_metric, format_duration, phase
 
 if TYPE_CHECKING:
     from .platforms.base import Platform
 
+# Written to the build dir after a successful configure; see
+# CMakeBuilder._configure_is_current.
+CONFIGURE_STAMP = ".configure_stamp"
+
+# Environment variables CMake reads when it first detects the toolchain.
+_CONFIGURE_ENV = (
+    "CC", "CXX", "CFLAGS", "CXXFLAGS", "LDFLAGS", "SDKROOT", "MACOSX_DEPLOYMENT_TARGET",
+)
+
 
 class PatchManager:
     """Handles applying and reverting patches to library sources."""
@@ -185,47 +204,83 @@ class CMakeBuilder:
         self.config = config
         self.platform = platform
         self.patch_manager = PatchManager(config.root_dir)
+        # Files (relative to the install dir) written by the last install.
+        self.installed_files: list[str] = []
 
     def build(self, lib: Library) -> bool:
         """Build a single library. Returns True on success."""
         print(f"\n{'=' * 20} Building '{lib.name}' for '{self.config.build_suffix}' {'=' * 20}\n")
 
-        source_dir = self.config.root_dir / lib.get_source_dir(self.config.platform_name)
-        build_dir = self.config.builds_dir / lib.name
-        install_dir = self.config.output_dir
+        paths = self.config.library_paths(lib)
+        source_dir = paths.source_dir
+        build_dir = paths.build_dir
+        install_dir = paths.install_dir
 
         # Ensure directories exist
         build_dir.mkdir(parents=True, exist_ok=True)
         install_dir.mkdir(parents=True, exist_ok=True)
 
         # Apply patches if any
-        if not self.patch_manager.apply_patch(lib.name, source_dir):
-            return False
+        with phase("patch"):
+            if not self.patch_manager.apply_patch(lib.name, source_dir):
+                return False
 
         # Build CMake arguments
         cmake_args = self._build_cmake_args(lib, source_dir, build_dir, install_dir)
 
-        # Configure
-        print(f"\n{'=' * 20} Configuring '{lib.name}' {'=' * 20}\n")
-        if not self._run_cmake_configure(source_dir, build_dir, cmake_args):
-            return False
+        # Configure, unless the build dir was configured with the same
+        # arguments. `cmake --build` re-runs CMake itself if a CMakeLists.txt
+        # or included script changed since.
+        stamp = self._configure_stamp(source_dir, build_dir, cmake_args)
+        previous = self._configure_is_current(build_dir, stamp)
+        if previous is not None:
+            print(f"\n{'=' * 20} Configure of '{lib.name}' is up to date {'=' * 20}\n")
+            saved = previous.get("seconds")
+            if isinstance(saved, (int, float)):
+                print(f"Arguments unchanged; skipped configure (saved ~{format_duration(saved)})")
+                add_metric("configure_saved_seconds", saved)
+            else:
+                print("Arguments unchanged; skipped configure")
+        else:
+            print(f"\n{'=' * 20} Configuring '{lib.name}' {'=' * 20}\n")
+            (build_dir / CONFIGURE_STAMP).unlink(missing_ok=True)
+            start = time.monotonic()
+            with phase("configure"):
+                if not self._configure(lib, source_dir, build_dir, cmake_args):
+                    return False
+            stamp["seconds"] = round(time.monotonic() - start, 3)
+            (build_dir / CONFIGURE_STAMP).write_text(
+                json.dumps(stamp, indent=2) + "\n", encoding="utf-8"
+            )
 
         # Build
         print(f"\n{'=' * 20} Building {'=' * 20}\n")
-        if not self._run_cmake_build(build_dir):
-            return False
+        with phase("build"):
+            if not self._run_cmake_build(build_dir):
+                return False
+
+        # Install into the library's private stage; the shared prefix is only
+        # touched by the publish step once the staged files passed validation.
+        stage = Stage(self.config, lib.name)
+        stage.reset()
 
         # Install
         print(f"\n{'=' * 20} Installing {'=' * 20}\n")
-        if not self._run_cmake_install(build_dir):
-            return False
+        with phase("install"):
+            if not self._run_cmake_install(build_dir, stage.root):
+                return False
 
         # Post-install hook (platform-specific)
-        self.platform.post_install(self.config, lib, build_dir, install_dir)
+        with phase("post_install"):
+            self.platform.post_install(self.config, lib, build_dir, stage.prefix)
+        self.installed_files = stage.files()
 
         # CRT validation (Windows only)
         if hasattr(self.platform, "validate_crt_linkage"):
-            success, errors = self.platform.validate_crt_linkage(self.config, install_dir)
+            with phase("validate_crt"):
+                success, errors = self.platform.validate_crt_linkage(
+                    self.config, stage.prefix, self.installed_files
+                )
             if not success:
                 print(f"\nCRT linkage validation failed for '{lib.name}':", file=sys.stderr)
                 for error in errors:
@@ -234,7 +289,10 @@ class CMakeBuilder:
 
         # Architecture validation (macOS only)
         if hasattr(self.platform, "validate_architecture"):
-            success, errors = self.platform.validate_architecture(self.config, install_dir)
+            with phase("validate_arch"):
+                success, errors = self.platform.validate_architecture(
+                    self.config, stage.prefix, self.installed_files
+                )
             if not success:
                 print(f"\nArchitecture validation failed for '{lib.name}':", file=sys.stderr)
                 for error in errors:
@@ -242,13 +300,17 @@ class CMakeBuilder:
                 return False
 
         # Post-build assertions declared by the library YAML.
-        success, errors = lib.verify_post_build(self.config.platform_name, build_dir)
+        with phase("verify_post_build"):
+            success, errors = lib.verify_post_build(self.config.platform_name, build_dir)
         if not success:
             print(f"\nPost-build assertions failed for '{lib.name}':", file=sys.stderr)
             for error in errors:
                 print(f"  - {error}", file=sys.stderr)
             return False
 
+        with phase("publish"):
+            stage.publish()
+
         print(f"\n{'=' * 20} Success! {'=' * 20}\n")
         return True
 
@@ -275,6 +337,19 @@ class CMakeBuilder:
         args.append(f"-DCMAKE_BUILD_TYPE={self.config.build_type}")
         args.append(f"-DCMAKE_INSTALL_PREFIX={install_dir}")
 
+        # Cap concurrent link steps (Ninja job pools; the Visual Studio
+        # generator schedules through MSBuild and has no equivalent).
+        if self.config.link_jobs and generator == "Ninja":
+            args.append(f"-DCMAKE_JOB_POOLS=link_jobs={self.config.link_jobs}")
+            args.append("-DCMAKE_JOB_POOL_LINK=link_jobs")
+
+        # Compiler cache. The Visual Studio generator ignores launchers (MSBuild
+        # invokes cl.exe itself), so those builds stay uncached.
+        compiler_cache = active_compiler_cache()
+        if compiler_cache is not None and not generator.startswith("Visual Studio"):
+            args.append(f"-DCMAKE_C_COMPILER_LAUNCHER={compiler_cache.executable}")
+            args.append(f"-DCMAKE_CXX_COMPILER_LAUNCHER={compiler_cache.executable}")
+
         # Platform-specific options
         platform_options = self.platform.get_platform_cmake_options(self.config)
         for key, value in platform_options.items():
@@ -344,15 +419,82 @@ class CMakeBuilder:
 
         return args
 
-    def _run_cmake_configure(
+    def _configure_stamp(
         self, source_dir: Path, build_dir: Path, args: list[str]
+    ) -> dict:
+        """Everything the configure step depends on besides the sources."""
+        return {
+            "command": ["cmake", "-S", str(source_dir), "-B", str(build_dir)] + args,
+            "cmake": shutil.which("cmake"),
+            "environment": {var: os.environ.get(var) for var in _CONFIGURE_ENV},
+        }
+
+    @staticmethod
+    def _configure_is_current(build_dir: Path, stamp: dict) -> dict | None:
+        """Return the stored stamp when configure can be skipped, else None.
+
+        The stamp is removed before every configure and written back only
+        once it succeeds, so a failed or interrupted configure never matches.
+        """
+        if not (build_dir / "CMakeCache.txt").is_file():
+            return None
+        try:
+            previous = json.loads((build_dir / CONFIGURE_STAMP).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(previous, dict):
+            return None
+        if {key: previous.get(key) for key in stamp} != stamp:
+            return None
+        return previous
+
+    def _configure(
+        self, lib: Library, source_dir: Path, build_dir: Path, args: list[str]
+    ) -> bool:
+        """Run CMake configuration, sharing check results with other libraries."""
+        if not CheckCache.applies_to(lib, self.config.platform_name):
+            return self._run_cmake_configure(source_dir, build_dir, args)
+
+        checks = CheckCache(self.config, self.platform)
+        # Seeds only matter to a fresh cache; an existing one keeps its results.
+        seed = None
+        if not (build_dir / "CMakeCache.txt").is_file():
+            seed = checks.write_seed(build_dir)
+        if self._run_cmake_configure(source_dir, build_dir, args, initial_cache=seed):
+            if checks.record(build_dir, seeded=seed is not None):
+                return True
+            print("Shared check results came from another compiler; reconfiguring without them")
+        elif seed is None:
+            return False
+        else:
+            print("Configure failed with shared check results; retrying without them")
+
+        (build_dir / "CMakeCache.txt").unlink(missing_ok=True)
+        shutil.rmtree(build_dir / "CMakeFiles", ignore_errors=True)
+        if not self._run_cmake_configure(source_dir, build_dir, args):
+            return False
+        checks.record(build_dir, seeded=False)
+        return True
+
+    def _run_cmake_configure(
+        self,
+        source_dir: Path,
+        build_dir: Path,
+        args: list[str],
+        initial_cache: Path | None = None,
     ) -> bool:
         """Run CMake configuration."""
-        cmd = ["cmake", "-S", str(source_dir), "-B", str(build_dir)] + args
-        return self._run_command(cmd)
+        cmd = ["cmake", "-S", str(source_dir), "-B", str(build_dir)]
+        if initial_cache is not None:
+            cmd += ["-C", str(initial_cache)]
+        return self._run_command(cmd + args)
 
     def _run_cmake_build(self, build_dir: Path) -> bool:
-        """Run CMake build."""
+        """Run CMake build.
+
+        Under a parallel build, Ninja joins the shared jobserver so this
+        library's compile jobs come out of the global --jobs budget.
+        """
         cmd = [
             "cmake",
             "--build",
@@ -360,10 +502,21 @@ class CMakeBuilder:
             "--config",
             self.config.build_type,
         ]
-        return self._run_command(cmd)
+        env = None
+        jobserver = active_jobserver()
+        if jobserver is not None and self.platform.get_generator() == "Ninja":
+            if ninja_supports_jobserver():
+                env = jobserver.ninja_env(os.environ)
+            else:
+                print(
+                    "  Warning: Ninja < 1.13 cannot join the jobserver; "
+                    "it will pick its own parallelism",
+                    file=sys.stderr,
+                )
+        return self._run_command(cmd, env=env)
 
-    def _run_cmake_install(self, build_dir: Path) -> bool:
-        """Run CMake install."""
+    def _run_cmake_install(self, build_dir: Path, destdir: Path) -> bool:
+        """Run CMake install below `destdir` (DESTDIR)."""
         cmd = [
             "cmake",
             "--install",
@@ -371,17 +524,8 @@ class CMakeBuilder:
             "--config",
             self.config.build_type,
         ]
-        return self._run_command(cmd)
+        return self._run_command(cmd, env={**os.environ, "DESTDIR": str(destdir)})
 
-    def _run_command(self, cmd: list[str]) -> bool:
+    def _run_command(self, cmd: list[str], env: dict | None = None) -> bool:
         """Run a command and return success status."""
-        print(f"Running: {' '.join(cmd)}")
-        try:
-            result = subprocess.run(cmd, check=True)
-            return result.returncode == 0
-        except subprocess.CalledProcessError as e:
-            print(f"Command failed with return code {e.returncode}", file=sys.stderr)
-            return False
-        except FileNotFoundError:
-            print(f"Command not found: {cmd[0]}", file=sys.stderr)
-            return False
+        return run_command(cmd, env=env)
@@ -0,0 +1,203 @@
+"""
+Shared CMake feature-check results.
+
+CMake's check modules (CheckIncludeFile, CheckTypeSize, FindThreads, ...)
+skip their try_compile when the result variable is already defined. After
+every configure, the results of a conservative set of checks are read back
+from the library's CMakeCache.txt into a per-toolchain store under
+`builds/<suffix>/.cmake-checks/`; a fresh configure of any other library is
+then pre-seeded with them through an initial-cache (`cmake -C`) file.
+
+Only checks whose answer depends on the toolchain alone are shared: system
+headers, sizes of builtin types and the pthread detection of FindThreads. A
+variable two libraries recorded with different values is dropped for good.
+Libraries with extra compiler flags neither use nor feed the store.
+
+The store is keyed on the generator, platform options and flags; the
+compiler version is checked afterwards against the one CMake detected, and a
+configure that was seeded for another compiler is redone without the seeds.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from .config import BuildConfig, Library
+
+if TYPE_CHECKING:
+    from .platforms.base import Platform
+
+CHECKS_DIRNAME = ".cmake-checks"
+SEED_FILENAME = "ext-deps-checks.cmake"
+
+# System and compiler headers whose presence does not depend on the project
+# (CheckIncludeFile names them HAVE_<PATH>_H, Autoconf ac_cv_header_<path>_h);
+# also used by builder.autoconf_cache.
+SYSTEM_HEADERS = {
+    "assert", "ctype", "errno", "fenv", "float", "inttypes", "limits", "locale",
+    "math", "setjmp", "signal", "stdarg", "stdbool", "stddef", "stdint", "stdio",
+    "stdlib", "string", "strings", "time", "wchar", "wctype", "memory", "malloc",
+    "alloca", "unistd", "fcntl", "dirent", "dlfcn", "pthread", "semaphore", "sched",
+    "poll", "termios", "langinfo", "endian", "byteswap", "libgen", "fnmatch", "glob",
+    "pwd", "grp", "utime", "io", "direct", "process", "windows", "winsock2", "ws2tcpip",
+    "cpuid", "intrin", "immintrin", "x86intrin", "emmintrin", "arm_neon",
+    "netdb", "netinet_in", "arpa_inet",
+    "sys_types", "sys_stat", "sys_time", "sys_times", "sys_mman", "sys_param",
+    "sys_select", "sys_socket", "sys_ioctl", "sys_wait", "sys_resource", "sys_uio",
+    "sys_utsname", "sys_sysctl", "sys_file", "sys_endian", "sys_prctl",
+}
+
+# Builtin types only, as a pattern over lowercase names (SIZEOF_<TYPE> and
+# ac_cv_sizeof_<type>): off_t and time_t change size with feature macros.
+BUILTIN_TYPES = (
+    r"(?:unsigned_)?(?:char|short|int|long|long_long)(?:_int)?|float|double|long_double"
+    r"|void_p|s?size_t|ptrdiff_t|u?intptr_t|wchar_t|u?int(?:8|16|32|64)_t|_bool|__int64"
+)
+
+_SHARED_RE = re.compile(
+    rf"HAVE_(?:{'|'.join(sorted(h.upper() for h in SYSTEM_HEADERS))})_H"
+    rf"|(?:HAVE_)?SIZEOF_(?:{BUILTIN_TYPES.upper()})"
+    r"|CMAKE_HAVE_(?:PTHREAD_H|LIBC_PTHREAD|PTHREADS_CREATE|PTHREAD_CREATE)"
+    r"|THREADS_HAVE_PTHREAD_ARG"
+)
+
+_CACHE_ENTRY_RE = re.compile(r"^([A-Za-z_][A-Za-z0-9_]*):(INTERNAL|BOOL|STRING)=(.*)$")
+_COMPILER_RE = re.compile(r'^set\(CMAKE_(C|CXX)_COMPILER_(ID|VERSION) "([^"]*)"\)$', re.M)
+
+# Parallel library builds read and update the same store.
+_lock = threading.Lock()
+
+
+def _read_cache_entries(build_dir: Path) -> dict[str, str]:
+    """Shareable check results recorded in the build dir's CMakeCache.txt."""
+    try:
+        text = (build_dir / "CMakeCache.txt").read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return {}
+    entries = {}
+    for line in text.splitlines():
+        match = _CACHE_ENTRY_RE.match(line)
+        if match and _SHARED_RE.fullmatch(match.group(1)):
+            entries[match.group(1)] = match.group(3)
+    # A multi-architecture (universal) size has no single value.
+    return {
+        name: value
+        for name, value in entries.items()
+        if not name.startswith("SIZEOF_") or value.isdigit()
+    }
+
+
+def _detected_compilers(build_dir: Path) -> dict[str, str]:
+    """{"C": "GNU 12.2.0", ...} as identified by CMake in this build dir."""
+    found: dict[str, dict[str, str]] = {}
+    for path in (build_dir / "CMakeFiles").glob("*/CMake*Compiler.cmake"):
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            continue
+        for language, field, value in _COMPILER_RE.findall(text):
+            found.setdefault(language, {})[field] = value
+    return {
+        language: f"{fields.get('ID', '')} {fields.get('VERSION', '')}".strip()
+        for language, fields in found.items()
+    }
+
+
+def _cmake_value(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class CheckCache:
+    """The shared check results of one toolchain configuration."""
+
+    def __init__(self, config: BuildConfig, platform: "Platform"):
+        key = json.dumps(
+            {
+                "generator": platform.get_generator(),
+                "architecture": platform.get_architecture_arg(config),
+                "cmake_options": platform.get_platform_cmake_options(config),
+                "c_flags": platform.get_c_flags(config),
+                "cxx_flags": platform.get_cxx_flags(config),
+                "environment": {var: os.environ.get(var) for var in ("CC", "CXX")},
+            },
+            sort_keys=True,
+            default=str,
+        )
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        self.path = config.builds_dir / CHECKS_DIRNAME / f"{digest}.json"
+
+    @staticmethod
+    def applies_to(lib: Library, platform_name: str) -> bool:
+        """Extra flags can change check results, so such libraries stay out."""
+        return not (lib.get_extra_c_flags(platform_name) or lib.get_extra_cxx_flags(platform_name))
+
+    def _load(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"compilers": {}, "results": {}, "conflicts": []}
+        if not isinstance(data, dict) or not isinstance(data.get("results"), dict):
+            return {"compilers": {}, "results": {}, "conflicts": []}
+        return data
+
+    def _save(self, data: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def write_seed(self, build_dir: Path) -> Optional[Path]:
+        """Write the initial-cache file for a fresh configure; None when empty."""
+        with _lock:
+            results = self._load()["results"]
+        if not results:
+            return None
+        lines = ["# Check results shared across libraries by build.py (cmake -C)."]
+        for name, value in sorted(results.items()):
+            lines.append(f'set({name} {_cmake_value(value)} CACHE INTERNAL "")')
+        seed = build_dir / SEED_FILENAME
+        seed.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        print(f"Pre-seeding {len(results)} check results from earlier configures")
+        return seed
+
+    def record(self, build_dir: Path, seeded: bool) -> bool:
+        """Merge the build dir's check results into the store.
+
+        Returns False when `seeded` results came from a different compiler
+        than the one CMake detected; the configure must then be redone
+        without them (and nothing is recorded).
+        """
+        compilers = _detected_compilers(build_dir)
+        entries = _read_cache_entries(build_dir)
+        with _lock:
+            data = self._load()
+            known = data.get("compilers") or {}
+            same_compiler = all(
+                known[language] == identity
+                for language, identity in compilers.items()
+                if language in known
+            )
+            if not same_compiler:
+                if seeded:
+                    return False
+                # The toolchain changed under the same flags: start over.
+                data = {"compilers": {}, "results": {}, "conflicts": []}
+
+            results = data["results"]
+            conflicts = set(data.get("conflicts", []))
+            for name, value in entries.items():
+                if name in conflicts:
+                    continue
+                if name in results and results[name] != value:
+                    del results[name]
+                    conflicts.add(name)
+                else:
+                    results[name] = value
+            data["compilers"] = {**data.get("compilers", {}), **compilers}
+            data["conflicts"] = sorted(conflicts)
+            self._save(data)
+        return True
@@ -0,0 +1,180 @@
+"""
+Linker directives of MSVC static libraries, read without dumpbin.
+
+A `.lib` is an ar archive of COFF objects. The compiler records the CRT an
+object needs as `/DEFAULTLIB:"MSVCRT"`-style options in the object's
+`.drectve` section, which is what `dumpbin /directives` prints. This module
+reads those sections straight from the archive through a memory map. It only
+touches the member headers, the section tables and the directive sections,
+and it runs on any host, so release artifacts can be checked on Linux too:
+
+    python -m builder.coff --expect MSVCRT output/<suffix>/lib/*.lib
+
+Objects compiled with /GL (LTCG) are not COFF but "anonymous objects" whose
+directives are hidden in opaque compiler metadata; they are reported
+separately. Import library members (short import objects) carry no
+directives and are skipped.
+"""
+
+import argparse
+import mmap
+import re
+import struct
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .ar import AR_MAGIC, ArchiveFormatError, iter_members
+
+# ClassID of the MSVC "anonymous object" header used by /GL (LTCG)
+# compilands ({0CB3FE38-D9A5-4DAB-AC9B-D6B6222653C2}, little-endian).
+LTCG_ANON_OBJ_GUID = bytes((
+    0x38, 0xFE, 0xB3, 0x0C, 0xA5, 0xD9, 0xAB, 0x4D,
+    0xAC, 0x9B, 0xD6, 0xB6, 0x22, 0x26, 0x53, 0xC2,
+))
+# ClassID of /bigobj objects: COFF with 32-bit section numbers behind an
+# anonymous object header ({D1BAA1C7-BAEE-4BA9-AF20-FAF66AA4DCB8}).
+BIGOBJ_GUID = bytes((
+    0xC7, 0xA1, 0xBA, 0xD1, 0xEE, 0xBA, 0xA9, 0x4B,
+    0xAF, 0x20, 0xFA, 0xF6, 0x6A, 0xA4, 0xDC, 0xB8,
+))
+
+# IMAGE_FILE_MACHINE_* of the targets MSVC produces objects for.
+_MACHINES = {0x014C, 0x01C4, 0x8664, 0xAA64, 0xA641, 0xA64E}
+
+CRT_LIBRARIES = ("LIBCMT", "LIBCMTD", "MSVCRT", "MSVCRTD")
+
+_DIRECTIVE_RE = re.compile(r'(?:"[^"]*"|[^\s"])+')
+
+
+@dataclass
+class ArchiveDirectives:
+    """What the objects of one static library ask the linker for."""
+
+    # Every directive, in member order, e.g. '/DEFAULTLIB:"MSVCRT"'.
+    directives: list[str] = field(default_factory=list)
+    # Members compiled with /GL, whose directives cannot be read.
+    ltcg_members: list[str] = field(default_factory=list)
+
+    def default_libs(self) -> set[str]:
+        """Upper-cased /DEFAULTLIB libraries, without a .lib extension."""
+        libs = set()
+        for directive in self.directives:
+            option, _, value = directive.partition(":")
+            if option[1:].upper() != "DEFAULTLIB" or not value:
+                continue
+            name = value.strip('"').upper()
+            libs.add(name[:-4] if name.endswith(".LIB") else name)
+        return libs
+
+    def crt_libraries(self) -> set[str]:
+        """The C runtimes among the default libraries."""
+        return self.default_libs() & set(CRT_LIBRARIES)
+
+
+def _split_directives(data: bytes) -> list[str]:
+    if data.startswith(b"\xef\xbb\xbf"):
+        text = data[3:].decode("utf-8", "replace")
+    else:
+        text = data.decode("latin-1")
+    return _DIRECTIVE_RE.findall(text.replace("\0", " "))
+
+
+def _coff_directives(
+    data: mmap.mmap, start: int, end: int, sections: int, table: int
+) -> list[str]:
+    """Directives of the COFF object at data[start:end] (section table at `table`)."""
+    directives = []
+    for index in range(sections):
+        header = start + table + index * 40
+        if header + 40 > end:
+            break
+        if data[header:header + 8] != b".drectve":
+            continue
+        size, offset = struct.unpack_from("<II", data, header + 16)
+        if offset and start + offset + size <= end:
+            directives.extend(_split_directives(data[start + offset:start + offset + size]))
+    return directives
+
+
+def _object_directives(data: mmap.mmap, start: int, end: int) -> tuple[list[str], bool]:
+    """(directives, is LTCG) of one archive member."""
+    if end - start < 20:
+        return [], False
+    sig1, sig2 = struct.unpack_from("<HH", data, start)
+    if sig1 == 0 and sig2 == 0xFFFF:
+        version = struct.unpack_from("<H", data, start + 4)[0]
+        if version == 0 or end - start < 28:
+            return [], False  # short import object (import library member)
+        class_id = data[start + 12:start + 28]
+        if class_id == LTCG_ANON_OBJ_GUID:
+            return [], True
+        if class_id == BIGOBJ_GUID and end - start >= 56:
+            sections = struct.unpack_from("<I", data, start + 44)[0]
+            return _coff_directives(data, start, end, sections, 56), False
+        return [], False
+    if sig1 not in _MACHINES:
+        return [], False  # not an object (resource, text file, ...)
+    sections = sig2
+    optional_header = struct.unpack_from("<H", data, start + 16)[0]
+    return _coff_directives(data, start, end, sections, 20 + optional_header), False
+
+
+def read_archive(path: Path) -> ArchiveDirectives:
+    """Directives of every object in the static library at `path`.
+
+    Raises ArchiveFormatError for files that are not ar archives, and
+    OSError when the file cannot be read.
+    """
+    result = ArchiveDirectives()
+    with open(path, "rb") as f:
+        if f.read(len(AR_MAGIC)) != AR_MAGIC:
+            raise ArchiveFormatError(f"{path.name}: not an ar archive")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for member in iter_members(data, name=path.name):
+                if member.index:
+                    continue
+                directives, ltcg = _object_directives(data, member.start, member.end)
+                result.directives.extend(directives)
+                if ltcg:
+                    result.ltcg_members.append(member.name)
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Report the C runtime of MSVC static libraries (like dumpbin /directives)"
+    )
+    parser.add_argument("libraries", nargs="+", type=Path, metavar="LIB")
+    parser.add_argument(
+        "--expect",
+        choices=CRT_LIBRARIES,
+        help="Fail if the libraries reference another CRT",
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.libraries:
+        try:
+            archive = read_archive(path)
+        except (OSError, ArchiveFormatError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            failed = True
+            continue
+        crts = archive.crt_libraries()
+        if archive.ltcg_members:
+            print(f"  FAIL: {path.name}: /GL (LTCG) objects: {', '.join(archive.ltcg_members)}")
+            failed = True
+        elif args.expect and crts - {args.expect}:
+            print(f"  FAIL: {path.name}: found {', '.join(sorted(crts - {args.expect}))} "
+                  f"(expected only {args.expect})")
+            failed = True
+        elif crts:
+            print(f"  OK: {path.name} -> {', '.join(sorted(crts))}")
+        else:
+            print(f"  SKIP: {path.name} (no CRT directives found)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Compiler cache (ccache / sccache) integration.
+
+With `--compiler-cache`, every compiler invocation that goes through a
+launcher-capable build system is prefixed with ccache or sccache:
+
+- CMake (Ninja generators): CMAKE_C/CXX_COMPILER_LAUNCHER;
+- Autotools: CC="ccache gcc", CXX="ccache g++";
+- Meson: the compilers in the generated native/cross file become
+  ['ccache', 'cc'] arrays.
+
+Builds that compile through MSBuild cannot use a launcher: the Visual Studio
+CMake generator on Windows and libvpx's MSYS2 configure (vs17 target) invoke
+cl.exe from MSBuild project files, so they build uncached.
+
+Unlike the artifact cache, this helps when a library's fingerprint changed:
+after a submodule bump most translation units are unchanged and hit the
+cache. Hits and misses of the run are reported at the end of the build.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+TOOLS = ("ccache", "sccache")
+
+_active: Optional["CompilerCache"] = None
+
+
+class CompilerCache:
+    """One compiler cache tool, configured for the whole run."""
+
+    def __init__(self, tool: str, executable: str, cache_dir: Optional[Path]):
+        self.tool = tool
+        self.executable = executable
+        self.cache_dir = cache_dir
+        self._stats_before: Optional[tuple[int, int]] = None
+
+    def environment(self, root_dir: Path) -> dict[str, str]:
+        """Variables every build command needs to share one cache."""
+        env = {}
+        if self.tool == "ccache":
+            if self.cache_dir is not None:
+                env["CCACHE_DIR"] = str(self.cache_dir)
+            # Hash paths relative to the checkout so other clones (CI agents,
+            # worktrees) hit the same entries.
+            env["CCACHE_BASEDIR"] = str(root_dir)
+        elif self.cache_dir is not None:
+            env["SCCACHE_DIR"] = str(self.cache_dir)
+        return env
+
+    def wrap(self, compiler: str) -> str:
+        """Command line running `compiler` through the cache (for CC/CXX variables)."""
+        return f"{self.executable} {compiler}"
+
+    def stats(self) -> Optional[tuple[int, int]]:
+        """Cumulative (hits, misses) of the cache, or None if unavailable."""
+        if self.tool == "ccache":
+            return self._ccache_stats()
+        return self._sccache_stats()
+
+    def _ccache_stats(self) -> Optional[tuple[int, int]]:
+        # `--print-stats` (ccache 4.x) prints machine-readable "key\tvalue" lines.
+        output = _capture([self.executable, "--print-stats"])
+        if output is None:
+            return None
+        values = {}
+        for line in output.splitlines():
+            key, _, value = line.partition("\t")
+            if value.strip().isdigit():
+                values[key] = int(value)
+        hits = values.get("direct_cache_hit", 0) + values.get("preprocessed_cache_hit", 0)
+        misses = values.get("cache_miss", 0)
+        return hits, misses
+
+    def _sccache_stats(self) -> Optional[tuple[int, int]]:
+        output = _capture([self.executable, "--show-stats", "--stats-format=json"])
+        if output is None:
+            return None
+        try:
+            stats = json.loads(output)["stats"]
+            hits = sum(stats["cache_hits"]["counts"].values())
+            misses = sum(stats["cache_misses"]["counts"].values())
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+        return hits, misses
+
+    def start(self) -> None:
+        self._stats_before = self.stats()
+
+    def report(self) -> None:
+        """Print this run's hits and misses."""
+        after = self.stats()
+        if after is None or self._stats_before is None:
+            print(f"{self.tool}: statistics unavailable")
+            return
+        hits = after[0] - self._stats_before[0]
+        misses = after[1] - self._stats_before[1]
+        total = hits + misses
+        rate = f" ({hits / total:.0%} hit rate)" if total else ""
+        print(f"{self.tool}: {hits} hits, {misses} misses{rate}")
+
+
+def _capture(cmd: list[str]) -> Optional[str]:
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def find_compiler_cache(choice: str, cache_dir: Optional[str]) -> Optional[CompilerCache]:
+    """Resolve --compiler-cache ("ccache", "sccache" or "auto": first one on PATH).
+
+    Returns None when the requested tool is not installed.
+    """
+    candidates = TOOLS if choice == "auto" else (choice,)
+    for tool in candidates:
+        executable = shutil.which(tool)
+        if executable:
+            directory = Path(cache_dir).expanduser().resolve() if cache_dir else None
+            return CompilerCache(tool, executable, directory)
+    return None
+
+
+def active() -> Optional[CompilerCache]:
+    """The compiler cache of the running build, or None."""
+    return _active
+
+
+@contextmanager
+def use_compiler_cache(cache: Optional[CompilerCache], root_dir: Path) -> Iterator[None]:
+    """Enable `cache` for every builder (and inherit its settings in children)."""
+    global _active
+    if cache is None:
+        yield
+        return
+    # Exported process-wide so commands run with a derived environment (the
+    # MSVC environment, make/meson children) inherit the cache settings.
+    saved = {key: os.environ.get(key) for key in cache.environment(root_dir)}
+    os.environ.update(cache.environment(root_dir))
+    if cache.tool == "sccache" and cache.cache_dir is not None:
+        # A server started earlier would keep its own SCCACHE_DIR.
+        _capture([cache.executable, "--stop-server"])
+    cache.start()
+    _active = cache
+    try:
+        yield
+    finally:
+        _active = None
+        cache.report()
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def meson_compiler(compiler: str) -> str:
+    """Meson native/cross-file value for `compiler`, through the cache if active."""
+    if _active is None:
+        return f"'{compiler}'"
+    executable = _active.executable.replace("\\", "\\\\").replace("'", "\\'")
+    return f"['{executable}', '{compiler}']"
@@ -3,14 +3,42 @@ Configuration classes for the build system.
 """
 
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
+import hashlib
 import os
+import pickle
 import platform
 import re
-import yaml
 
+REGISTRY_INDEX_FILENAME = ".registry-index.pickle"
 
+# The Chromium checkout of build_cef.py (kept by `build.py --clean` if it is
+# found under builds/).
+CEF_CHECKOUT_DIRNAME = "cef-chromium"
+
+# Bump when the index layout or the Library fields change.
+_REGISTRY_INDEX_VERSION = 1
+
+_PLATFORMS = ("linux", "macos", "windows")
+
+
+def _load_yaml(path: Path):
+    # Imported here: with a current registry index no YAML is parsed at all.
+    import yaml
+
+    # libyaml's parser when PyYAML was built with it, several times faster.
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=loader)
+
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+@lru_cache(maxsize=None)
 def detect_libc_tag() -> str:
     """Best-effort libc identity of the *build host*, used to tag Linux output dirs.
 
@@ -27,7 +55,8 @@ def detect_libc_tag() -> str:
     an *old* glibc (a manylinux container or a sysroot); see AGENTS.md.
 
     Returns a token like ``glibc2.35`` or ``musl1.2``, or ``""`` when the libc
-    cannot be identified (the caller then omits the token).
+    cannot be identified (the caller then omits the token). Computed once per
+    process: the ``platform.libc_ver`` fallback reads the interpreter binary.
     """
     # CS_GNU_LIBC_VERSION yields "glibc 2.35" on glibc hosts. The key is absent
     # on musl (Alpine), where confstr raises ValueError or returns None.
@@ -52,27 +81,47 @@ def detect_libc_tag() -> str:
     return ""
 
 
-@dataclass
+@dataclass(frozen=True)
+class LibraryPaths:
+    """Resolved directories of one library under a BuildConfig."""
+
+    source_dir: Path
+    build_dir: Path
+    install_dir: Path
+
+
+@dataclass(frozen=True)
 class BuildConfig:
-    """Global build configuration."""
+    """Global build configuration.
+
+    Frozen: the platform, build suffix and directories are resolved once in
+    ``__post_init__`` and then read many times per library.
+    """
 
     arch: str = "x86_64"
     build_type: str = "Release"
     macos_sdk: Optional[str] = None  # Required on macOS
     runtime_lib: str = "MD"  # Windows only: MD or MT
     root_dir: Path = field(default_factory=Path.cwd)
+    # Per-library cap on concurrent link steps (Ninja job pool / meson
+    # backend_max_links). Links of large C++ projects are the memory peak.
+    link_jobs: Optional[int] = None
+
+    _platform_name: str = field(init=False, repr=False, compare=False)
+    _build_suffix: str = field(init=False, repr=False, compare=False)
+    _library_paths: dict = field(init=False, repr=False, compare=False, default_factory=dict)
 
     def __post_init__(self):
         if isinstance(self.root_dir, str):
-            self.root_dir = Path(self.root_dir)
+            object.__setattr__(self, "root_dir", Path(self.root_dir))
+        system = platform.system().lower()
+        object.__setattr__(self, "_platform_name", "macos" if system == "darwin" else system)
+        object.__setattr__(self, "_build_suffix", self._compute_build_suffix())
 
     @property
     def platform_name(self) -> str:
         """Get the platform name (linux, macos, windows)."""
-        system = platform.system().lower()
-        if system == "darwin":
-            return "macos"
-        return system
+        return self._platform_name
 
     @property
     def platform_triplet(self) -> str:
@@ -81,7 +130,11 @@ class BuildConfig:
 
     @property
     def build_suffix(self) -> str:
-        """Get the output/builds directory name for this configuration.
+        """Get the output/builds directory name for this configuration."""
+        return self._build_suffix
+
+    def _compute_build_suffix(self) -> str:
+        """Compute the output/builds directory name for this configuration.
 
         Grammar (unified across OSes): ``{os}.{arch}-{build_type}[-{os_tag}]``,
         where the OS-specific tag encodes whatever else changes the ABI of the
@@ -119,6 +172,18 @@ class BuildConfig:
         """Get the builds directory."""
         return self.root_dir / "builds" / self.build_suffix
 
+    def library_paths(self, lib: "Library") -> LibraryPaths:
+        """Source, build and install directories of `lib` (resolved once per library)."""
+        paths = self._library_paths.get(lib.name)
+        if paths is None:
+            paths = LibraryPaths(
+                source_dir=self.root_dir / lib.get_source_dir(self.platform_name),
+                build_dir=self.builds_dir / lib.name,
+                install_dir=self.output_dir,
+            )
+            self._library_paths[lib.name] = paths
+        return paths
+
     def validate(self) -> list[str]:
         """Validate the configuration. Returns list of errors."""
         errors = []
@@ -139,6 +204,9 @@ class BuildConfig:
                 f"Invalid runtime_lib '{self.runtime_lib}'. Must be 'MD' or 'MT'."
             )
 
+        if self.link_jobs is not None and self.link_jobs < 1:
+            errors.append(f"Invalid link_jobs '{self.link_jobs}'. Must be 1 or more.")
+
         return errors
 
 
@@ -161,9 +229,11 @@ class Library:
     @classmethod
     def from_yaml(cls, yaml_path: Path) -> "Library":
         """Load a library configuration from a YAML file."""
-        with open(yaml_path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
+        return cls.from_dict(_load_yaml(yaml_path))
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "Library":
+        """Create a library configuration from its parsed YAML."""
         return cls(
             name=data["name"],
             source_dir=data.get("source_dir", f"repositories/{data['name']}"),
@@ -304,6 +374,22 @@ class Library:
 
         return options
 
+    def get_autotools_options(self, platform_name: str) -> dict:
+        """Get merged autotools/configure options for a specific platform.
+
+        Args:
+            platform_name: The target platform (linux, macos, windows)
+        """
+        options = dict(self.autotools_options)
+
+        # Merge platform-specific options
+        if platform_name in self.platforms:
+            platform_config = self.platforms[platform_name]
+            platform_opts = platform_config.get("autotools_options", {})
+            options.update(platform_opts)
+
+        return options
+
     def get_extra_c_flags(self, platform_name: str) -> str:
         """Get extra C flags to append for this library on a specific platform.
 
@@ -354,14 +440,109 @@ class Library:
 
 
 class LibraryRegistry:
-    """Registry of all available libraries."""
+    """Registry of all available libraries.
 
-    def __init__(self, libraries_dir: Path):
+    With an `index_path`, the parsed YAML files, the per-platform build
+    orders and the dependency closures are kept in a pickled index. It is
+    reused as long as every YAML file has the same mtime and size, or the
+    same content hash, as when the index was written.
+    """
+
+    def __init__(self, libraries_dir: Path, index_path: Optional[Path] = None):
         self.libraries_dir = libraries_dir
+        self.index_path = index_path
         self._libraries: dict[str, Library] = {}
+        # Parsed YAML of every library, as stored in the index.
+        self._raw: dict[str, dict] = {}
         self._build_order: list[str] = []
-        self._load_libraries()
-        self._load_build_order()
+        # platform -> library names in build order, and
+        # platform -> {library: its enabled transitive dependencies}
+        self._orders: dict[str, list[str]] = {}
+        self._closures: dict[str, dict[str, list[str]]] = {}
+        if not self._load_index():
+            # Stat before parsing: an edit made meanwhile invalidates the index.
+            stats = self._yaml_files() if index_path is not None else {}
+            self._load_libraries()
+            self._load_build_order()
+            self._write_index(
+                {
+                    name: (st.st_mtime_ns, st.st_size, _sha256(self.libraries_dir / name))
+                    for name, st in stats.items()
+                }
+            )
+
+    def _yaml_files(self) -> dict[str, os.stat_result]:
+        if not self.libraries_dir.is_dir():
+            return {}
+        return {
+            entry.name: entry.stat()
+            for entry in os.scandir(self.libraries_dir)
+            if entry.name.endswith(".yaml") and entry.is_file()
+        }
+
+    def _load_index(self) -> bool:
+        """Load the registry from the index if it is still current."""
+        if self.index_path is None:
+            return False
+        try:
+            with open(self.index_path, "rb") as f:
+                index = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return False
+        if not isinstance(index, dict) or index.get("version") != _REGISTRY_INDEX_VERSION:
+            return False
+
+        stats = self._yaml_files()
+        files = index["files"]
+        if set(stats) != set(files):
+            return False
+        touched = False
+        for name, st in stats.items():
+            mtime_ns, size, digest = files[name]
+            if (st.st_mtime_ns, st.st_size) == (mtime_ns, size):
+                continue
+            # A checkout or `touch` changes mtimes but not content.
+            if st.st_size != size or _sha256(self.libraries_dir / name) != digest:
+                return False
+            files[name] = (st.st_mtime_ns, size, digest)
+            touched = True
+
+        self._raw = index["libraries"]
+        self._libraries = {name: Library.from_dict(data) for name, data in self._raw.items()}
+        self._build_order = index["build_order"]
+        self._orders = index["orders"]
+        self._closures = index["closures"]
+        if touched:
+            self._write_index(files)
+        return True
+
+    def _write_index(self, files: dict) -> None:
+        """Precompute every platform's order and closures and save the index."""
+        if self.index_path is None:
+            return
+        for platform_name in _PLATFORMS:
+            try:
+                self._order_names(platform_name)
+                self._closures_for(platform_name)
+            except ValueError:
+                # Circular dependency: reported when that platform is used.
+                pass
+        index = {
+            "version": _REGISTRY_INDEX_VERSION,
+            "files": files,
+            "libraries": self._raw,
+            "build_order": self._build_order,
+            "orders": self._orders,
+            "closures": self._closures,
+        }
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.index_path)
+        except OSError:
+            pass
 
     def _load_libraries(self):
         """Load all library configurations from YAML files."""
@@ -372,8 +553,10 @@ class LibraryRegistry:
             # Skip special files starting with _
             if yaml_file.name.startswith("_"):
                 continue
-            lib = Library.from_yaml(yaml_file)
+            data = _load_yaml(yaml_file)
+            lib = Library.from_dict(data)
             self._libraries[lib.name] = lib
+            self._raw[lib.name] = data
 
     def _load_build_order(self):
         """Load build order configuration if available."""
@@ -381,8 +564,7 @@ class LibraryRegistry:
         if not order_file.exists():
             return
 
-        with open(order_file, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
+        data = _load_yaml(order_file)
 
         if data and "order" in data:
             self._build_order = data["order"]
@@ -401,6 +583,12 @@ class LibraryRegistry:
         Uses the configured build order as a base, then applies topological
         sort to ensure dependencies are built first.
         """
+        return [self._libraries[name] for name in self._order_names(platform_name)]
+
+    def _order_names(self, platform_name: str) -> list[str]:
+        if platform_name in self._orders:
+            return self._orders[platform_name]
+
         enabled = {
             lib.name: lib
             for lib in self._libraries.values()
@@ -442,34 +630,48 @@ class LibraryRegistry:
 
             temp_mark.remove(lib_name)
             visited.add(lib_name)
-            ordered.append(lib)
+            ordered.append(lib_name)
 
         # Visit libraries in base order to maintain preferred ordering
         for lib_name in base_order:
             if lib_name not in visited:
                 visit(lib_name)
 
+        self._orders[platform_name] = ordered
         return ordered
 
+    def _closures_for(self, platform_name: str) -> dict[str, list[str]]:
+        """Every library's transitive dependencies that are enabled on the platform."""
+        if platform_name in self._closures:
+            return self._closures[platform_name]
+
+        closures: dict[str, list[str]] = {}
+        for name, lib in self._libraries.items():
+            deps = set()
+            pending = list(lib.depends_on)
+            while pending:
+                dep_name = pending.pop()
+                dep = self._libraries.get(dep_name)
+                if dep and dep.is_enabled_for_platform(platform_name) and dep_name not in deps:
+                    deps.add(dep_name)
+                    pending.extend(dep.depends_on)
+            closures[name] = sorted(deps)
+
+        self._closures[platform_name] = closures
+        return closures
+
+    def get_dependents(self, name: str, platform_name: str) -> list[Library]:
+        """Libraries that depend on `name`, directly or not, in build order."""
+        closures = self._closures_for(platform_name)
+        return [l for l in self.get_build_order(platform_name) if name in closures[l.name]]
+
     def get_with_dependencies(
         self, name: str, platform_name: str
     ) -> list[Library]:
         """Get a library and all its dependencies in build order."""
-        lib = self._libraries.get(name)
-        if not lib:
+        if name not in self._libraries:
             return []
 
-        deps = set()
-
-        def collect_deps(library: Library):
-            for dep_name in library.depends_on:
-                dep = self._libraries.get(dep_name)
-                if dep and dep.is_enabled_for_platform(platform_name):
-                    deps.add(dep_name)
-                    collect_deps(dep)
-
-        collect_deps(lib)
-
-        # Get ordered list
-        all_ordered = self.get_build_order(platform_name)
-        return [l for l in all_ordered if l.name in deps or l.name == name]
+        wanted = set(self._closures_for(platform_name)[name])
+        wanted.add(name)
+        return [l for l in self.get_build_order(platform_name) if l.name in wanted]
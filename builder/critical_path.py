@@ -0,0 +1,171 @@
+"""
+Critical-path analysis of the library dependency graph.
+
+Combines the `depends_on` graph of a build set with the build times recorded
+by previous runs (see `timing.load_durations`). For every library it derives:
+
+- the earliest start: the longest chain of dependencies before it;
+- the bottom level: its own time plus the longest chain of libraries that
+  depend on it, i.e. the minimum time left once it starts;
+- the slack: how long it can be delayed without lengthening the build.
+
+The critical path is the chain of zero-slack libraries; no schedule can beat
+it, nor the total work divided by the number of jobs. The scheduler starts
+ready libraries by decreasing bottom level so long chains (spirv-tools ->
+glslang, the audio codecs feeding libsndfile) begin as early as possible.
+"""
+
+import heapq
+import os
+import statistics
+from dataclasses import dataclass
+
+from .config import Library
+from .timing import format_duration
+
+# Assumed build time of a library that has never been timed, when no other
+# library has been timed either.
+_DEFAULT_DURATION = 60.0
+
+
+@dataclass
+class LibraryEstimate:
+    name: str
+    duration: float
+    measured: bool
+    earliest_start: float = 0.0
+    bottom_level: float = 0.0
+    slack: float = 0.0
+
+
+class CriticalPathAnalysis:
+    """Critical path, slack and wall-clock bounds of one build set."""
+
+    def __init__(self, libraries: list[Library], durations: dict[str, float]):
+        # `libraries` is in dependency order (registry build order).
+        names = [lib.name for lib in libraries]
+        in_set = set(names)
+        self.order = names
+        self.deps = {
+            lib.name: [dep for dep in lib.depends_on if dep in in_set] for lib in libraries
+        }
+        self.dependents: dict[str, list[str]] = {name: [] for name in names}
+        for name, deps in self.deps.items():
+            for dep in deps:
+                self.dependents[dep].append(name)
+
+        known = [durations[name] for name in names if name in durations]
+        self.default_duration = statistics.median(known) if known else _DEFAULT_DURATION
+        self.libraries = {
+            name: LibraryEstimate(
+                name,
+                durations.get(name, self.default_duration),
+                measured=name in durations,
+            )
+            for name in names
+        }
+        self._compute()
+
+    def _compute(self) -> None:
+        libs = self.libraries
+        for name in self.order:
+            lib = libs[name]
+            lib.earliest_start = max(
+                (libs[dep].earliest_start + libs[dep].duration for dep in self.deps[name]),
+                default=0.0,
+            )
+        for name in reversed(self.order):
+            lib = libs[name]
+            lib.bottom_level = lib.duration + max(
+                (libs[child].bottom_level for child in self.dependents[name]), default=0.0
+            )
+        self.length = max((lib.bottom_level for lib in libs.values()), default=0.0)
+        for lib in libs.values():
+            lib.slack = self.length - lib.earliest_start - lib.bottom_level
+
+        # Walk the critical path from its zero-slack source, always following
+        # the dependent with the largest bottom level.
+        self.critical_path: list[str] = []
+        current = max(
+            (name for name in self.order if not self.deps[name]),
+            key=lambda name: libs[name].bottom_level,
+            default=None,
+        )
+        while current is not None:
+            self.critical_path.append(current)
+            current = max(
+                self.dependents[current],
+                key=lambda name: libs[name].bottom_level,
+                default=None,
+            )
+
+    @property
+    def total_work(self) -> float:
+        return sum(lib.duration for lib in self.libraries.values())
+
+    @property
+    def priorities(self) -> dict[str, float]:
+        """Bottom level per library, the scheduler's start priority."""
+        return {name: lib.bottom_level for name, lib in self.libraries.items()}
+
+    def lower_bound(self, jobs: int) -> float:
+        """No schedule on `jobs` slots finishes sooner than this."""
+        return max(self.length, self.total_work / jobs)
+
+    def simulate(self, jobs: int) -> float:
+        """Wall time of the scheduler's own policy (bottom level first) on `jobs` slots."""
+        libs = self.libraries
+        waiting = {name: len(deps) for name, deps in self.deps.items()}
+        ready = [(-libs[name].bottom_level, name) for name, count in waiting.items() if not count]
+        heapq.heapify(ready)
+        running: list[tuple[float, str]] = []
+        now = 0.0
+        while ready or running:
+            while ready and len(running) < jobs:
+                _, name = heapq.heappop(ready)
+                heapq.heappush(running, (now + libs[name].duration, name))
+            now, done = heapq.heappop(running)
+            for child in self.dependents[done]:
+                waiting[child] -= 1
+                if not waiting[child]:
+                    heapq.heappush(ready, (-libs[child].bottom_level, child))
+        return now
+
+    def print_report(self, jobs: int, durations_source: str) -> None:
+        libs = self.libraries
+        measured = sum(1 for lib in libs.values() if lib.measured)
+
+        print(f"\n{'=' * 20} Critical path analysis {'=' * 20}\n")
+        print(f"Timings: {measured} of {len(libs)} libraries measured ({durations_source})")
+        if measured < len(libs):
+            print(
+                f"         the others (*) are estimated at {format_duration(self.default_duration)}"
+            )
+
+        print(f"\nCritical path ({format_duration(self.length)}):")
+        for name in self.critical_path:
+            print(f"  {name:<24} {format_duration(libs[name].duration):>8}")
+
+        width = max(len("Library"), *(len(name) for name in libs))
+        print(f"\n{'Library':<{width}}  {'duration':>9}  {'start':>9}  {'slack':>9}")
+        print("-" * (width + 33))
+        for lib in sorted(libs.values(), key=lambda l: (l.slack, -l.duration, l.name)):
+            mark = "" if lib.measured else " *"
+            print(
+                f"{lib.name:<{width}}  {format_duration(lib.duration):>9}  "
+                f"{format_duration(lib.earliest_start):>9}  {format_duration(lib.slack):>9}{mark}"
+            )
+
+        print(f"\nTotal work: {format_duration(self.total_work)}")
+        print("Best possible wall-clock time, max(critical path, work / jobs):\n")
+        print(f"  {'jobs':>5}  {'bound':>9}  {'scheduled':>9}")
+        job_counts = sorted({1, 2, 4, 8, 16, jobs, os.cpu_count() or 1})
+        for count in job_counts:
+            print(
+                f"  {count:>5}  {format_duration(self.lower_bound(count)):>9}  "
+                f"{format_duration(self.simulate(count)):>9}"
+            )
+        print(
+            "\n'scheduled' replays the scheduler's policy (longest remaining chain "
+            "first) on the recorded times."
+        )
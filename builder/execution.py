@@ -0,0 +1,145 @@
+"""
+Command execution and output routing shared by the builders.
+
+By default every builder prints to the console and its commands inherit the
+console, exactly like a plain serial build. When the scheduler runs several
+libraries at once, each worker thread binds its own log file with
+`job_output()`: everything the builder prints and every command it spawns
+then lands in that library's log instead of interleaving on the terminal.
+"""
+
+import os
+import subprocess
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator, Optional
+
+from .timing import add_metric
+
+# Serializes the writes into the shared install prefix. Installs, post-install
+# hooks and validation work in each library's private stage; only publishing
+# the staged files (builder.staging) takes this lock, so two libraries that
+# install the same path cannot interleave their files and manifests.
+install_lock = threading.RLock()
+
+_local = threading.local()
+
+
+class _ThreadRoutedStream:
+    """File-like proxy that sends writes to the calling thread's job log.
+
+    Threads without a bound log (the main thread, the status display) write
+    to the wrapped console stream unchanged.
+    """
+
+    def __init__(self, console: IO[str]):
+        self.console = console
+
+    def _target(self) -> IO[str]:
+        return getattr(_local, "log", None) or self.console
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def isatty(self) -> bool:
+        return self._target().isatty()
+
+    def fileno(self) -> int:
+        return self._target().fileno()
+
+    def __getattr__(self, name: str):
+        return getattr(self.console, name)
+
+
+def install_output_routing() -> None:
+    """Route sys.stdout/sys.stderr through the per-thread job log, once."""
+    if not isinstance(sys.stdout, _ThreadRoutedStream):
+        sys.stdout = _ThreadRoutedStream(sys.stdout)
+    if not isinstance(sys.stderr, _ThreadRoutedStream):
+        sys.stderr = _ThreadRoutedStream(sys.stderr)
+
+
+def console() -> IO[str]:
+    """The real terminal stream, bypassing any per-thread job log."""
+    stream = sys.stdout
+    if isinstance(stream, _ThreadRoutedStream):
+        return stream.console
+    return stream
+
+
+@contextmanager
+def job_output(log_path: Path) -> Iterator[IO[str]]:
+    """Bind `log_path` as the current thread's output for the duration."""
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "w", encoding="utf-8", errors="replace", buffering=1) as log:
+        previous = getattr(_local, "log", None)
+        _local.log = log
+        try:
+            yield log
+        finally:
+            _local.log = previous
+
+
+def current_log() -> Optional[IO[str]]:
+    """The log file bound to the calling thread, or None on the console."""
+    return getattr(_local, "log", None)
+
+
+def run_command(
+    cmd: list[str],
+    cwd: Optional[Path] = None,
+    env: Optional[dict] = None,
+    display: Optional[str] = None,
+    pass_fds: tuple[int, ...] = (),
+) -> bool:
+    """Run a command and return success status.
+
+    Output goes to the current job log when one is bound (stderr merged into
+    it), otherwise straight to the console. `display` overrides the echoed
+    "Running: ..." line (e.g. to show a bash script instead of `bash -lc`).
+    `pass_fds` keeps extra descriptors open in the child (jobserver pipes).
+    The command's CPU time and peak RSS are added to the current library's
+    timing metrics where the OS reports them.
+    """
+    print(display or f"Running: {' '.join(cmd)}")
+    log = current_log()
+    if log is not None:
+        log.flush()
+        output = {"stdout": log, "stderr": subprocess.STDOUT}
+    else:
+        output = {}
+    if pass_fds:
+        output["pass_fds"] = pass_fds
+    try:
+        returncode = _run_measured(cmd, cwd, env, output)
+    except FileNotFoundError:
+        print(f"Command not found: {cmd[0]}", file=sys.stderr)
+        return False
+    if returncode != 0:
+        print(f"Command failed with return code {returncode}", file=sys.stderr)
+        return False
+    return True
+
+
+def _run_measured(cmd: list[str], cwd: Optional[Path], env: Optional[dict], output: dict) -> int:
+    """Run `cmd` to completion and record its resource usage; returns the exit code.
+
+    POSIX reaps the child with wait4() to get the rusage of the command and
+    every descendant it waited for (the compilers under make/ninja). Other
+    platforms only get the exit code.
+    """
+    with subprocess.Popen(cmd, cwd=cwd, env=env, **output) as proc:
+        if not hasattr(os, "wait4"):
+            return proc.wait()
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    add_metric("cpu_seconds", usage.ru_utime + usage.ru_stime)
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS.
+    max_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    add_metric("peak_rss_bytes", max_rss, peak=True)
+    return proc.returncode
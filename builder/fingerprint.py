@@ -0,0 +1,201 @@
+"""
+Input fingerprints used to skip libraries that are already up to date.
+
+A library's fingerprint hashes everything that decides what its install step
+produces: the source revision, the patch, the merged build options, the
+platform flags, the toolchain and — recursively — the fingerprints of the
+libraries it depends on. After a successful build the fingerprint is stored
+next to the install; a later run whose computed fingerprint matches the
+stored one skips the library entirely.
+
+The fingerprint names the install prefix relative to the checkout, so the
+artifact cache (which relocates the prefix in installed text files) is
+shared between checkouts at different paths. The stored stamps also record
+the absolute prefix: a checkout that was moved does not take its installed
+files, which still name the old path, as up to date.
+"""
+
+import hashlib
+import json
+import subprocess
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from .autotools_builder import _toolchain_signature
+from .cmake_builder import PatchManager
+from .config import BuildConfig, Library, LibraryRegistry
+from .manifest import STATE_DIRNAME
+
+if TYPE_CHECKING:
+    from .platforms.base import Platform
+
+# Bump when the builders change what they produce for identical inputs, to
+# invalidate every stored fingerprint at once.
+FINGERPRINT_VERSION = 1
+
+_TEST_STAMP = "DependenciesTest"
+
+
+def _source_revision(source_dir: Path) -> str:
+    """Identify the exact source content of `source_dir`.
+
+    Uses the git tree object of the directory, which covers both submodules
+    (their HEAD tree) and sources vendored in this repository or living in a
+    subdirectory of a submodule (only that subtree counts). Falls back to the
+    HEAD commit, then to "unknown" outside of git.
+    """
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD:./"],
+            cwd=source_dir,
+            capture_output=True,
+            text=True,
+        )
+    except (FileNotFoundError, NotADirectoryError):
+        return "unknown"
+    if result.returncode == 0 and result.stdout.strip():
+        return result.stdout.strip()
+    return PatchManager._current_source_commit(source_dir) or "unknown"
+
+
+def _hash_file(path: Path) -> Optional[str]:
+    if not path.is_file():
+        return None
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class Fingerprinter:
+    """Computes, stores and checks library input fingerprints for one configuration."""
+
+    def __init__(
+        self,
+        config: BuildConfig,
+        platform: "Platform",
+        registry: LibraryRegistry,
+    ):
+        self.config = config
+        self.platform = platform
+        self.registry = registry
+        self.state_dir = config.output_dir / STATE_DIRNAME
+        self._fingerprints: dict[str, str] = {}
+        self._toolchain: Optional[str] = None
+
+    def _toolchain_signature(self) -> str:
+        if self._toolchain is None:
+            self._toolchain = _toolchain_signature(self.config.platform_name)
+        return self._toolchain
+
+    def inputs(self, lib: Library) -> dict:
+        """Everything that feeds the library's build, as a JSON-able dict."""
+        config = self.config
+        platform_name = config.platform_name
+        build_system = lib.get_build_system(platform_name)
+        source_dir = config.library_paths(lib).source_dir
+
+        if build_system == "meson":
+            options = lib.get_meson_options(platform_name)
+        elif build_system in ("autotools", "msys2"):
+            options = lib.get_autotools_options(platform_name)
+        else:
+            options = lib.get_cmake_options(platform_name, config.runtime_lib)
+
+        platform_config = lib.platforms.get(platform_name, {})
+        dependencies = {}
+        for dep_name in sorted(lib.depends_on):
+            dep = self.registry.get(dep_name)
+            if dep and dep.is_enabled_for_platform(platform_name):
+                dependencies[dep_name] = self.fingerprint(dep)
+
+        return {
+            "version": FINGERPRINT_VERSION,
+            "build_suffix": config.build_suffix,
+            "build_type": config.build_type,
+            "arch": config.arch,
+            "runtime_lib": config.runtime_lib,
+            "macos_sdk": config.macos_sdk,
+            # Relative: cache archives are relocated to the absolute prefix.
+            "install_prefix": config.output_dir.relative_to(config.root_dir).as_posix(),
+            "build_system": build_system,
+            "source_dir": lib.get_source_dir(platform_name),
+            "source_revision": _source_revision(source_dir),
+            "patch": _hash_file(config.root_dir / "patches" / f"{lib.name}.patch"),
+            "options": options,
+            "languages": lib.languages,
+            "use_install_prefix_as_find_root": lib.use_install_prefix_as_find_root,
+            "extra_c_flags": lib.get_extra_c_flags(platform_name),
+            "extra_cxx_flags": lib.get_extra_cxx_flags(platform_name),
+            "cross_compile_targets": platform_config.get("cross_compile_targets", {}),
+            "platform": {
+                "generator": self.platform.get_generator(),
+                "cmake_options": self.platform.get_platform_cmake_options(config),
+                "c_flags": self.platform.get_c_flags(config),
+                "cxx_flags": self.platform.get_cxx_flags(config),
+            },
+            "toolchain": self._toolchain_signature(),
+            "dependencies": dependencies,
+        }
+
+    def fingerprint(self, lib: Library) -> str:
+        """SHA-256 of the library's inputs (memoized per run)."""
+        cached = self._fingerprints.get(lib.name)
+        if cached is None:
+            payload = json.dumps(self.inputs(lib), sort_keys=True, default=str)
+            cached = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+            self._fingerprints[lib.name] = cached
+        return cached
+
+    def _stamp(self, name: str) -> Path:
+        return self.state_dir / f"{name}.fingerprint"
+
+    def _stamp_lines(self, fingerprint: str) -> list[str]:
+        return [fingerprint, self.config.output_dir.absolute().as_posix()]
+
+    def _stamp_matches(self, name: str, fingerprint: str) -> bool:
+        stamp = self._stamp(name)
+        if not stamp.is_file():
+            return False
+        return stamp.read_text(encoding="utf-8").splitlines() == self._stamp_lines(fingerprint)
+
+    def _write_stamp(self, name: str, fingerprint: str) -> None:
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self._stamp(name).write_text(
+            "\n".join(self._stamp_lines(fingerprint)) + "\n", encoding="utf-8"
+        )
+
+    def is_up_to_date(self, lib: Library) -> bool:
+        """True when the stored fingerprint matches the current inputs."""
+        return self._stamp_matches(lib.name, self.fingerprint(lib))
+
+    def invalidate(self, lib: Library) -> None:
+        """Drop the stored fingerprint before rebuilding.
+
+        An interrupted rebuild leaves a half-updated install behind; without
+        this, reverting the inputs afterwards would match the old stamp and
+        skip a library whose files no longer correspond to it.
+        """
+        self._stamp(lib.name).unlink(missing_ok=True)
+
+    def record(self, lib: Library) -> None:
+        """Store the fingerprint after a successful build and install."""
+        self._write_stamp(lib.name, self.fingerprint(lib))
+
+    def _test_fingerprint(self, libraries: list[Library]) -> str:
+        """Fingerprint of a whole library set plus the link test's own sources."""
+        digest = hashlib.sha256()
+        for lib in sorted(libraries, key=lambda l: l.name):
+            digest.update(f"{lib.name}={self.fingerprint(lib)}\n".encode("utf-8"))
+        root_dir = self.config.root_dir
+        sources = [root_dir / "CMakeLists.txt", *sorted((root_dir / "src").rglob("*"))]
+        for path in sources:
+            file_hash = _hash_file(path)
+            if file_hash:
+                digest.update(f"{path.relative_to(root_dir).as_posix()}={file_hash}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def test_passed(self, libraries: list[Library]) -> bool:
+        """True when the dependencies test already passed for this exact set."""
+        return self._stamp_matches(_TEST_STAMP, self._test_fingerprint(libraries))
+
+    def record_test(self, libraries: list[Library]) -> None:
+        """Remember that the dependencies test passed for this set."""
+        self._write_stamp(_TEST_STAMP, self._test_fingerprint(libraries))
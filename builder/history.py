@@ -0,0 +1,236 @@
+"""
+Persistent build history with regression detection.
+
+Every build.py run appends one row per library it built (or restored) to a
+SQLite database in the artifact cache directory, outside the repository so
+`--clean` keeps it: the total and per-phase times, CPU time and peak RSS of
+its commands, the number and size of the static libraries it installed with
+their object count, and the size of its cache archive. Rows are keyed by
+`build_suffix`, host and the source (submodule) commit.
+
+A library regresses when its latest build is slower, or its output larger,
+than the median of its previous builds on the same host and configuration
+by more than a threshold. Regressions are printed after each build and by
+`build.py --history`.
+"""
+
+import socket
+import sqlite3
+import statistics
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+
+from .cmake_builder import PatchManager
+from .config import BuildConfig, Library
+from .timing import BuildTimings, format_duration
+
+HISTORY_FILENAME = "history.sqlite"
+
+# Builds compared against: the median of this many previous builds.
+_WINDOW = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    host TEXT NOT NULL,
+    build_suffix TEXT NOT NULL,
+    jobs INTEGER NOT NULL,
+    wall_seconds REAL NOT NULL,
+    success INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS library_builds (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    library TEXT NOT NULL,
+    source_sha TEXT,
+    outcome TEXT NOT NULL,
+    total_seconds REAL NOT NULL,
+    cpu_seconds REAL,
+    peak_rss_bytes INTEGER,
+    static_libs INTEGER,
+    objects INTEGER,
+    static_lib_bytes INTEGER,
+    cache_archive_bytes INTEGER
+);
+CREATE TABLE IF NOT EXISTS phases (
+    build_id INTEGER NOT NULL REFERENCES library_builds(id),
+    phase TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS library_builds_by_library ON library_builds(library, run_id);
+"""
+
+
+def _mib(value: float) -> str:
+    return f"{value / (1 << 20):.1f} MiB"
+
+
+# (column, label, formatter, minimum absolute increase) of the metrics
+# checked for regressions. The minimum keeps a 2s library taking 3s, or a
+# header-only package growing by a few KiB, from being reported.
+_TRACKED = [
+    ("total_seconds", "build time", format_duration, 10.0),
+    ("cpu_seconds", "CPU time", format_duration, 10.0),
+    ("static_lib_bytes", "library size", _mib, 256 * 1024),
+    ("cache_archive_bytes", "archive size", _mib, 256 * 1024),
+]
+
+
+@dataclass
+class Regression:
+    library: str
+    metric: str
+    latest: str
+    baseline: str
+    ratio: float
+    source_changed: bool
+
+
+class BuildHistory:
+    """The history database of one cache directory."""
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def record_run(
+        self,
+        config: BuildConfig,
+        libraries: list[Library],
+        timings: BuildTimings,
+        jobs: int,
+        success: bool,
+    ) -> None:
+        """Append this run's built and restored libraries."""
+        by_name = {lib.name: lib for lib in libraries}
+        summary = timings.to_dict()["libraries"]
+        with closing(self._connect()) as db, db:
+            run_id = db.execute(
+                "INSERT INTO runs (started_at, host, build_suffix, jobs, wall_seconds, success)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (timings.started_at, socket.gethostname(), config.build_suffix,
+                 jobs, timings.now(), int(success)),
+            ).lastrowid
+            for name, entry in summary.items():
+                lib = by_name.get(name)
+                source_dir = config.library_paths(lib).source_dir if lib else None
+                metrics = entry["metrics"]
+                build_id = db.execute(
+                    "INSERT INTO library_builds (run_id, library, source_sha, outcome,"
+                    " total_seconds, cpu_seconds, peak_rss_bytes, static_libs, objects,"
+                    " static_lib_bytes, cache_archive_bytes)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run_id, name,
+                        PatchManager._current_source_commit(source_dir) if source_dir else None,
+                        entry["outcome"], entry["total"],
+                        metrics.get("cpu_seconds"), metrics.get("peak_rss_bytes"),
+                        metrics.get("static_libs"), metrics.get("objects"),
+                        metrics.get("static_lib_bytes"), metrics.get("cache_archive_bytes"),
+                    ),
+                ).lastrowid
+                db.executemany(
+                    "INSERT INTO phases (build_id, phase, seconds) VALUES (?, ?, ?)",
+                    [(build_id, phase, secs) for phase, secs in entry["phases"].items()],
+                )
+
+    def _builds(self, db: sqlite3.Connection, build_suffix: str, library: str) -> list[sqlite3.Row]:
+        """Built (not restored or failed) rows of `library`, newest first."""
+        return db.execute(
+            "SELECT b.*, r.started_at FROM library_builds b JOIN runs r ON r.id = b.run_id"
+            " WHERE b.library = ? AND b.outcome = 'built' AND r.build_suffix = ? AND r.host = ?"
+            " ORDER BY b.run_id DESC LIMIT ?",
+            (library, build_suffix, socket.gethostname(), _WINDOW + 1),
+        ).fetchall()
+
+    def regressions(
+        self,
+        build_suffix: str,
+        libraries: list[str],
+        threshold: float,
+    ) -> list[Regression]:
+        """Libraries whose latest build exceeds the rolling median by more than `threshold`."""
+        if not self.path.is_file():
+            return []
+        found = []
+        with closing(self._connect()) as db:
+            for library in libraries:
+                rows = self._builds(db, build_suffix, library)
+                if len(rows) < 2:
+                    continue
+                latest, previous = rows[0], rows[1:]
+                for column, label, fmt, min_increase in _TRACKED:
+                    values = [row[column] for row in previous if row[column]]
+                    if latest[column] is None or not values:
+                        continue
+                    baseline = statistics.median(values)
+                    ratio = latest[column] / baseline
+                    if ratio > 1 + threshold and latest[column] - baseline >= min_increase:
+                        found.append(
+                            Regression(
+                                library, label, fmt(latest[column]), fmt(baseline), ratio,
+                                source_changed=latest["source_sha"] != previous[0]["source_sha"],
+                            )
+                        )
+        return found
+
+    def print_report(self, build_suffix: str, libraries: list[str], threshold: float) -> None:
+        """Latest build of every library against its rolling median."""
+        print(f"\n{'=' * 20} Build history for '{build_suffix}' {'=' * 20}\n")
+        if not self.path.is_file():
+            print(f"No history yet ({self.path}).")
+            return
+
+        width = max(len("Library"), *(len(name) for name in libraries))
+        header = (
+            f"{'Library':<{width}}  {'samples':>7}  {'latest':>9}  {'median':>9}  "
+            f"{'CPU':>9}  {'peak RSS':>9}  {'objects':>7}  {'size':>9}  source"
+        )
+        print(header)
+        print("-" * len(header))
+        with closing(self._connect()) as db:
+            for library in libraries:
+                rows = self._builds(db, build_suffix, library)
+                if not rows:
+                    continue
+                latest = rows[0]
+                median = statistics.median(row["total_seconds"] for row in rows[1:] or rows)
+                print(
+                    f"{library:<{width}}  {len(rows):>7}  "
+                    f"{format_duration(latest['total_seconds']):>9}  {format_duration(median):>9}  "
+                    f"{_optional(latest['cpu_seconds'], format_duration):>9}  "
+                    f"{_optional(latest['peak_rss_bytes'], lambda v: f'{v / (1 << 20):.0f} MiB'):>9}  "
+                    f"{_optional(latest['objects'], str):>7}  "
+                    f"{_optional(latest['static_lib_bytes'], _mib):>9}  "
+                    f"{(latest['source_sha'] or '-')[:10]}"
+                )
+
+        print_regressions(self.regressions(build_suffix, libraries, threshold), threshold)
+
+
+def _optional(value, fmt) -> str:
+    return "-" if value is None else fmt(value)
+
+
+def print_regressions(regressions: list[Regression], threshold: float) -> None:
+    if not regressions:
+        return
+    print(
+        f"\nRegressions (more than {threshold:.0%} above the median of the previous "
+        f"{_WINDOW} builds):"
+    )
+    for regression in regressions:
+        cause = " after a source change" if regression.source_changed else ""
+        print(
+            f"  - {regression.library}: {regression.metric} {regression.latest} vs "
+            f"{regression.baseline} (x{regression.ratio:.2f}){cause}"
+        )
+
@@ -0,0 +1,205 @@
+"""
+GNU make compatible jobserver shared by every concurrent library build.
+
+Without it each library picks its own parallelism (`make -jN`, Ninja's
+CPU+2 default), so N libraries building side by side run N times too many
+compile jobs. build.py owns a single token pool sized by --jobs and hands
+it to every make, ninja (1.13+) and meson process through MAKEFLAGS, so all
+builds running at the same moment draw from the same CPU budget.
+
+The protocol: the pool holds `jobs - 1` one-byte tokens. A client may always
+run one job on its implicit slot and must read a token before starting each
+extra job, writing it back when the job ends. The scheduler plays by the same
+rules: the first running library uses build.py's implicit slot and every
+library building alongside it holds a token for its whole duration.
+
+POSIX uses a named FIFO (`--jobserver-auth=fifo:PATH`, GNU make 4.4+ and
+Ninja 1.13+); older makes receive the same FIFO as inherited file
+descriptors. Windows uses a named semaphore, the scheme native GNU make and
+Ninja 1.13 understand.
+"""
+
+import os
+import re
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, Optional
+
+_TOKEN = b"+"
+
+_active: Optional["Jobserver"] = None
+
+
+@lru_cache(maxsize=None)
+def _tool_version(tool: str) -> Optional[tuple[int, int]]:
+    """MAJOR.MINOR reported by `<tool> --version`, or None if unavailable."""
+    try:
+        result = subprocess.run(
+            [tool, "--version"], capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = re.search(r"(\d+)\.(\d+)", result.stdout or result.stderr)
+    if result.returncode != 0 or not match:
+        return None
+    return (int(match.group(1)), int(match.group(2)))
+
+
+def ninja_supports_jobserver() -> bool:
+    """Ninja joins a jobserver from MAKEFLAGS starting with 1.13."""
+    version = _tool_version("ninja")
+    return version is not None and version >= (1, 13)
+
+
+class Jobserver:
+    """A pool of `jobs - 1` tokens shared with every build tool we spawn."""
+
+    def __init__(self, jobs: int):
+        self.jobs = jobs
+        self._implicit_taken = False
+        self._lock = threading.Lock()
+        self._fifo_dir: Optional[str] = None
+        self._fd: Optional[int] = None
+        self._semaphore = None
+        self.auth = self._create(jobs - 1)
+
+    # -- pool lifetime ---------------------------------------------------
+
+    def _create(self, tokens: int) -> str:
+        if os.name == "nt":
+            return self._create_semaphore(tokens)
+
+        self._fifo_dir = tempfile.mkdtemp(prefix="ext-deps-jobserver-")
+        fifo = os.path.join(self._fifo_dir, "fifo")
+        os.mkfifo(fifo, 0o600)
+        # Opening read-write never blocks and keeps the FIFO alive even while
+        # no client has it open, so tokens written now are not lost.
+        self._fd = os.open(fifo, os.O_RDWR)
+        os.set_inheritable(self._fd, True)
+        if tokens:
+            os.write(self._fd, _TOKEN * tokens)
+        return f"fifo:{fifo}"
+
+    def _create_semaphore(self, tokens: int) -> str:
+        import ctypes
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        name = f"ext_deps_jobserver_{os.getpid()}"
+        # Native Windows make treats the semaphore count as the token pool;
+        # a zero-token pool is still a valid (serial) pool.
+        handle = kernel32.CreateSemaphoreW(None, tokens, max(tokens, 1), name)
+        if not handle:
+            raise OSError(ctypes.get_last_error(), "CreateSemaphoreW failed")
+        self._semaphore = (kernel32, handle)
+        return name
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._fifo_dir is not None:
+            for entry in Path(self._fifo_dir).iterdir():
+                entry.unlink()
+            os.rmdir(self._fifo_dir)
+            self._fifo_dir = None
+        if self._semaphore is not None:
+            kernel32, handle = self._semaphore
+            kernel32.CloseHandle(handle)
+            self._semaphore = None
+
+    # -- client configuration --------------------------------------------
+
+    def make_env(self, env: dict) -> dict:
+        """Return `env` with MAKEFLAGS pointing GNU make at the pool."""
+        env = dict(env)
+        if os.name == "nt" or (_tool_version("make") or (0, 0)) >= (4, 4):
+            auth = f"--jobserver-auth={self.auth}"
+        elif (_tool_version("make") or (0, 0)) >= (4, 2):
+            auth = f"--jobserver-auth={self._fd},{self._fd}"
+        else:
+            auth = f"--jobserver-fds={self._fd},{self._fd}"
+        env["MAKEFLAGS"] = f"-j{self.jobs} {auth}"
+        return env
+
+    def ninja_env(self, env: dict) -> dict:
+        """Return `env` with MAKEFLAGS pointing Ninja (and meson compile) at the pool."""
+        env = dict(env)
+        env["MAKEFLAGS"] = f"-j{self.jobs} --jobserver-auth={self.auth}"
+        return env
+
+    @property
+    def pass_fds(self) -> tuple[int, ...]:
+        """File descriptors a pre-4.4 make needs to inherit."""
+        return (self._fd,) if self._fd is not None else ()
+
+    # -- scheduler side ---------------------------------------------------
+
+    def _acquire_token(self) -> None:
+        if self._semaphore is not None:
+            kernel32, handle = self._semaphore
+            kernel32.WaitForSingleObject(handle, 0xFFFFFFFF)
+            return
+        while True:
+            try:
+                if os.read(self._fd, 1):
+                    return
+            except InterruptedError:
+                continue
+
+    def _release_token(self) -> None:
+        if self._semaphore is not None:
+            kernel32, handle = self._semaphore
+            kernel32.ReleaseSemaphore(handle, 1, None)
+            return
+        os.write(self._fd, _TOKEN)
+
+    @contextmanager
+    def library_slot(self) -> Iterator[None]:
+        """Hold one job's worth of the budget while a library builds.
+
+        The first library takes build.py's implicit slot; any library building
+        alongside it blocks until a token is free, so configure steps and
+        compile jobs of every library together never exceed --jobs.
+        """
+        with self._lock:
+            implicit = not self._implicit_taken
+            self._implicit_taken = True
+        if not implicit:
+            self._acquire_token()
+        try:
+            yield
+        finally:
+            if implicit:
+                with self._lock:
+                    self._implicit_taken = False
+            else:
+                self._release_token()
+
+
+def active() -> Optional[Jobserver]:
+    """The jobserver owned by the running build, or None for a serial build."""
+    return _active
+
+
+@contextmanager
+def start_jobserver(jobs: int) -> Iterator[Optional[Jobserver]]:
+    """Own a token pool for the duration of a parallel build.
+
+    A serial build (jobs == 1) gets no jobserver: each build tool keeps
+    choosing its own parallelism, as it always has.
+    """
+    global _active
+    if jobs <= 1:
+        yield None
+        return
+    server = Jobserver(jobs)
+    _active = server
+    try:
+        yield server
+    finally:
+        _active = None
+        server.close()
@@ -0,0 +1,175 @@
+"""
+Architectures of Mach-O static libraries, read without lipo.
+
+`lipo -archs` prints the slices of a universal (fat) file, or the
+architecture of a thin one. This module reads the same information through
+a memory map: the fat header's slice table, and for thin archives the CPU
+type in the header of every object member. Objects of another architecture
+mixed into a thin archive (which lipo does not report) are visible this way.
+It runs on any host, so macOS artifacts can be audited offline:
+
+    python -m builder.macho --expect arm64 output/<suffix>/lib/*.a
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .ar import AR_MAGIC, ArchiveFormatError, iter_members
+
+_FAT_MAGIC = 0xCAFEBABE
+_FAT_MAGIC_64 = 0xCAFEBABF
+# Thin Mach-O headers, as read little-endian (every Apple target is).
+_MH_MAGIC = 0xFEEDFACE
+_MH_MAGIC_64 = 0xFEEDFACF
+# LLVM bitcode wrapper (-flto objects built for Darwin) carries a CPU type.
+_BITCODE_WRAPPER_MAGIC = 0x0B17C0DE
+
+_CPU_ARCH_ABI64 = 0x01000000
+_CPU_SUBTYPE_MASK = 0xFF000000
+
+# (cputype, cpusubtype or None for any) -> name, as printed by lipo.
+_ARCH_NAMES = {
+    (7, None): "i386",
+    (7 | _CPU_ARCH_ABI64, 8): "x86_64h",
+    (7 | _CPU_ARCH_ABI64, None): "x86_64",
+    (12, 9): "armv7",
+    (12, 11): "armv7s",
+    (12, None): "arm",
+    (12 | _CPU_ARCH_ABI64, 2): "arm64e",
+    (12 | _CPU_ARCH_ABI64, None): "arm64",
+    (12 | 0x02000000, None): "arm64_32",
+}
+
+
+class MachOFormatError(ValueError):
+    """The file is not a Mach-O file or archive this module understands."""
+
+
+@dataclass
+class Architectures:
+    """The architectures of one library file."""
+
+    # Slice architectures of a fat file, or those of the objects of a thin
+    # one, in file order and without duplicates.
+    archs: list[str] = field(default_factory=list)
+    fat: bool = False
+
+    @property
+    def mixed(self) -> bool:
+        """A thin file whose objects target different architectures."""
+        return not self.fat and len(self.archs) > 1
+
+
+def arch_name(cputype: int, cpusubtype: int) -> str:
+    subtype = cpusubtype & ~_CPU_SUBTYPE_MASK
+    return (
+        _ARCH_NAMES.get((cputype, subtype))
+        or _ARCH_NAMES.get((cputype, None))
+        or f"unknown({cputype:#x},{subtype})"
+    )
+
+
+def _object_arch(data: mmap.mmap, start: int, end: int) -> Optional[str]:
+    """Architecture of the object at data[start:end], None if not an object."""
+    if end - start < 12:
+        return None
+    magic, cputype, cpusubtype = struct.unpack_from("<III", data, start)
+    if magic in (_MH_MAGIC, _MH_MAGIC_64):
+        return arch_name(cputype, cpusubtype)
+    if magic == _BITCODE_WRAPPER_MAGIC and end - start >= 20:
+        cputype = struct.unpack_from("<I", data, start + 16)[0]
+        return arch_name(cputype, 0)
+    return None
+
+
+def _archive_archs(data: mmap.mmap, start: int, end: int, name: str) -> list[str]:
+    """Architectures of the objects of the ar archive at data[start:end]."""
+    archs: list[str] = []
+    try:
+        for member in iter_members(data, start, end, name):
+            if member.index:
+                continue
+            arch = _object_arch(data, member.start, member.end)
+            if arch and arch not in archs:
+                archs.append(arch)
+    except ArchiveFormatError as e:
+        raise MachOFormatError(str(e)) from None
+    return archs
+
+
+def _thin_archs(data: mmap.mmap, start: int, end: int, name: str) -> list[str]:
+    if data[start:start + len(AR_MAGIC)] == AR_MAGIC:
+        return _archive_archs(data, start, end, name)
+    arch = _object_arch(data, start, end)
+    if arch is None:
+        raise MachOFormatError(f"{name}: not a Mach-O file or archive")
+    return [arch]
+
+
+def read_architectures(path: Path) -> Architectures:
+    """Architectures of the static library (or object) at `path`.
+
+    Raises MachOFormatError for unrecognized files, and OSError when the
+    file cannot be read.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < 8:
+            raise MachOFormatError(f"{path.name}: not a Mach-O file or archive")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, count = struct.unpack_from(">II", data, 0)
+            if magic not in (_FAT_MAGIC, _FAT_MAGIC_64):
+                return Architectures(_thin_archs(data, 0, len(data), path.name))
+
+            # The fat header is big-endian; its slice table names the archs.
+            entry_size = 32 if magic == _FAT_MAGIC_64 else 20
+            archs: list[str] = []
+            for index in range(count):
+                entry = 8 + index * entry_size
+                if entry + entry_size > len(data):
+                    raise MachOFormatError(f"{path.name}: truncated fat header")
+                cputype, cpusubtype = struct.unpack_from(">II", data, entry)
+                arch = arch_name(cputype, cpusubtype)
+                if arch not in archs:
+                    archs.append(arch)
+            return Architectures(archs, fat=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Report the architectures of Mach-O static libraries (like lipo -archs)"
+    )
+    parser.add_argument("libraries", nargs="+", type=Path, metavar="LIB")
+    parser.add_argument(
+        "--expect", metavar="ARCH", help="Fail if a library lacks this architecture"
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.libraries:
+        try:
+            found = read_architectures(path)
+        except (OSError, MachOFormatError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            failed = True
+            continue
+        if not found.archs:
+            print(f"  Warning: {path.name}: no Mach-O objects found")
+            continue
+        archs = ", ".join(found.archs)
+        if found.mixed or (args.expect and args.expect not in found.archs):
+            expected = f" (expected {args.expect})" if args.expect else ""
+            print(f"  FAIL: {path.name}: found {archs}{expected}")
+            failed = True
+        else:
+            print(f"  OK: {path.name} -> {archs}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
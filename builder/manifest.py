@@ -0,0 +1,151 @@
+"""
+Tracking of the files each library installs into the shared prefix.
+
+Every library installs into the same `output/<suffix>` tree. Installs are
+staged (see builder.staging), so the files a library owns are exactly those
+of its stage; when they are published, they are recorded with their SHA-256
+in `<lib>.manifest.json` in the state directory. Post-install validation
+looks only at those files rather than at the whole prefix, and
+`build.py --library X --rebuild` removes exactly X's files before building it
+again.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from .ar import count_objects
+
+# Per-configuration bookkeeping (fingerprints, manifests) lives in a hidden
+# directory of the install prefix so that it travels with, and is cleaned
+# with, the install itself. It is never part of a library's files.
+STATE_DIRNAME = ".ext-deps"
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    """What a manifest records for `path`: its SHA-256, or "symlink:<target>"."""
+    if path.is_symlink():
+        return f"symlink:{os.readlink(path)}"
+    return file_sha256(path)
+
+
+def manifest_path(install_dir: Path, lib_name: str) -> Path:
+    return install_dir / STATE_DIRNAME / f"{lib_name}.manifest.json"
+
+
+def write_manifest(install_dir: Path, lib_name: str, hashes: dict[str, str]) -> None:
+    """Save the files `lib_name` installed, {path relative to `install_dir`: SHA-256}.
+
+    Symlinks are recorded as "symlink:<target>" instead of a hash (see
+    file_digest).
+    """
+    path = manifest_path(install_dir, lib_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(
+        json.dumps({"library": lib_name, "files": hashes}, indent=1, sort_keys=True) + "\n",
+        encoding="utf-8",
+    )
+    os.replace(tmp, path)
+
+
+def read_manifest(install_dir: Path, lib_name: str) -> Optional[dict[str, str]]:
+    """The files `lib_name` installed with their hashes, or None without a manifest."""
+    try:
+        data = json.loads(manifest_path(install_dir, lib_name).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    files = data.get("files") if isinstance(data, dict) else None
+    if not isinstance(files, dict):
+        return None
+    return {str(rel): str(digest) for rel, digest in files.items()}
+
+
+def remove_files(
+    install_dir: Path, lib_name: str, owned: dict[str, str]
+) -> tuple[list[str], list[str]]:
+    """Delete the files of `owned` ({path: digest, as in a manifest of `lib_name`}).
+
+    A file is kept when its content is no longer the one recorded (a later
+    install of another library replaced it) or when another library's
+    manifest lists it too. Directories left empty are removed. Returns
+    (removed, kept).
+    """
+    shared: set[str] = set()
+    suffix = ".manifest.json"
+    for other in (install_dir / STATE_DIRNAME).glob(f"*{suffix}"):
+        other_name = other.name[: -len(suffix)]
+        if other_name != lib_name:
+            shared.update(read_manifest(install_dir, other_name) or ())
+
+    removed: list[str] = []
+    kept: list[str] = []
+    for rel, digest in sorted(owned.items()):
+        path = install_dir / rel
+        if not (path.is_symlink() or path.is_file()):
+            continue
+        if rel in shared or file_digest(path) != digest:
+            kept.append(rel)
+            continue
+        path.unlink()
+        removed.append(rel)
+        parent = path.parent
+        while parent != install_dir:
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            parent = parent.parent
+    return removed, kept
+
+
+def remove_installed(install_dir: Path, lib_name: str) -> Optional[tuple[list[str], list[str]]]:
+    """Delete the files `lib_name` installed, as listed in its manifest.
+
+    Same rules as remove_files; the manifest is removed too. Returns
+    (removed, kept), or None when there is no manifest.
+    """
+    owned = read_manifest(install_dir, lib_name)
+    if owned is None:
+        return None
+    result = remove_files(install_dir, lib_name, owned)
+    manifest_path(install_dir, lib_name).unlink(missing_ok=True)
+    return result
+
+
+def static_libraries(install_dir: Path, files: list[str], suffix: str) -> list[Path]:
+    """Paths of the entries of `files` directly in lib/ whose name ends in `suffix`."""
+    return sorted(
+        install_dir / rel
+        for rel in files
+        if rel.count("/") == 1 and rel.startswith("lib/") and rel.lower().endswith(suffix)
+    )
+
+
+_STATIC_LIB_SUFFIXES = (".a", ".lib")
+
+
+def static_library_stats(install_dir: Path, files: list[str]) -> dict[str, int]:
+    """Count and size the static libraries among `files`, with their object members."""
+    stats = {"static_libs": 0, "objects": 0, "static_lib_bytes": 0}
+    for rel in files:
+        if not rel.endswith(_STATIC_LIB_SUFFIXES):
+            continue
+        path = install_dir / rel
+        objects = count_objects(path)
+        if objects is None:
+            continue
+        stats["static_libs"] += 1
+        stats["objects"] += objects
+        stats["static_lib_bytes"] += path.stat().st_size
+    return stats
@@ -2,15 +2,23 @@
 Meson build orchestration.
 """
 
+import hashlib
+import json
+import os
 import platform as platform_module
 import shutil
-import subprocess
 import sys
+import time
 from pathlib import Path
 from typing import Optional, TYPE_CHECKING
 
 from .cmake_builder import PatchManager
+from .compiler_cache import active as active_compiler_cache, meson_compiler
 from .config import BuildConfig, Library
+from .execution import run_command
+from .jobserver import active as active_jobserver, ninja_supports_jobserver
+from .staging import Stage
+from .timing import add_metric, format_duration, phase
 
 if TYPE_CHECKING:
     from .platforms.base import Platform
@@ -24,6 +32,14 @@ def _get_host_arch() -> str:
     return "x86_64"
 
 
+# Written to the build dir after a successful setup; see
+# MesonBuilder._run_meson_setup.
+SETUP_STAMP = ".setup_stamp"
+
+# Environment variables Meson only reads on the first setup of a build dir.
+_SETUP_ENV = ("CC", "CXX", "CFLAGS", "CXXFLAGS", "LDFLAGS", "CPPFLAGS")
+
+
 # Map our arch names to Meson cpu_family values
 _MESON_CPU_FAMILY = {
     "x86_64": "x86_64",
@@ -31,6 +47,21 @@ _MESON_CPU_FAMILY = {
 }
 
 
+def _write_if_changed(path: Path, text: str) -> None:
+    """Write a machine file, keeping its mtime when the content is the same.
+
+    Meson's regeneration rule depends on the machine files; rewriting one
+    would make the next `meson compile` regenerate for nothing.
+    """
+    if not path.is_file() or path.read_text() != text:
+        path.write_text(text)
+
+
+def _option_names(options: list[str]) -> set[str]:
+    """Option names of `--name=value` / `-Dname=value` arguments."""
+    return {option.partition("=")[0] for option in options}
+
+
 class MesonBuilder:
     """Handles Meson configuration, build, and installation."""
 
@@ -43,22 +74,26 @@ class MesonBuilder:
         self._env: Optional[dict[str, str]] = None
         if hasattr(platform, "get_msvc_env"):
             self._env = platform.get_msvc_env(config)
+        # Files (relative to the install dir) written by the last install.
+        self.installed_files: list[str] = []
 
     def build(self, lib: Library) -> bool:
         """Build a single library. Returns True on success."""
         print(f"\n{'=' * 20} Building '{lib.name}' (meson) for '{self.config.build_suffix}' {'=' * 20}\n")
 
-        source_dir = self.config.root_dir / lib.get_source_dir(self.config.platform_name)
-        build_dir = self.config.builds_dir / lib.name
-        install_dir = self.config.output_dir
+        paths = self.config.library_paths(lib)
+        source_dir = paths.source_dir
+        build_dir = paths.build_dir
+        install_dir = paths.install_dir
 
         # Ensure directories exist
         build_dir.mkdir(parents=True, exist_ok=True)
         install_dir.mkdir(parents=True, exist_ok=True)
 
         # Apply patches if any
-        if not self.patch_manager.apply_patch(lib.name, source_dir):
-            return False
+        with phase("patch"):
+            if not self.patch_manager.apply_patch(lib.name, source_dir):
+                return False
 
         # Generate cross-file if needed (macOS cross-compilation)
         cross_file = self._generate_cross_file(build_dir)
@@ -68,35 +103,48 @@ class MesonBuilder:
 
         # Configure
         print(f"\n{'=' * 20} Configuring '{lib.name}' {'=' * 20}\n")
-        if not self._run_meson_setup(
-            lib, source_dir, build_dir, install_dir, cross_file, native_file
-        ):
-            return False
+        with phase("configure"):
+            if not self._run_meson_setup(
+                lib, source_dir, build_dir, install_dir, cross_file, native_file
+            ):
+                return False
 
         # Build
         print(f"\n{'=' * 20} Building {'=' * 20}\n")
-        if not self._run_meson_compile(build_dir):
-            return False
+        with phase("build"):
+            if not self._run_meson_compile(build_dir):
+                return False
+
+        # Install into the library's private stage; the shared prefix is only
+        # touched by the publish step once the staged files passed validation.
+        stage = Stage(self.config, lib.name)
+        stage.reset()
 
         # Install
         print(f"\n{'=' * 20} Installing {'=' * 20}\n")
-        if not self._run_meson_install(build_dir):
-            return False
+        with phase("install"):
+            if not self._run_meson_install(build_dir, stage.root):
+                return False
 
         # Meson intentionally names static libs `libfoo.a` even when built with
         # MSVC (see mesonbuild/build.py and the meson FAQ). The archives are
         # valid MSVC-produced .lib files internally — only the filename follows
         # GNU convention. Rename to `foo.lib` so they fit the rest of the
         # ecosystem (CRT validation, downstream linker expectations).
-        if self.config.platform_name == "windows":
-            self._rename_static_libs_to_lib(install_dir)
+        with phase("post_install"):
+            if self.config.platform_name == "windows":
+                self._rename_static_libs_to_lib(stage.prefix)
 
-        # Post-install hook (platform-specific)
-        self.platform.post_install(self.config, lib, build_dir, install_dir)
+            # Post-install hook (platform-specific)
+            self.platform.post_install(self.config, lib, build_dir, stage.prefix)
+        self.installed_files = stage.files()
 
         # CRT validation (Windows only)
         if hasattr(self.platform, "validate_crt_linkage"):
-            success, errors = self.platform.validate_crt_linkage(self.config, install_dir)
+            with phase("validate_crt"):
+                success, errors = self.platform.validate_crt_linkage(
+                    self.config, stage.prefix, self.installed_files
+                )
             if not success:
                 print(f"\nCRT linkage validation failed for '{lib.name}':", file=sys.stderr)
                 for error in errors:
@@ -105,13 +153,19 @@ class MesonBuilder:
 
         # Architecture validation (macOS only)
         if hasattr(self.platform, "validate_architecture"):
-            success, errors = self.platform.validate_architecture(self.config, install_dir)
+            with phase("validate_arch"):
+                success, errors = self.platform.validate_architecture(
+                    self.config, stage.prefix, self.installed_files
+                )
             if not success:
                 print(f"\nArchitecture validation failed for '{lib.name}':", file=sys.stderr)
                 for error in errors:
                     print(f"  - {error}", file=sys.stderr)
                 return False
 
+        with phase("publish"):
+            stage.publish()
+
         print(f"\n{'=' * 20} Success! {'=' * 20}\n")
         return True
 
@@ -132,10 +186,11 @@ class MesonBuilder:
         min_version = self.config.macos_sdk or "12.0"
 
         cross_file = build_dir.parent / f"{build_dir.name}_meson_cross.ini"
-        cross_file.write_text(
+        _write_if_changed(
+            cross_file,
             f"[binaries]\n"
-            f"c = 'cc'\n"
-            f"cpp = 'c++'\n"
+            f"c = {meson_compiler('cc')}\n"
+            f"cpp = {meson_compiler('c++')}\n"
             f"ar = 'ar'\n"
             f"strip = 'strip'\n"
             f"\n"
@@ -163,19 +218,34 @@ class MesonBuilder:
         it and produces UNIX-style libfoo.a archives instead of foo.lib.
         Pinning c='cl' / cpp='cl' here is bulletproof: native-file binaries
         override env vars and PATH auto-detection.
+
+        Elsewhere a native file is only written to put the compiler cache in
+        front of the default compilers.
         """
         if self.config.platform_name != "windows":
-            return None
+            if active_compiler_cache() is None:
+                return None
+            c, cpp = ("cc", "c++") if self.config.platform_name == "macos" else ("gcc", "g++")
+            native_file = build_dir.parent / f"{build_dir.name}_meson_native.ini"
+            _write_if_changed(
+                native_file,
+                "[binaries]\n"
+                f"c = {meson_compiler(os.environ.get('CC') or c)}\n"
+                f"cpp = {meson_compiler(os.environ.get('CXX') or cpp)}\n"
+            )
+            print(f"  Generated native-file: {native_file}")
+            return native_file
 
         # Only pin c/cpp. Do NOT set `ar` — setting it forces Meson into GNU
         # ar mode, which names static archives `libfoo.a` regardless of the
         # compiler. With `c = 'cl'` alone, Meson picks the MSVC toolchain and
         # uses lib.exe to produce `foo.lib`.
         native_file = build_dir.parent / f"{build_dir.name}_meson_native.ini"
-        native_file.write_text(
+        _write_if_changed(
+            native_file,
             "[binaries]\n"
-            "c = 'cl'\n"
-            "cpp = 'cl'\n"
+            f"c = {meson_compiler('cl')}\n"
+            f"cpp = {meson_compiler('cl')}\n"
         )
         print(f"  Generated native-file: {native_file}")
         return native_file
@@ -189,22 +259,75 @@ class MesonBuilder:
         cross_file: Path | None,
         native_file: Path | None,
     ) -> bool:
-        """Run meson setup (configure)."""
-        buildtype = "debug" if self.config.build_type == "Debug" else "release"
-
-        # If a previous setup exists, nuke the build dir entirely. `meson setup
-        # --wipe` reuses the previously-saved cmdline args, which means a new
-        # --native-file (or any newly-added arg) would be silently ignored.
-        # Deleting the dir forces a fresh setup that honors the current args.
+        """Run meson setup (configure), reusing the build dir when possible.
+
+        The options and a hash of everything Meson only reads on a fresh
+        setup (machine files, compiler environment) are kept in the build
+        dir. With both unchanged, setup is skipped (`meson compile` still
+        regenerates by itself when a meson.build changed); with only options
+        added or changed, `meson setup --reconfigure` applies them. Anything
+        else, or a failed reconfigure, wipes the build dir.
+        """
+        options = self._setup_options(lib, install_dir)
+        machine = self._setup_machine_hash(source_dir, cross_file, native_file)
+        stamp_path = build_dir / SETUP_STAMP
+        previous = self._read_setup_stamp(build_dir)
+        configured = (build_dir / "meson-private" / "coredata.dat").is_file()
+
+        if configured and previous is not None and previous.get("machine") == machine:
+            if previous.get("options") == options:
+                saved = previous.get("seconds")
+                if isinstance(saved, (int, float)):
+                    print(
+                        "Setup options unchanged; skipped meson setup "
+                        f"(saved ~{format_duration(saved)})"
+                    )
+                    add_metric("configure_saved_seconds", saved)
+                else:
+                    print("Setup options unchanged; skipped meson setup")
+                return True
+
+            # `--reconfigure` keeps the previous value of any option not
+            # given again, so a removed option needs a fresh setup.
+            if _option_names(previous.get("options", [])) <= _option_names(options):
+                stamp_path.unlink(missing_ok=True)
+                start = time.monotonic()
+                cmd = ["meson", "setup", "--reconfigure", str(build_dir), str(source_dir)]
+                if self._run_command(cmd + options):
+                    self._write_setup_stamp(build_dir, options, machine, time.monotonic() - start)
+                    return True
+                print("  meson setup --reconfigure failed; starting over")
+
+        # Fresh setup. `meson setup --wipe` reuses the previously-saved cmdline
+        # args, which means a new --native-file (or any newly-added arg) would
+        # be silently ignored. Deleting the dir forces a fresh setup that
+        # honors the current args.
         if (build_dir / "meson-private").is_dir():
             print(f"  Removing stale build dir: {build_dir}")
             shutil.rmtree(build_dir)
             build_dir.mkdir(parents=True, exist_ok=True)
+        stamp_path.unlink(missing_ok=True)
+
+        cmd = ["meson", "setup", str(build_dir), str(source_dir)]
 
-        cmd = [
-            "meson", "setup",
-            str(build_dir),
-            str(source_dir),
+        # Cross-compilation file
+        if cross_file:
+            cmd.append(f"--cross-file={cross_file}")
+
+        # Native file (Windows: force MSVC)
+        if native_file:
+            cmd.append(f"--native-file={native_file}")
+
+        start = time.monotonic()
+        if not self._run_command(cmd + options):
+            return False
+        self._write_setup_stamp(build_dir, options, machine, time.monotonic() - start)
+        return True
+
+    def _setup_options(self, lib: Library, install_dir: Path) -> list[str]:
+        """Options of meson setup, all of which `--reconfigure` can change."""
+        buildtype = "debug" if self.config.build_type == "Debug" else "release"
+        options = [
             f"--prefix={install_dir}",
             f"--buildtype={buildtype}",
             "--default-library=static",
@@ -222,31 +345,71 @@ class MesonBuilder:
                 vscrt = "mtd" if is_debug else "mt"
             else:
                 vscrt = "mdd" if is_debug else "md"
-            cmd.append(f"-Db_vscrt={vscrt}")
+            options.append(f"-Db_vscrt={vscrt}")
 
-        # Cross-compilation file
-        if cross_file:
-            cmd.append(f"--cross-file={cross_file}")
-
-        # Native file (Windows: force MSVC)
-        if native_file:
-            cmd.append(f"--native-file={native_file}")
+        # Cap concurrent link steps of the generated Ninja build.
+        if self.config.link_jobs:
+            options.append(f"-Dbackend_max_links={self.config.link_jobs}")
 
         # Library-specific meson options
         meson_options = lib.get_meson_options(self.config.platform_name)
         for key, value in meson_options.items():
-            cmd.append(f"-D{key}={value}")
+            options.append(f"-D{key}={value}")
+
+        return options
+
+    def _setup_machine_hash(
+        self, source_dir: Path, cross_file: Path | None, native_file: Path | None
+    ) -> str:
+        """Hash of what only a fresh setup picks up: machine files and compilers."""
+        env = self._env if self._env is not None else os.environ
+        payload = {
+            "meson": shutil.which("meson"),
+            "source_dir": str(source_dir),
+            "cross_file": cross_file.read_text() if cross_file else None,
+            "native_file": native_file.read_text() if native_file else None,
+            "environment": {var: env.get(var) for var in _SETUP_ENV},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _read_setup_stamp(build_dir: Path) -> dict | None:
+        try:
+            stamp = json.loads((build_dir / SETUP_STAMP).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return stamp if isinstance(stamp, dict) else None
 
-        return self._run_command(cmd)
+    @staticmethod
+    def _write_setup_stamp(
+        build_dir: Path, options: list[str], machine: str, seconds: float
+    ) -> None:
+        stamp = {"options": options, "machine": machine, "seconds": round(seconds, 3)}
+        (build_dir / SETUP_STAMP).write_text(json.dumps(stamp, indent=2) + "\n", encoding="utf-8")
 
     def _run_meson_compile(self, build_dir: Path) -> bool:
-        """Run meson compile."""
-        cmd = ["meson", "compile", "-C", str(build_dir)]
-        return self._run_command(cmd)
+        """Run meson compile.
 
-    def _run_meson_install(self, build_dir: Path) -> bool:
-        """Run meson install."""
-        cmd = ["meson", "install", "-C", str(build_dir)]
+        Under a parallel build, the Ninja backend joins the shared jobserver
+        so this library's compile jobs come out of the global --jobs budget.
+        """
+        cmd = ["meson", "compile", "-C", str(build_dir)]
+        env = self._env
+        jobserver = active_jobserver()
+        if jobserver is not None:
+            if ninja_supports_jobserver():
+                env = jobserver.ninja_env(self._env or os.environ)
+            else:
+                print(
+                    "  Warning: Ninja < 1.13 cannot join the jobserver; "
+                    "it will pick its own parallelism",
+                    file=sys.stderr,
+                )
+        return self._run_command(cmd, env=env)
+
+    def _run_meson_install(self, build_dir: Path, destdir: Path) -> bool:
+        """Run meson install below `destdir`."""
+        cmd = ["meson", "install", "-C", str(build_dir), "--destdir", str(destdir)]
         return self._run_command(cmd)
 
     def _rename_static_libs_to_lib(self, install_dir: Path) -> None:
@@ -261,15 +424,6 @@ class MesonBuilder:
             archive.rename(target)
             print(f"  Renamed {archive.name} -> {target.name}")
 
-    def _run_command(self, cmd: list[str]) -> bool:
+    def _run_command(self, cmd: list[str], env: Optional[dict] = None) -> bool:
         """Run a command and return success status."""
-        print(f"Running: {' '.join(cmd)}")
-        try:
-            result = subprocess.run(cmd, check=True, env=self._env)
-            return result.returncode == 0
-        except subprocess.CalledProcessError as e:
-            print(f"Command failed with return code {e.returncode}", file=sys.stderr)
-            return False
-        except FileNotFoundError:
-            print(f"Command not found: {cmd[0]}", file=sys.stderr)
-            return False
+        return run_command(cmd, env=env if env is not None else self._env)
@@ -15,7 +15,11 @@ from pathlib import Path
 from typing import TYPE_CHECKING
 
 from .cmake_builder import PatchManager
+from .compiler_cache import active as active_compiler_cache
 from .config import BuildConfig, Library
+from .execution import run_command
+from .staging import Stage
+from .timing import phase
 
 if TYPE_CHECKING:
     from .platforms.base import Platform
@@ -29,22 +33,26 @@ class Msys2Builder:
         self.platform = platform
         self.patch_manager = PatchManager(config.root_dir)
         self._msbuild_dir: str | None = None
+        # Files (relative to the install dir) written by the last install.
+        self.installed_files: list[str] = []
 
     def build(self, lib: Library) -> bool:
         """Build a single library via MSYS2. Returns True on success."""
         print(f"\n{'=' * 20} Building '{lib.name}' (msys2) for '{self.config.build_suffix}' {'=' * 20}\n")
 
-        source_dir = self.config.root_dir / lib.get_source_dir(self.config.platform_name)
-        build_dir = self.config.builds_dir / lib.name
-        install_dir = self.config.output_dir
+        paths = self.config.library_paths(lib)
+        source_dir = paths.source_dir
+        build_dir = paths.build_dir
+        install_dir = paths.install_dir
 
         # Ensure directories exist
         build_dir.mkdir(parents=True, exist_ok=True)
         install_dir.mkdir(parents=True, exist_ok=True)
 
         # Apply patches if any
-        if not self.patch_manager.apply_patch(lib.name, source_dir):
-            return False
+        with phase("patch"):
+            if not self.patch_manager.apply_patch(lib.name, source_dir):
+                return False
 
         # Find MSYS2 bash
         bash = self._find_msys2_bash()
@@ -52,45 +60,65 @@ class Msys2Builder:
             return False
 
         # Get autotools/configure options
-        autotools_opts = dict(lib.autotools_options)
-        platform_opts = lib.platforms.get(self.config.platform_name, {}).get(
-            "autotools_options", {}
-        )
-        autotools_opts.update(platform_opts)
+        autotools_opts = lib.get_autotools_options(self.config.platform_name)
+
+        # The generated Makefile hands compilation to msbuild, which runs
+        # cl.exe from its project files: there is no launcher to insert.
+        compiler_cache = active_compiler_cache()
+        if compiler_cache is not None:
+            print(f"  Note: {compiler_cache.tool} is not used for MSBuild-driven builds")
 
         # Configure
         print(f"\n{'=' * 20} Configuring '{lib.name}' {'=' * 20}\n")
-        if not self._run_configure(bash, source_dir, build_dir, install_dir, autotools_opts, lib):
-            return False
+        with phase("configure"):
+            if not self._run_configure(bash, source_dir, build_dir, install_dir, autotools_opts, lib):
+                return False
 
         # Build
         print(f"\n{'=' * 20} Building {'=' * 20}\n")
-        if not self._run_make(bash, build_dir):
-            return False
+        with phase("build"):
+            if not self._run_make(bash, build_dir):
+                return False
+
+        # Install into the library's private stage; the shared prefix is only
+        # touched by the publish step once the staged files passed validation.
+        # make sees the prefix as an MSYS2 path, which DESTDIR is prepended to.
+        stage = Stage(self.config, lib.name)
+        stage.prefix = stage.root / self._to_msys_path(install_dir).lstrip("/")
+        stage.reset()
 
         # Install
         print(f"\n{'=' * 20} Installing {'=' * 20}\n")
-        if not self._run_make_install(bash, build_dir):
-            return False
+        with phase("install"):
+            if not self._run_make_install(bash, build_dir, stage.root):
+                return False
 
-        # Post-install: flatten lib subdirectories (libvpx puts .lib in lib/x64/)
-        self._flatten_lib_dir(install_dir)
+        with phase("post_install"):
+            # Post-install: flatten lib subdirectories (libvpx puts .lib in lib/x64/)
+            self._flatten_lib_dir(stage.prefix)
 
-        # Debug packages must not carry the Release-CRT twin that
-        # `make install` ships unconditionally (libs.mk installs
-        # vpxmt/vpxmd.lib regardless of CONFIG_DEBUG_LIBS).
-        if self.config.build_type == "Debug":
-            self._purge_release_libs(install_dir)
+            # Debug packages must not carry the Release-CRT twin that
+            # `make install` ships unconditionally (libs.mk installs
+            # vpxmt/vpxmd.lib regardless of CONFIG_DEBUG_LIBS).
+            if self.config.build_type == "Debug":
+                self._purge_release_libs(stage.prefix)
+        self.installed_files = stage.files()
 
         # CRT validation (Windows only)
         if hasattr(self.platform, "validate_crt_linkage"):
-            success, errors = self.platform.validate_crt_linkage(self.config, install_dir)
+            with phase("validate_crt"):
+                success, errors = self.platform.validate_crt_linkage(
+                    self.config, stage.prefix, self.installed_files
+                )
             if not success:
                 print(f"\nCRT linkage validation failed for '{lib.name}':", file=sys.stderr)
                 for error in errors:
                     print(f"  - {error}", file=sys.stderr)
                 return False
 
+        with phase("publish"):
+            stage.publish()
+
         print(f"\n{'=' * 20} Success! {'=' * 20}\n")
         return True
 
@@ -223,17 +251,7 @@ class Msys2Builder:
         full_script = f"{path_export}{script}"
 
         cmd = [str(bash), "-lc", full_script]
-        print(f"Running (via MSYS2): {script}")
-
-        try:
-            result = subprocess.run(cmd, cwd=cwd, env=env, check=True)
-            return result.returncode == 0
-        except subprocess.CalledProcessError as e:
-            print(f"Command failed with return code {e.returncode}", file=sys.stderr)
-            return False
-        except FileNotFoundError:
-            print(f"Command not found: {cmd[0]}", file=sys.stderr)
-            return False
+        return run_command(cmd, cwd=cwd, env=env, display=f"Running (via MSYS2): {script}")
 
     def _run_configure(
         self,
@@ -278,12 +296,18 @@ class Msys2Builder:
         return self._run_bash(script, build_dir, bash)
 
     def _run_make(self, bash: Path, build_dir: Path) -> bool:
-        """Run make (which invokes msbuild internally for vs17 targets)."""
-        return self._run_bash("make -j", build_dir, bash)
+        """Run make (which invokes msbuild internally for vs17 targets).
 
-    def _run_make_install(self, bash: Path, build_dir: Path) -> bool:
-        """Run make install."""
-        return self._run_bash("make install", build_dir, bash)
+        MSYS2's make speaks the POSIX jobserver protocol, not the Windows
+        semaphore one, so it cannot join build.py's jobserver; bound it to
+        one job per CPU instead of the unbounded bare `-j`.
+        """
+        return self._run_bash(f"make -j{os.cpu_count() or 1}", build_dir, bash)
+
+    def _run_make_install(self, bash: Path, build_dir: Path, destdir: Path) -> bool:
+        """Run make install below `destdir` (DESTDIR)."""
+        script = f"make install DESTDIR='{self._to_msys_path(destdir)}'"
+        return self._run_bash(script, build_dir, bash)
 
     def _purge_release_libs(self, install_dir: Path) -> None:
         """Remove Release-runtime libvpx libs from a Debug install.
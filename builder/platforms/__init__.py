@@ -1,28 +1,40 @@
 """
 Platform-specific build configurations.
+
+Only the platform that is asked for is imported.
 """
 
+from importlib import import_module
+
 from .base import Platform
-from .linux import LinuxPlatform
-from .macos import MacOSPlatform
-from .windows import WindowsPlatform
+
+_PLATFORM_CLASSES = {
+    "linux": (".linux", "LinuxPlatform"),
+    "macos": (".macos", "MacOSPlatform"),
+    "windows": (".windows", "WindowsPlatform"),
+}
 
 
 def get_platform(platform_name: str) -> Platform:
     """Get the appropriate platform handler."""
-    platforms = {
-        "linux": LinuxPlatform,
-        "macos": MacOSPlatform,
-        "windows": WindowsPlatform,
-    }
-
-    platform_class = platforms.get(platform_name)
-    if not platform_class:
+    entry = _PLATFORM_CLASSES.get(platform_name)
+    if not entry:
         raise ValueError(f"Unsupported platform: {platform_name}")
 
+    module, class_name = entry
+    platform_class = getattr(import_module(module, __name__), class_name)
     return platform_class()
 
 
+def __getattr__(name: str):
+    for module, class_name in _PLATFORM_CLASSES.values():
+        if class_name == name:
+            value = getattr(import_module(module, __name__), name)
+            globals()[name] = value
+            return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 __all__ = [
     "Platform",
     "LinuxPlatform",
@@ -2,11 +2,15 @@
 macOS platform configuration.
 """
 
+import os
 import platform as platform_module
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
+from ..macho import MachOFormatError, read_architectures
+from ..manifest import static_libraries
+from ..validation_cache import ARCH_CACHE_FILENAME, ArchiveResultCache
 from .base import Platform
 
 if TYPE_CHECKING:
@@ -24,8 +28,6 @@ def _get_host_arch() -> str:
 class MacOSPlatform(Platform):
     """macOS-specific build configuration."""
 
-    _validated_libs: set[str] = set()  # Track already validated .a files
-
     @property
     def name(self) -> str:
         return "macos"
@@ -79,65 +81,86 @@ class MacOSPlatform(Platform):
         """No special post-install actions needed on macOS."""
         pass
 
+    @staticmethod
+    def _read_architectures(lib_file: Path) -> tuple[Optional[dict], Optional[str]]:
+        """({"archs": [...], "fat": bool}, None) for one archive, or (None, warning)."""
+        try:
+            found = read_architectures(lib_file)
+        except (OSError, MachOFormatError) as e:
+            return None, str(e)
+        return {"archs": found.archs, "fat": found.fat}, None
+
     def validate_architecture(
-        self, config: "BuildConfig", install_dir: Path
+        self, config: "BuildConfig", install_dir: Path, files: Optional[list[str]] = None
     ) -> tuple[bool, list[str]]:
-        """Validate that all .a files have the correct architecture.
+        """Validate that the installed .a files have the correct architecture.
+
+        Only the .a files in lib/ among `files` (the library's install
+        manifest, relative to `install_dir`) are checked; without `files`,
+        every .a in lib/ is.
 
-        Uses 'lipo -archs' to check each static library.
-        Only validates new files that haven't been checked yet.
+        Reads the fat header or the objects' Mach-O headers directly
+        (builder.macho, what `lipo -archs` reports), in parallel. Results are
+        kept in builds/<suffix>/.arch-validation.json, so archives unchanged
+        since an earlier check (same size and mtime, or same content hash)
+        are not read again, in this run or the next.
         Returns (success, error_messages).
         """
         lib_dir = install_dir / "lib"
         if not lib_dir.exists():
             return True, []
 
-        all_lib_files = list(lib_dir.glob("*.a"))
+        if files is None:
+            all_lib_files = sorted(lib_dir.glob("*.a"))
+        else:
+            all_lib_files = static_libraries(install_dir, files, ".a")
         if not all_lib_files:
             return True, []
 
-        # Filter to only new files not yet validated
-        new_lib_files = [
-            f for f in all_lib_files
-            if str(f) not in MacOSPlatform._validated_libs
-        ]
-
-        if not new_lib_files:
-            return True, []
-
+        cache = ArchiveResultCache(config.builds_dir / ARCH_CACHE_FILENAME, checker="macho-1")
         expected_arch = config.arch
-        errors: list[str] = []
+        report: list[str] = []
+
+        with ThreadPoolExecutor(max_workers=min(len(all_lib_files), os.cpu_count() or 1)) as pool:
+            # Looking up may hash archives whose mtime changed.
+            findings = dict(zip(all_lib_files, pool.map(cache.lookup, all_lib_files)))
+            new_lib_files = [f for f, found in findings.items() if found is None]
+
+            if new_lib_files:
+                read = pool.map(self._read_architectures, new_lib_files)
+                for lib_file, (found, warning) in zip(new_lib_files, read):
+                    if warning:
+                        report.append(f"  Warning: {warning}")
+                        continue
+                    findings[lib_file] = found
+                    cache.store(lib_file, found)
+                cache.save()
 
-        print(f"\n{'=' * 20} Validating architecture (expected: {expected_arch}) {'=' * 20}\n")
-
-        for lib_file in new_lib_files:
-            try:
-                result = subprocess.run(
-                    ["lipo", "-archs", str(lib_file)],
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                )
-
-                if result.returncode != 0:
-                    print(f"  Warning: lipo failed for {lib_file.name}: {result.stderr.strip()}")
-                    continue
-
-                archs = result.stdout.strip().split()
-
-                if expected_arch not in archs:
-                    error = f"{lib_file.name}: found {', '.join(archs)} (expected {expected_arch})"
-                    errors.append(error)
-                    print(f"  FAIL: {error}")
-                else:
-                    # Mark as validated only if successful
-                    MacOSPlatform._validated_libs.add(str(lib_file))
-                    print(f"  OK: {lib_file.name} -> {', '.join(archs)}")
-
-            except subprocess.TimeoutExpired:
-                print(f"  Warning: lipo timeout for {lib_file.name}")
+        errors: list[str] = []
+        for lib_file in all_lib_files:
+            found = findings[lib_file]
+            if found is None:
+                continue
+            archs = found["archs"]
+            # No Mach-O objects at all (an empty archive, data members only):
+            # nothing can be linked from it, so nothing of the wrong arch either.
+            if not archs:
+                if lib_file in new_lib_files:
+                    report.append(f"  Warning: {lib_file.name}: no Mach-O objects found")
+                continue
+            if expected_arch in archs and (found["fat"] or len(archs) == 1):
+                if lib_file in new_lib_files:
+                    report.append(f"  OK: {lib_file.name} -> {', '.join(archs)}")
                 continue
-            except FileNotFoundError:
-                return False, ["lipo command not found. This should not happen on macOS."]
+            # A thin archive with objects of several architectures is broken
+            # too: the linker ignores the foreign ones.
+            error = f"{lib_file.name}: found {', '.join(archs)} (expected {expected_arch})"
+            errors.append(error)
+            report.append(f"  FAIL: {error}")
+
+        # Silent when every archive was already checked and is fine.
+        if report:
+            print(f"\n{'=' * 20} Validating architecture (expected: {expected_arch}) {'=' * 20}\n")
+            print("\n".join(report))
 
         return len(errors) == 0, errors
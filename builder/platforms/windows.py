@@ -6,58 +6,70 @@ import os
 import re
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, TYPE_CHECKING
 
+from .. import toolprobe
+from ..coff import ArchiveFormatError, read_archive
+from ..manifest import static_libraries
+from ..validation_cache import CRT_CACHE_FILENAME, ArchiveResultCache
 from .base import Platform
 
 if TYPE_CHECKING:
     from ..config import BuildConfig, Library
 
 
+def _environment_delta(before, after: dict[str, str]) -> dict[str, list[str]]:
+    """What running a script changed in the environment, replayable later.
+
+    Variables the script prepended to (PATH, INCLUDE, LIB, ...) are recorded
+    as the prepended part so they apply on top of a different current value.
+    Names compare case-insensitively, like Windows does.
+    """
+    original = {key.upper(): value for key, value in before.items()}
+    delta: dict[str, list[str]] = {}
+    for key, value in after.items():
+        old = original.get(key.upper())
+        if old == value:
+            continue
+        if old and value.endswith(old):
+            delta[key] = ["prepend", value[: -len(old)]]
+        else:
+            delta[key] = ["set", value]
+    return delta
+
+
+def _apply_environment_delta(base, delta: dict[str, list[str]]) -> dict[str, str]:
+    env = dict(base)
+    names = {key.upper(): key for key in env}
+    for key, (mode, value) in delta.items():
+        existing = names.get(key.upper(), key)
+        if mode == "prepend":
+            env[existing] = value + env.get(existing, "")
+        else:
+            env.pop(existing, None)
+            env[key] = value
+    return env
+
+
 class WindowsPlatform(Platform):
     """Windows-specific build configuration."""
 
-    _dumpbin_path: Optional[Path] = None
-    _dumpbin_searched: bool = False
-    _validated_libs: set[str] = set()  # Track already validated .lib files
-
-    # ClassID of the MSVC "anonymous object" header used by /GL (LTCG)
-    # compilands ({0CB3FE38-D9A5-4DAB-AC9B-D6B6222653C2}, little-endian).
-    # LTCG objects store their /DEFAULTLIB directives in opaque LTCG
-    # metadata that `dumpbin /directives` cannot read, so a lib containing
-    # them would sail through CRT validation as "no directives found"
-    # while silently pulling the wrong CRT (seen with libvpx: a /GL /MD
-    # Release lib inside a Debug-MD package → LNK4098 downstream).
-    _LTCG_ANON_OBJ_GUID = bytes((
-        0x38, 0xFE, 0xB3, 0x0C, 0xA5, 0xD9, 0xAB, 0x4D,
-        0xAC, 0x9B, 0xD6, 0xB6, 0x22, 0x26, 0x53, 0xC2,
-    ))
     _msvc_env_cache: dict[str, Optional[dict[str, str]]] = {}
 
     @property
     def name(self) -> str:
         return "windows"
 
-    def _find_dumpbin(self) -> Optional[Path]:
-        """Find dumpbin.exe using vswhere or PATH.
+    @staticmethod
+    def _vs_installation_path() -> Optional[Path]:
+        """Installation path of the latest Visual Studio with VC tools, via vswhere.
 
-        Searches in order:
-        1. PATH (if running from Developer Command Prompt)
-        2. Via vswhere to locate Visual Studio installation
+        Memoized through toolprobe, keyed on vswhere.exe and on the
+        installer's instance registry (which changes when Visual Studio is
+        installed, updated or removed).
         """
-        if WindowsPlatform._dumpbin_searched:
-            return WindowsPlatform._dumpbin_path
-
-        WindowsPlatform._dumpbin_searched = True
-
-        # First, check if dumpbin is in PATH
-        dumpbin_in_path = shutil.which("dumpbin")
-        if dumpbin_in_path:
-            WindowsPlatform._dumpbin_path = Path(dumpbin_in_path)
-            return WindowsPlatform._dumpbin_path
-
-        # Use vswhere to find Visual Studio
         vswhere_paths = [
             Path(os.environ.get("ProgramFiles(x86)", "C:\\Program Files (x86)"))
             / "Microsoft Visual Studio"
@@ -66,102 +78,47 @@ class WindowsPlatform(Platform):
             Path("C:\\Program Files (x86)\\Microsoft Visual Studio\\Installer\\vswhere.exe"),
         ]
 
-        vswhere = None
-        for p in vswhere_paths:
-            if p.exists():
-                vswhere = p
-                break
-
+        vswhere = next((p for p in vswhere_paths if p.exists()), None)
         if not vswhere:
-            print("  Warning: vswhere.exe not found")
             return None
 
-        try:
-            result = subprocess.run(
-                [
-                    str(vswhere),
-                    "-latest",
-                    "-requires",
-                    "Microsoft.VisualStudio.Component.VC.Tools.x86.x64",
-                    "-property",
-                    "installationPath",
-                ],
-                capture_output=True,
-                text=True,
-                timeout=10,
-            )
-
-            if result.returncode != 0 or not result.stdout.strip():
-                print("  Warning: vswhere could not find Visual Studio with VC tools")
-                return None
-
-            vs_path = Path(result.stdout.strip())
-            vc_tools_dir = vs_path / "VC" / "Tools" / "MSVC"
+        instances = (
+            Path(os.environ.get("ProgramData", "C:\\ProgramData"))
+            / "Microsoft" / "VisualStudio" / "Packages" / "_Instances"
+        )
 
-            if not vc_tools_dir.exists():
-                print(f"  Warning: VC tools directory not found: {vc_tools_dir}")
+        def probe() -> Optional[str]:
+            try:
+                result = subprocess.run(
+                    [
+                        str(vswhere),
+                        "-latest",
+                        "-requires",
+                        "Microsoft.VisualStudio.Component.VC.Tools.x86.x64",
+                        "-property",
+                        "installationPath",
+                    ],
+                    capture_output=True,
+                    text=True,
+                    timeout=10,
+                )
+            except (subprocess.TimeoutExpired, OSError) as e:
+                print(f"  Warning: Error running vswhere: {e}")
                 return None
-
-            # Get the latest MSVC version
-            msvc_versions = sorted(vc_tools_dir.iterdir(), reverse=True)
-            if not msvc_versions:
-                print("  Warning: No MSVC versions found")
+            if result.returncode != 0 or not result.stdout.strip():
                 return None
+            return result.stdout.strip()
 
-            # Try x64 host first, then x86
-            for host in ["Hostx64", "Hostx86"]:
-                for target in ["x64", "x86"]:
-                    dumpbin = msvc_versions[0] / "bin" / host / target / "dumpbin.exe"
-                    if dumpbin.exists():
-                        WindowsPlatform._dumpbin_path = dumpbin
-                        print(f"  Found dumpbin: {dumpbin}")
-                        return WindowsPlatform._dumpbin_path
-
-            print("  Warning: dumpbin.exe not found in MSVC installation")
-            return None
-
-        except (subprocess.TimeoutExpired, OSError) as e:
-            print(f"  Warning: Error running vswhere: {e}")
-            return None
+        path = toolprobe.memoize("vswhere", [str(vswhere)], [vswhere, instances], probe)
+        return Path(path) if path else None
 
     def _find_vcvarsall(self) -> Optional[Path]:
         """Locate vcvarsall.bat via vswhere."""
-        vswhere_paths = [
-            Path(os.environ.get("ProgramFiles(x86)", "C:\\Program Files (x86)"))
-            / "Microsoft Visual Studio"
-            / "Installer"
-            / "vswhere.exe",
-            Path("C:\\Program Files (x86)\\Microsoft Visual Studio\\Installer\\vswhere.exe"),
-        ]
-
-        vswhere = next((p for p in vswhere_paths if p.exists()), None)
-        if not vswhere:
-            return None
-
-        try:
-            result = subprocess.run(
-                [
-                    str(vswhere),
-                    "-latest",
-                    "-requires",
-                    "Microsoft.VisualStudio.Component.VC.Tools.x86.x64",
-                    "-property",
-                    "installationPath",
-                ],
-                capture_output=True,
-                text=True,
-                timeout=10,
-            )
-
-            if result.returncode != 0 or not result.stdout.strip():
-                return None
-
-            vcvarsall = (
-                Path(result.stdout.strip()) / "VC" / "Auxiliary" / "Build" / "vcvarsall.bat"
-            )
-            return vcvarsall if vcvarsall.exists() else None
-        except (subprocess.TimeoutExpired, OSError):
+        vs_path = self._vs_installation_path()
+        if not vs_path:
             return None
+        vcvarsall = vs_path / "VC" / "Auxiliary" / "Build" / "vcvarsall.bat"
+        return vcvarsall if vcvarsall.exists() else None
 
     def get_msvc_env(self, config: "BuildConfig") -> Optional[dict[str, str]]:
         """Return an environment dict with MSVC tools activated.
@@ -173,6 +130,10 @@ class WindowsPlatform(Platform):
         locate vcvarsall.bat via vswhere, execute it, and capture the
         resulting environment.
 
+        Running vcvarsall takes seconds, so what it changes is memoized
+        through toolprobe (keyed on vcvarsall.bat and the installed MSVC
+        toolsets) and replayed onto the current environment.
+
         Returns None if cl.exe is already in PATH (caller's env is fine),
         or if vcvarsall.bat could not be located.
         """
@@ -192,8 +153,41 @@ class WindowsPlatform(Platform):
             return None
 
         vcvars_arch = "arm64" if config.arch == "arm64" else "x64"
-        print(f"  Activating MSVC environment ({vcvars_arch}) via {vcvarsall}")
-
+        toolsets_dir = vcvarsall.parents[2] / "Tools" / "MSVC"
+        toolsets = sorted(p.name for p in toolsets_dir.iterdir()) if toolsets_dir.is_dir() else []
+
+        def activate() -> Optional[dict[str, list[str]]]:
+            print(f"  Activating MSVC environment ({vcvars_arch}) via {vcvarsall}")
+            env = self._run_vcvarsall(vcvarsall, vcvars_arch)
+            return _environment_delta(os.environ, env) if env is not None else None
+
+        delta = toolprobe.memoize(
+            "vcvarsall", [vcvars_arch, toolsets], [vcvarsall], activate
+        )
+        if delta is None:
+            WindowsPlatform._msvc_env_cache[cache_key] = None
+            return None
+        env = _apply_environment_delta(os.environ, delta)
+
+        # Sanity check: confirm cl.exe is actually reachable through the
+        # captured PATH. If not, vcvarsall ran but didn't update PATH the
+        # way we expected — better to know now than to fail in meson.
+        # `set` emits PATH under its stored casing, "Path" on most machines
+        # but "PATH" on some, so accept either.
+        captured_path = env.get("PATH") or env.get("Path", "")
+        cl_path = shutil.which("cl", path=captured_path)
+        if cl_path:
+            print(f"  MSVC activated: cl -> {cl_path}")
+        else:
+            print("  Warning: vcvarsall.bat ran but cl.exe is NOT in the "
+                  "resulting PATH. Meson will likely fail.")
+
+        WindowsPlatform._msvc_env_cache[cache_key] = env
+        return env
+
+    @staticmethod
+    def _run_vcvarsall(vcvarsall: Path, vcvars_arch: str) -> Optional[dict[str, str]]:
+        """The full environment after running vcvarsall.bat, or None on failure."""
         try:
             # Pass the command as one string with `/s /c "<cmd>"`, not an argv
             # list: with a list, cmd's /c de-quoting mangles a vcvarsall path
@@ -205,36 +199,19 @@ class WindowsPlatform(Platform):
                 text=True,
                 timeout=60,
             )
-            if result.returncode != 0:
-                print(f"  Warning: vcvarsall.bat failed (rc={result.returncode})")
-                WindowsPlatform._msvc_env_cache[cache_key] = None
-                return None
-
-            env: dict[str, str] = {}
-            for line in result.stdout.splitlines():
-                key, sep, value = line.partition("=")
-                if sep:
-                    env[key] = value
-
-            # Sanity check: confirm cl.exe is actually reachable through the
-            # captured PATH. If not, vcvarsall ran but didn't update PATH the
-            # way we expected — better to know now than to fail in meson.
-            # `set` emits PATH under its stored casing, "Path" on most machines
-            # but "PATH" on some, so accept either.
-            captured_path = env.get("PATH") or env.get("Path", "")
-            cl_path = shutil.which("cl", path=captured_path)
-            if cl_path:
-                print(f"  MSVC activated: cl -> {cl_path}")
-            else:
-                print("  Warning: vcvarsall.bat ran but cl.exe is NOT in the "
-                      "resulting PATH. Meson will likely fail.")
-
-            WindowsPlatform._msvc_env_cache[cache_key] = env
-            return env
         except (subprocess.TimeoutExpired, OSError) as e:
             print(f"  Warning: failed to run vcvarsall.bat: {e}")
-            WindowsPlatform._msvc_env_cache[cache_key] = None
             return None
+        if result.returncode != 0:
+            print(f"  Warning: vcvarsall.bat failed (rc={result.returncode})")
+            return None
+
+        env: dict[str, str] = {}
+        for line in result.stdout.splitlines():
+            key, sep, value = line.partition("=")
+            if sep:
+                env[key] = value
+        return env
 
     def get_generator(self) -> str:
         return "Visual Studio 17 2022"
@@ -351,23 +328,6 @@ class WindowsPlatform(Platform):
             print(f"Copying {pdb_file.name} to {pdb_dest_dir}")
             shutil.copy2(pdb_file, dest_file)
 
-    @classmethod
-    def _contains_ltcg_objects(cls, lib_file: Path) -> bool:
-        """Return True if the .lib archive contains /GL (LTCG) object members.
-
-        Detection scans for the anonymous-object header ClassID that MSVC
-        stamps on every /GL compiland. False negatives are not possible —
-        the GUID is mandatory in the format; false positives would require
-        the 16-byte sequence to appear in ordinary section data, which is
-        practically nil and errs on the safe side anyway.
-        """
-        try:
-            data = lib_file.read_bytes()
-        except OSError:
-            # Unreadable lib: let dumpbin report the real error downstream.
-            return False
-        return data.find(cls._LTCG_ANON_OBJ_GUID) != -1
-
     def _get_expected_crt(self, config: "BuildConfig") -> str:
         """Get the expected CRT directive based on configuration.
 
@@ -388,93 +348,101 @@ class WindowsPlatform(Platform):
         all_crts = {"LIBCMT", "LIBCMTD", "MSVCRT", "MSVCRTD"}
         return all_crts - {expected}
 
+    @staticmethod
+    def _read_crt_directives(lib_file: Path) -> tuple[Optional[dict], Optional[str]]:
+        """What CRT validation needs to know about one archive.
+
+        Returns ({"ltcg": bool, "crts": [...]}, None), or (None, warning)
+        when the archive could not be read.
+        """
+        try:
+            archive = read_archive(lib_file)
+        except (OSError, ArchiveFormatError) as e:
+            return None, str(e)
+        # /GL (LTCG) objects hide their /DEFAULTLIB directives in opaque
+        # LTCG metadata, so a lib containing them would sail through as
+        # "no directives found" while silently pulling the wrong CRT (seen
+        # with libvpx: a /GL /MD Release lib inside a Debug-MD package ->
+        # LNK4098 downstream).
+        return {"ltcg": bool(archive.ltcg_members), "crts": sorted(archive.crt_libraries())}, None
+
     def validate_crt_linkage(
-        self, config: "BuildConfig", install_dir: Path
+        self, config: "BuildConfig", install_dir: Path, files: Optional[list[str]] = None
     ) -> tuple[bool, list[str]]:
-        """Validate that all .lib files use the correct CRT.
+        """Validate that the installed .lib files use the correct CRT.
+
+        Only the .lib files in lib/ among `files` (the library's install
+        manifest, relative to `install_dir`) are checked; without `files`,
+        every .lib in lib/ is.
 
-        Only validates new files that haven't been checked yet.
+        The archives' .drectve sections are read directly (builder.coff), in
+        parallel; what was found in each is kept in
+        builds/<suffix>/.crt-validation.json, so archives unchanged since an
+        earlier check (same size and mtime, or same content hash) are not
+        read again, in this run or the next.
         Returns (success, error_messages).
         """
         lib_dir = install_dir / "lib"
         if not lib_dir.exists():
             return True, []
 
-        all_lib_files = list(lib_dir.glob("*.lib"))
+        if files is None:
+            all_lib_files = sorted(lib_dir.glob("*.lib"))
+        else:
+            all_lib_files = static_libraries(install_dir, files, ".lib")
         if not all_lib_files:
             return True, []
 
-        # Filter to only new files not yet validated
-        new_lib_files = [
-            f for f in all_lib_files
-            if str(f) not in WindowsPlatform._validated_libs
-        ]
-
-        if not new_lib_files:
-            return True, []
-
-        # Find dumpbin
-        dumpbin = self._find_dumpbin()
-        if not dumpbin:
-            return False, ["dumpbin.exe not found. Install Visual Studio with C++ tools."]
-
+        cache = ArchiveResultCache(config.builds_dir / CRT_CACHE_FILENAME, checker="coff-1")
         expected_crt = self._get_expected_crt(config)
         forbidden_crts = self._get_forbidden_crts(config)
-        errors: list[str] = []
-
-        # Regex to match CRT directives in dumpbin output
-        crt_pattern = re.compile(r"\b(LIBCMTD?|MSVCRTD?)\b", re.IGNORECASE)
+        report: list[str] = []
+
+        with ThreadPoolExecutor(max_workers=min(len(all_lib_files), os.cpu_count() or 1)) as pool:
+            # Looking up may hash archives whose mtime changed.
+            findings = dict(zip(all_lib_files, pool.map(cache.lookup, all_lib_files)))
+            new_lib_files = [f for f, found in findings.items() if found is None]
+
+            if new_lib_files:
+                read = pool.map(self._read_crt_directives, new_lib_files)
+                for lib_file, (found, warning) in zip(new_lib_files, read):
+                    if warning:
+                        report.append(f"  Warning: {warning}")
+                        continue
+                    findings[lib_file] = found
+                    cache.store(lib_file, found)
+                cache.save()
 
-        print(f"\n{'=' * 20} Validating CRT linkage (expected: {expected_crt}) {'=' * 20}\n")
-
-        for lib_file in new_lib_files:
-            # /GL (LTCG) objects hide their /DEFAULTLIB directives from
-            # dumpbin, making CRT validation blind. Reject them outright:
-            # a redistributable static lib must not contain LTCG objects
+        errors: list[str] = []
+        for lib_file in all_lib_files:
+            found = findings[lib_file]
+            if found is None:
+                continue
+            new = lib_file in new_lib_files
+            # A redistributable static lib must not contain LTCG objects
             # anyway (they tie the archive to the exact producing toolset).
-            if self._contains_ltcg_objects(lib_file):
+            if found["ltcg"]:
                 error = (
                     f"{lib_file.name}: contains /GL (LTCG) objects — CRT directives "
                     f"are not verifiable and the lib is tied to the producing MSVC "
                     f"toolset. Rebuild this library without /GL."
                 )
-                errors.append(error)
-                print(f"  FAIL: {error}")
-                continue
-
-            try:
-                result = subprocess.run(
-                    [str(dumpbin), "/directives", str(lib_file)],
-                    capture_output=True,
-                    text=True,
-                    timeout=30,
-                )
-
-                if result.returncode != 0:
-                    print(f"  Warning: dumpbin failed for {lib_file.name}")
-                    continue
-
-                # Find all CRT references in output
-                found_crts = set()
-                for match in crt_pattern.finditer(result.stdout):
-                    found_crts.add(match.group(1).upper())
-
-                # Check for forbidden CRTs
+            else:
+                found_crts = set(found["crts"])
                 bad_crts = found_crts & forbidden_crts
-                if bad_crts:
-                    error = f"{lib_file.name}: found {', '.join(sorted(bad_crts))} (expected only {expected_crt})"
-                    errors.append(error)
-                    print(f"  FAIL: {error}")
-                else:
-                    # Mark as validated only if successful
-                    WindowsPlatform._validated_libs.add(str(lib_file))
-                    if found_crts:
-                        print(f"  OK: {lib_file.name} -> {', '.join(sorted(found_crts))}")
-                    else:
-                        print(f"  SKIP: {lib_file.name} (no CRT directives found)")
-
-            except subprocess.TimeoutExpired:
-                print(f"  Warning: dumpbin timeout for {lib_file.name}")
-                continue
+                if not bad_crts:
+                    if new and found_crts:
+                        report.append(f"  OK: {lib_file.name} -> {', '.join(sorted(found_crts))}")
+                    elif new:
+                        report.append(f"  SKIP: {lib_file.name} (no CRT directives found)")
+                    continue
+                error = f"{lib_file.name}: found {', '.join(sorted(bad_crts))} (expected only {expected_crt})"
+            errors.append(error)
+            report.append(f"  FAIL: {error}")
+
+        # Silent when every archive was already checked and is fine.
+        if report:
+            print(f"\n{'=' * 20} Validating CRT linkage (expected: {expected_crt}) {'=' * 20}\n")
+            print("\n".join(report))
 
         return len(errors) == 0, errors
@@ -0,0 +1,452 @@
+"""
+Dependency-driven build scheduling.
+
+`BuildScheduler` walks the `depends_on` graph of the requested libraries and
+starts each one as soon as every dependency it has in the build set has
+installed. With a single job this is the classic serial loop with output on
+the console. With more jobs, up to N configure/build/install pipelines run at
+once, each writing to its own log under builds/<suffix>/logs/ while a status
+table on the terminal tracks progress.
+
+By default the first failure stops new libraries from starting. With
+`keep_going`, only the failed library's dependents (transitively) are
+skipped and every independent library is still built.
+
+With an artifact cache, a library whose fingerprint has an archive in the
+cache is restored from it instead of being built, and every library that
+does build is stored in the cache afterwards.
+"""
+
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from pathlib import Path
+from typing import TYPE_CHECKING, Collection, Optional
+
+from .artifact_cache import LocalArtifactCache
+from .autotools_builder import AutotoolsBuilder
+from .cmake_builder import CMakeBuilder
+from .config import BuildConfig, Library
+from .execution import console, install_output_routing, job_output
+from .fingerprint import Fingerprinter
+from .jobserver import active as active_jobserver
+from .manifest import static_library_stats
+from .meson_builder import MesonBuilder
+from .msys2_builder import Msys2Builder
+from .staging import Stage
+from .timing import active as active_timings, add_metric, format_duration, phase
+
+if TYPE_CHECKING:
+    from .platforms.base import Platform
+
+
+_BUILDERS = {
+    "autotools": AutotoolsBuilder,
+    "meson": MesonBuilder,
+    "msys2": Msys2Builder,
+}
+
+# Lines of a failed library's log echoed to the console in parallel mode, so
+# CI output shows the error without digging through the log directory.
+_FAILURE_LOG_TAIL = 40
+
+
+def create_builder(config: BuildConfig, platform: "Platform", lib: Library):
+    """Instantiate the builder matching the library's (platform-specific) build system.
+
+    Builders keep per-library state (current lib, cross-compile flags), so the
+    scheduler creates a fresh one for every library it starts.
+    """
+    build_system = lib.get_build_system(config.platform_name)
+    builder_class = _BUILDERS.get(build_system, CMakeBuilder)
+    return builder_class(config, platform)
+
+
+class StatusBoard:
+    """Live progress display for a parallel build.
+
+    On a terminal, finished libraries scroll by as one line each while a
+    table of the running ones is redrawn in place below them. On a pipe (CI
+    logs) every state change is printed as a plain line instead.
+    """
+
+    def __init__(self, total: int):
+        self.stream = console()
+        self.interactive = self.stream.isatty() and (
+            os.name != "nt" or "WT_SESSION" in os.environ or "TERM" in os.environ
+        )
+        self.total = total
+        self.finished = 0
+        self.failures = 0
+        self.running: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._drawn = 0
+        self._stop = threading.Event()
+        self._ticker: threading.Thread | None = None
+        if self.interactive:
+            self._ticker = threading.Thread(target=self._tick, daemon=True)
+            self._ticker.start()
+
+    def started(self, name: str) -> None:
+        with self._lock:
+            self.running[name] = time.monotonic()
+            if not self.interactive:
+                self._emit(f"{self._progress()} started  {name}")
+            self._redraw()
+
+    def up_to_date(self, name: str) -> None:
+        with self._lock:
+            self.finished += 1
+            self._emit(f"{self._progress()} up to date {name}")
+            self._redraw()
+
+    def skipped(self, name: str, failed_dep: str) -> None:
+        with self._lock:
+            self.finished += 1
+            self._emit(f"{self._progress()} skipped  {name} ({failed_dep} failed)")
+            self._redraw()
+
+    def finished_build(self, name: str, success: bool, log_path: Path) -> None:
+        with self._lock:
+            elapsed = time.monotonic() - self.running.pop(name, time.monotonic())
+            self.finished += 1
+            if success:
+                line = f"{self._progress()} done     {name} ({format_duration(elapsed)})"
+            else:
+                self.failures += 1
+                line = (
+                    f"{self._progress()} FAILED   {name} ({format_duration(elapsed)}) "
+                    f"- log: {log_path}"
+                )
+            self._emit(line)
+            self._redraw()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._ticker is not None:
+            self._ticker.join()
+        with self._lock:
+            self._clear()
+
+    def _progress(self) -> str:
+        width = len(str(self.total))
+        return f"[{self.finished:>{width}}/{self.total}]"
+
+    def _tick(self) -> None:
+        while not self._stop.wait(1.0):
+            with self._lock:
+                self._redraw()
+
+    def _emit(self, line: str) -> None:
+        self._clear()
+        self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def _clear(self) -> None:
+        if self._drawn:
+            self.stream.write("\x1b[1A\x1b[2K" * self._drawn)
+            self._drawn = 0
+
+    def _redraw(self) -> None:
+        if not self.interactive:
+            return
+        self._clear()
+        now = time.monotonic()
+        queued = self.total - self.finished - len(self.running)
+        lines = [
+            f"{self._progress()} {len(self.running)} running, {queued} queued, "
+            f"{self.failures} failed"
+        ]
+        for name, started in sorted(self.running.items(), key=lambda item: item[1]):
+            lines.append(f"    {name:<24} {format_duration(now - started):>8}")
+        self.stream.write("\n".join(lines) + "\n")
+        self.stream.flush()
+        self._drawn = len(lines)
+
+
+class BuildScheduler:
+    """Builds a set of libraries in dependency order, optionally in parallel."""
+
+    def __init__(
+        self,
+        config: BuildConfig,
+        platform: "Platform",
+        libraries: list[Library],
+        jobs: int = 1,
+        fingerprints: Optional[Fingerprinter] = None,
+        force: bool = False,
+        cache: Optional[LocalArtifactCache] = None,
+        priorities: Optional[dict[str, float]] = None,
+        keep_going: bool = False,
+        rebuild: Collection[str] = (),
+    ):
+        self.config = config
+        self.platform = platform
+        self.jobs = max(1, jobs)
+        # Without a fingerprinter every library is built; with `force` every
+        # library is rebuilt but its fingerprint is still recorded.
+        self.fingerprints = fingerprints
+        self.force = force
+        # Libraries built like with `force` (--rebuild) while the others may
+        # still be up to date or restored.
+        self.rebuild = set(rebuild)
+        # The cache needs fingerprints to address archives; `force` bypasses
+        # restoring but still refreshes the stored archive.
+        self.cache = cache if fingerprints is not None else None
+        self.keep_going = keep_going
+        self.log_dir = config.builds_dir / "logs"
+        self.libraries = {lib.name: lib for lib in libraries}
+        # The incoming list is already in preferred build order. With
+        # priorities (critical-path bottom levels), the ready library with the
+        # longest chain still ahead of it starts first; ties fall back to the
+        # list order.
+        self._rank = {lib.name: index for index, lib in enumerate(libraries)}
+        self._priorities = priorities or {}
+
+        # Only edges inside the build set gate scheduling. A dependency left
+        # out of it (--no-deps) is assumed to be installed already.
+        self._waiting_on: dict[str, set[str]] = {
+            lib.name: {dep for dep in lib.depends_on if dep in self.libraries}
+            for lib in libraries
+        }
+        self._queued: set[str] = set(self.libraries)
+
+        self.succeeded: list[str] = []
+        self.up_to_date: list[str] = []
+        self.failed: list[str] = []
+        # Subset of `succeeded` that was restored from the artifact cache.
+        self.restored: list[str] = []
+        # Libraries skipped by --keep-going -> the failed library they depend on.
+        self.skipped: dict[str, str] = {}
+
+    @property
+    def not_built(self) -> list[str]:
+        """Libraries never started because the run stopped on a failure."""
+        return sorted(self._queued, key=self._rank.__getitem__)
+
+    def run(self) -> bool:
+        """Build every library. Returns True when all of them succeeded."""
+        if self.jobs == 1:
+            self._run_serial()
+        else:
+            self._run_parallel()
+        return not self.failed and not self._queued and not self.skipped
+
+    def _may_launch(self) -> bool:
+        return self.keep_going or not self.failed
+
+    def _ready(self) -> list[str]:
+        """Queued libraries whose in-set dependencies have all installed."""
+        ready = [name for name in self._queued if not self._waiting_on[name]]
+        return sorted(
+            ready, key=lambda name: (-self._priorities.get(name, 0.0), self._rank[name])
+        )
+
+    def _skip_if_up_to_date(self, name: str) -> bool:
+        """Retire a ready library without building it when its fingerprint matches."""
+        lib = self.libraries[name]
+        if self._forced(name) or self.fingerprints is None:
+            return False
+        if not self.fingerprints.is_up_to_date(lib):
+            return False
+        self._queued.discard(name)
+        self.up_to_date.append(name)
+        self._release_dependents(name)
+        return True
+
+    def _forced(self, name: str) -> bool:
+        return self.force or name in self.rebuild
+
+    def _start(self, name: str) -> Library:
+        self._queued.discard(name)
+        lib = self.libraries[name]
+        if self.fingerprints is not None:
+            self.fingerprints.invalidate(lib)
+        return lib
+
+    def _finish(self, name: str, success: bool) -> list[str]:
+        """Record a finished library; returns the dependents skipped because of it."""
+        if not success:
+            self.failed.append(name)
+            return self._skip_dependents(name) if self.keep_going else []
+        self.succeeded.append(name)
+        if self.fingerprints is not None:
+            self.fingerprints.record(self.libraries[name])
+        self._release_dependents(name)
+        return []
+
+    def _skip_dependents(self, failed: str) -> list[str]:
+        """Drop every queued library that depends on `failed`, directly or not."""
+        skipped = []
+        frontier = [failed]
+        while frontier:
+            current = frontier.pop()
+            for name in sorted(self._queued, key=self._rank.__getitem__):
+                if current in self.libraries[name].depends_on:
+                    self._queued.discard(name)
+                    self.skipped[name] = failed
+                    skipped.append(name)
+                    frontier.append(name)
+        return skipped
+
+    def _release_dependents(self, name: str) -> None:
+        for waiting in self._waiting_on.values():
+            waiting.discard(name)
+
+    def _run_serial(self) -> None:
+        while self._may_launch():
+            ready = self._ready()
+            if not ready:
+                break
+            if self._skip_if_up_to_date(ready[0]):
+                print(f"'{ready[0]}' is up to date, skipping")
+                continue
+            lib = self._start(ready[0])
+            success = self._build_library(lib)
+            if not success:
+                print(f"\nError: Failed to build '{lib.name}'", file=sys.stderr)
+            for skipped in self._finish(lib.name, success):
+                print(f"Skipping '{skipped}': depends on '{lib.name}', which failed")
+
+    def _run_parallel(self) -> None:
+        install_output_routing()
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        print(f"Building with {self.jobs} parallel jobs; logs in {self.log_dir}\n")
+
+        board = StatusBoard(len(self.libraries))
+        running: dict[Future, str] = {}
+        try:
+            with ThreadPoolExecutor(
+                max_workers=self.jobs, thread_name_prefix="build"
+            ) as pool:
+                while True:
+                    self._launch_ready(pool, running, board)
+                    if not running:
+                        break
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        success = future.result()
+                        board.finished_build(name, success, self._log_path(name))
+                        for skipped in self._finish(name, success):
+                            board.skipped(skipped, name)
+        finally:
+            board.close()
+
+        for name in self.failed:
+            self._print_log_tail(name)
+
+    def _launch_ready(
+        self,
+        pool: ThreadPoolExecutor,
+        running: dict[Future, str],
+        board: StatusBoard,
+    ) -> None:
+        """Submit ready libraries up to the job limit.
+
+        Up-to-date libraries are retired on the spot, which may make their
+        dependents ready in turn, so keep sweeping until nothing changes. After
+        a failure nothing new is launched (unless keep_going); builds in
+        flight finish cleanly.
+        """
+        progress = True
+        while progress and self._may_launch():
+            progress = False
+            for name in self._ready():
+                if self._skip_if_up_to_date(name):
+                    board.up_to_date(name)
+                    progress = True
+                    continue
+                if len(running) >= self.jobs:
+                    break
+                lib = self._start(name)
+                board.started(name)
+                running[pool.submit(self._build_logged, lib)] = name
+
+    def _log_path(self, name: str) -> Path:
+        return self.log_dir / f"{name}.log"
+
+    def _build_logged(self, lib: Library) -> bool:
+        """Worker body: build one library with its output captured to its log.
+
+        With a jobserver, the library holds one job slot for its whole build
+        (configure steps are single-threaded work too).
+        """
+        jobserver = active_jobserver()
+        slot = jobserver.library_slot() if jobserver is not None else nullcontext()
+        with job_output(self._log_path(lib.name)), slot:
+            try:
+                return self._build_library(lib)
+            except Exception:
+                traceback.print_exc()
+                return False
+
+    def _build_library(self, lib: Library) -> bool:
+        """Build `lib`, timed as one library span when timings are recorded."""
+        timings = active_timings()
+        if timings is None:
+            return self._restore_or_build(lib)
+        success = False
+        try:
+            with timings.library(lib.name):
+                success = self._restore_or_build(lib)
+        finally:
+            if not success:
+                timings.set_outcome(lib.name, "failed")
+            elif lib.name in self.restored:
+                timings.set_outcome(lib.name, "restored")
+        return success
+
+    def _restore_or_build(self, lib: Library) -> bool:
+        """Restore `lib` from the artifact cache, or build it and cache the result."""
+        install_dir = self.config.library_paths(lib).install_dir
+        fingerprint = None
+        if self.cache is not None:
+            fingerprint = self.fingerprints.fingerprint(lib)
+            if not self._forced(lib.name):
+                stage = Stage(self.config, lib.name)
+                stage.reset()
+                with phase("restore"):
+                    files = self.cache.restore(
+                        lib.name, fingerprint, stage.prefix, prefix=install_dir
+                    )
+                if files is not None:
+                    with phase("publish"):
+                        stage.publish()
+                    print(f"Restored '{lib.name}' from cache ({len(files)} files)")
+                    self.restored.append(lib.name)
+                    return True
+
+        builder = create_builder(self.config, self.platform, lib)
+        if not builder.build(lib):
+            return False
+        for name, value in static_library_stats(install_dir, builder.installed_files).items():
+            add_metric(name, value)
+
+        if fingerprint is not None:
+            with phase("cache_store"):
+                archive = self.cache.store(
+                    lib.name, fingerprint, install_dir, builder.installed_files
+                )
+            if archive is not None:
+                print(f"Stored '{lib.name}' in cache: {archive}")
+                add_metric("cache_archive_bytes", archive.stat().st_size)
+        return True
+
+    def _print_log_tail(self, name: str) -> None:
+        log_path = self._log_path(name)
+        try:
+            lines = log_path.read_text(encoding="utf-8", errors="replace").splitlines()
+        except OSError:
+            return
+        print(
+            f"\n{'=' * 20} Last {_FAILURE_LOG_TAIL} lines of {log_path} {'=' * 20}\n",
+            file=sys.stderr,
+        )
+        for line in lines[-_FAILURE_LOG_TAIL:]:
+            print(line, file=sys.stderr)
@@ -0,0 +1,108 @@
+"""
+Staged installs: every library installs into a private prefix first.
+
+The install step writes below `builds/<suffix>/.stage/<library>` instead of
+the shared `output/<suffix>` (`DESTDIR` for CMake and make, `--destdir` for
+meson; the staged prefix is the install prefix re-rooted there, without its
+drive on Windows). Post-install steps and validation run on the staged files,
+and only a library that passed them is published:
+
+- each file is hard-linked (copied where the filesystem cannot link) next to
+  its destination and renamed over it, so the shared prefix never holds a
+  partially written file and readers see either the old or the new one;
+- files its previous install owned and this one does not are removed;
+- the library's manifest (paths and SHA-256) is written last.
+
+Nothing but the publish touches shared state, so it is the only part of an
+install that takes the install lock. The staged files are kept until the
+library installs again: they cost no space (they are the published files),
+and validation results cached for them stay valid.
+"""
+
+import os
+import shutil
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .execution import install_lock
+from .manifest import STATE_DIRNAME, file_digest, read_manifest, remove_files, write_manifest
+
+if TYPE_CHECKING:
+    from .config import BuildConfig
+
+STAGE_DIRNAME = ".stage"
+
+
+def staged_path(root: Path, path: Path) -> Path:
+    """Where an install with DESTDIR=`root` puts the absolute `path`."""
+    return root.joinpath(*path.absolute().parts[1:])
+
+
+class Stage:
+    """The private install prefix of one library."""
+
+    def __init__(self, config: "BuildConfig", lib_name: str):
+        self.lib_name = lib_name
+        self.install_dir = config.output_dir
+        # DESTDIR of the install step.
+        self.root = (config.builds_dir / STAGE_DIRNAME / lib_name).absolute()
+        # Where the install prefix ends up under `root`.
+        self.prefix = staged_path(self.root, self.install_dir)
+
+    def reset(self) -> None:
+        """Remove what an earlier install staged."""
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def files(self) -> list[str]:
+        """Staged files (and symlinks), as POSIX paths relative to the prefix."""
+        files = []
+        for dirpath, dirnames, filenames in os.walk(self.prefix):
+            if Path(dirpath) == self.prefix and STATE_DIRNAME in dirnames:
+                dirnames.remove(STATE_DIRNAME)
+            # Symlinks to directories are listed as directories; publish them
+            # as links instead of descending.
+            for dirname in [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]:
+                dirnames.remove(dirname)
+                filenames.append(dirname)
+            for filename in filenames:
+                rel = (Path(dirpath) / filename).relative_to(self.prefix)
+                files.append(rel.as_posix())
+        return sorted(files)
+
+    def publish(self) -> list[str]:
+        """Publish the staged files into the install dir and record the manifest.
+
+        Files the previous install of the library owned and this one does
+        not install are removed (see manifest.remove_files), so the new
+        manifest still covers everything the library left in the prefix.
+        Returns the published files (relative to the install dir).
+        """
+        files = self.files()
+        # Hash before taking the lock; the staged files do not change.
+        hashes = {rel: file_digest(self.prefix / rel) for rel in files}
+        with install_lock:
+            previous = read_manifest(self.install_dir, self.lib_name) or {}
+            for rel in files:
+                _publish_file(self.prefix / rel, self.install_dir / rel)
+            stale = {rel: digest for rel, digest in previous.items() if rel not in hashes}
+            if stale:
+                removed, _ = remove_files(self.install_dir, self.lib_name, stale)
+                if removed:
+                    print(f"Removed {len(removed)} files no longer installed by '{self.lib_name}'")
+            write_manifest(self.install_dir, self.lib_name, hashes)
+        return files
+
+
+def _publish_file(source: Path, destination: Path) -> None:
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    tmp = destination.with_name(f".{destination.name}.{os.getpid()}.publish")
+    tmp.unlink(missing_ok=True)
+    if source.is_symlink():
+        os.symlink(os.readlink(source), tmp)
+    else:
+        try:
+            os.link(source, tmp)
+        except OSError:
+            # Another filesystem, or one without hard links.
+            shutil.copy2(source, tmp)
+    os.replace(tmp, destination)
@@ -0,0 +1,323 @@
+"""
+Per-phase build timing.
+
+The scheduler opens a `library()` span around every library it builds and
+the builders wrap each step (patch, configure, build, install, ...) in
+`phase()`. The resulting spans are written to
+`builds/<suffix>/build-timings.json` after every run, can be exported as a
+Chrome trace (chrome://tracing, https://ui.perfetto.dev) and are summarized
+in a per-library table.
+
+Lanes are the trace's "threads": a library takes the lowest lane that is
+free when it starts, so a parallel build shows as at most --jobs rows.
+
+Commands run through `execution.run_command` also report their CPU time and
+peak RSS, and the scheduler adds output metrics (static libraries, object
+files, bytes); these per-library metrics travel with the spans.
+
+The total build time of each library is also kept across runs in
+`builds/<suffix>/library-durations.json` (the last few samples per library),
+which critical-path analysis and scheduling priorities are based on.
+"""
+
+import json
+import socket
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+TIMINGS_FILENAME = "build-timings.json"
+DURATIONS_FILENAME = "library-durations.json"
+
+# Samples kept per library; the median smooths out a run that shared the
+# machine with something else.
+_DURATION_SAMPLES = 5
+
+_local = threading.local()
+_active: Optional["BuildTimings"] = None
+
+
+def format_duration(seconds: float) -> str:
+    """Render a duration as `42.1s` or `3m07s`."""
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, secs = divmod(int(seconds), 60)
+    return f"{minutes}m{secs:02d}s"
+
+
+@dataclass
+class Span:
+    """One timed interval, in seconds since the start of the run."""
+
+    library: str
+    phase: str
+    start: float
+    end: float
+    lane: int
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class BuildTimings:
+    """Collects library and phase spans for one build.py run."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._origin = time.monotonic()
+        self.spans: list[Span] = []
+        # library name -> "built", "restored", "failed"
+        self.outcomes: dict[str, str] = {}
+        # library name -> {metric: value}, see add_metric()
+        self.metrics: dict[str, dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._busy_lanes: set[int] = set()
+
+    def now(self) -> float:
+        return time.monotonic() - self._origin
+
+    def _take_lane(self) -> int:
+        with self._lock:
+            lane = 0
+            while lane in self._busy_lanes:
+                lane += 1
+            self._busy_lanes.add(lane)
+            return lane
+
+    def _add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def library(self, name: str) -> Iterator[None]:
+        """Time a whole library; phases entered on this thread attach to it."""
+        lane = self._take_lane()
+        previous = getattr(_local, "library", None)
+        _local.library = (name, lane)
+        start = self.now()
+        try:
+            yield
+        finally:
+            _local.library = previous
+            self._add(Span(name, "total", start, self.now(), lane))
+            with self._lock:
+                self._busy_lanes.discard(lane)
+
+    def set_outcome(self, name: str, outcome: str) -> None:
+        self.outcomes[name] = outcome
+
+    def _add_metric(self, library: str, name: str, value: float, peak: bool) -> None:
+        with self._lock:
+            metrics = self.metrics.setdefault(library, {})
+            if name in metrics:
+                value = max(metrics[name], value) if peak else metrics[name] + value
+            metrics[name] = value
+
+    # -- reporting --------------------------------------------------------
+
+    def phases_by_library(self) -> dict[str, dict[str, float]]:
+        """{library: {phase: seconds}}, phases summed, in start order."""
+        result: dict[str, dict[str, float]] = {}
+        for span in sorted(self.spans, key=lambda s: s.start):
+            phases = result.setdefault(span.library, {})
+            phases[span.phase] = phases.get(span.phase, 0.0) + span.duration
+        return result
+
+    def to_dict(self) -> dict:
+        libraries = {}
+        for name, phases in self.phases_by_library().items():
+            total = phases.pop("total", sum(phases.values()))
+            libraries[name] = {
+                "outcome": self.outcomes.get(name, "built"),
+                "total": round(total, 3),
+                "phases": {phase: round(secs, 3) for phase, secs in phases.items()},
+                "metrics": self.metrics.get(name, {}),
+            }
+        return {
+            "started_at": self.started_at,
+            "host": socket.gethostname(),
+            "wall_time": round(self.now(), 3),
+            "libraries": libraries,
+            "spans": [
+                {
+                    "library": span.library,
+                    "phase": span.phase,
+                    "start": round(span.start, 3),
+                    "end": round(span.end, 3),
+                    "lane": span.lane,
+                }
+                for span in self.spans
+            ],
+        }
+
+    def built_durations(self) -> dict[str, float]:
+        """Total time of every library actually built (not restored or failed)."""
+        return {
+            span.library: span.duration
+            for span in self.spans
+            if span.phase == "total" and self.outcomes.get(span.library, "built") == "built"
+        }
+
+    def write_json(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2) + "\n", encoding="utf-8")
+
+    def write_chrome_trace(self, path: Path) -> None:
+        """Export the run in the Trace Event Format (one row per lane)."""
+        events = [
+            {"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "build.py"}}
+        ]
+        for lane in sorted({span.lane for span in self.spans}):
+            events.append(
+                {"name": "thread_name", "ph": "M", "pid": 1, "tid": lane,
+                 "args": {"name": f"lane {lane}"}}
+            )
+        for span in sorted(self.spans, key=lambda s: (s.start, -s.duration)):
+            is_library = span.phase == "total"
+            events.append(
+                {
+                    "name": span.library if is_library else span.phase,
+                    "cat": "library" if is_library else "phase",
+                    "ph": "X",
+                    "pid": 1,
+                    "tid": span.lane,
+                    "ts": round(span.start * 1e6),
+                    "dur": round(span.duration * 1e6),
+                    "args": {
+                        "library": span.library,
+                        "outcome": self.outcomes.get(span.library, "built"),
+                    },
+                }
+            )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}) + "\n",
+            encoding="utf-8",
+        )
+
+    def print_summary(self) -> None:
+        """Per-library table, slowest first."""
+        libraries = self.phases_by_library()
+        if not libraries:
+            return
+        columns = ["configure", "build", "install"]
+        rows = []
+        for name, phases in libraries.items():
+            phases = dict(phases)
+            total = phases.pop("total", sum(phases.values()))
+            other = sum(secs for phase, secs in phases.items() if phase not in columns)
+            rows.append((total, name, [phases.get(c) for c in columns], other))
+        rows.sort(reverse=True)
+
+        width = max(len("Library"), *(len(name) for _, name, _, _ in rows))
+        header = f"{'Library':<{width}}  " + "  ".join(
+            f"{c:>9}" for c in [*columns, "other", "total"]
+        )
+        print(f"\n{'=' * 20} Build timings {'=' * 20}\n")
+        print(header)
+        print("-" * len(header))
+        for total, name, values, other in rows:
+            cells = [format_duration(v) if v is not None else "-" for v in values]
+            cells += [format_duration(other), format_duration(total)]
+            outcome = self.outcomes.get(name, "built")
+            suffix = f"  ({outcome})" if outcome != "built" else ""
+            print(f"{name:<{width}}  " + "  ".join(f"{c:>9}" for c in cells) + suffix)
+        print(f"\nWall time: {format_duration(self.now())}")
+        saved = [
+            metrics["configure_saved_seconds"]
+            for metrics in self.metrics.values()
+            if "configure_saved_seconds" in metrics
+        ]
+        if saved:
+            print(
+                f"Configure skipped for {len(saved)} unchanged "
+                f"{'library' if len(saved) == 1 else 'libraries'}, "
+                f"saving ~{format_duration(sum(saved))}"
+            )
+
+
+def _read_duration_samples(builds_dir: Path) -> dict[str, list[float]]:
+    path = builds_dir / DURATIONS_FILENAME
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return {
+        name: [float(s) for s in samples]
+        for name, samples in data.items()
+        if isinstance(samples, list) and samples
+    }
+
+
+def load_durations(builds_dir: Path) -> dict[str, float]:
+    """Median recorded build time per library (seconds); missing when never built."""
+    return {
+        name: statistics.median(samples)
+        for name, samples in _read_duration_samples(builds_dir).items()
+    }
+
+
+def update_durations(builds_dir: Path, timings: BuildTimings) -> None:
+    """Append this run's build times to the per-library duration history."""
+    built = timings.built_durations()
+    if not built:
+        return
+    samples = _read_duration_samples(builds_dir)
+    for name, seconds in built.items():
+        samples[name] = (samples.get(name, []) + [round(seconds, 3)])[-_DURATION_SAMPLES:]
+    path = builds_dir / DURATIONS_FILENAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(samples, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def active() -> Optional[BuildTimings]:
+    """The timings of the running build, or None when not recording."""
+    return _active
+
+
+@contextmanager
+def record_timings() -> Iterator[BuildTimings]:
+    """Record spans for the duration of a build."""
+    global _active
+    timings = BuildTimings()
+    _active = timings
+    try:
+        yield timings
+    finally:
+        _active = None
+
+
+def add_metric(name: str, value: float, peak: bool = False) -> None:
+    """Add `value` to a metric of the library being built on this thread.
+
+    Values are summed, or with `peak` the maximum is kept. A no-op outside a
+    recorded library.
+    """
+    timings = _active
+    current = getattr(_local, "library", None)
+    if timings is not None and current is not None:
+        timings._add_metric(current[0], name, value, peak)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time one step of the library being built on this thread.
+
+    A no-op outside a recorded library, so builders can always use it.
+    """
+    timings = _active
+    current = getattr(_local, "library", None)
+    if timings is None or current is None:
+        yield
+        return
+    library, lane = current
+    start = timings.now()
+    try:
+        yield
+    finally:
+        timings._add(Span(library, name, start, timings.now(), lane))
@@ -0,0 +1,136 @@
+"""
+Memoized toolchain probes.
+
+Version checks, compiler signatures, vswhere lookups and the vcvarsall
+environment are asked for by tools_check, the fingerprinter and every
+builder. Each probe runs once per process; with a cache file enabled
+(`enable_disk_cache`, done by build.py in the artifact cache directory),
+results also survive across runs.
+
+A result is keyed on the probe's arguments and on the path, mtime and size
+of the files it depends on (the binary it runs, vcvarsall.bat, ...), so
+upgrading or swapping a tool invalidates it. Failed probes (timeouts, tools
+that cannot be started) are only remembered for the current process.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+PROBE_CACHE_FILENAME = "toolprobe.json"
+
+_MAX_DISK_ENTRIES = 256
+
+_lock = threading.Lock()
+_memory: dict[str, Any] = {}
+_disk_path: Optional[Path] = None
+_disk: Optional[dict[str, Any]] = None
+
+
+def enable_disk_cache(path: Path) -> None:
+    """Persist probe results in `path` (a JSON file) from now on."""
+    global _disk_path, _disk
+    with _lock:
+        _disk_path = path
+        _disk = None
+
+
+def _file_identity(path: Optional[Path]) -> Optional[list]:
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return [str(path), None, None]
+    return [os.path.realpath(path), st.st_mtime_ns, st.st_size]
+
+
+def _load_disk() -> dict[str, Any]:
+    global _disk
+    if _disk is None:
+        _disk = {}
+        if _disk_path is not None:
+            try:
+                data = json.loads(_disk_path.read_text(encoding="utf-8"))
+                if isinstance(data, dict):
+                    _disk = data
+            except (OSError, ValueError):
+                pass
+    return _disk
+
+
+def _save_disk(key: str, value: Any) -> None:
+    global _disk
+    if _disk_path is None:
+        return
+    # Merge with what other build.py processes wrote since we loaded it.
+    _disk = None
+    disk = _load_disk()
+    disk.pop(key, None)
+    disk[key] = value
+    # Entries of replaced tools are never looked up again; keep the newest.
+    disk = dict(list(disk.items())[-_MAX_DISK_ENTRIES:])
+    _disk = disk
+    try:
+        _disk_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _disk_path.with_name(f"{_disk_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(disk, indent=1) + "\n", encoding="utf-8")
+        os.replace(tmp, _disk_path)
+    except OSError:
+        pass
+
+
+def memoize(
+    name: str,
+    inputs: Any,
+    files: list[Optional[Path]],
+    compute: Callable[[], Any],
+) -> Any:
+    """Return `compute()`, cached under `name`, `inputs` and the state of `files`.
+
+    The result must be JSON-serializable. A None result is not written to
+    disk, so a transient failure is retried by the next run.
+    """
+    key_data = json.dumps(
+        [name, inputs, [_file_identity(f) for f in files]], sort_keys=True, default=str
+    )
+    key = f"{name}:{hashlib.sha256(key_data.encode('utf-8')).hexdigest()[:24]}"
+    with _lock:
+        if key in _memory:
+            return _memory[key]
+        disk = _load_disk()
+        if key in disk:
+            _memory[key] = disk[key]
+            return disk[key]
+
+    value = compute()
+
+    with _lock:
+        _memory[key] = value
+        if value is not None:
+            _save_disk(key, value)
+    return value
+
+
+def run(cmd: list[str], timeout: float = 10) -> Optional[tuple[int, str, str]]:
+    """(returncode, stdout, stderr) of a probe command, or None if it cannot run.
+
+    Only for commands whose output depends on the binary alone, like
+    `--version`.
+    """
+
+    def compute() -> Optional[list]:
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return [result.returncode, result.stdout, result.stderr]
+
+    resolved = shutil.which(cmd[0])
+    value = memoize("run", cmd, [Path(resolved) if resolved else None], compute)
+    return tuple(value) if value is not None else None
@@ -5,9 +5,10 @@ from __future__ import annotations
 import os
 import re
 import shutil
-import subprocess
 from pathlib import Path
 
+from . import toolprobe
+
 
 COMMON_TOOLS: list[tuple[str, str]] = [
     ("CMake", "cmake"),
@@ -99,16 +100,17 @@ def report_missing_tools(missing: list[str]) -> None:
 
 
 def _run_version(cmd: list[str]) -> str | None:
-    """Invoke `cmd` and return its combined stdout/stderr, or None on failure."""
-    try:
-        result = subprocess.run(
-            cmd, capture_output=True, text=True, timeout=10
-        )
-    except (OSError, subprocess.TimeoutExpired):
+    """Invoke `cmd` and return its combined stdout/stderr, or None on failure.
+
+    Memoized (see toolprobe): the builders ask the same compilers again.
+    """
+    result = toolprobe.run(cmd)
+    if result is None:
         return None
-    if result.returncode != 0:
+    returncode, stdout, stderr = result
+    if returncode != 0:
         return None
-    return result.stdout or result.stderr
+    return stdout or stderr
 
 
 def _parse_major_minor(text: str) -> tuple[int, int] | None:
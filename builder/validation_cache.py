@@ -0,0 +1,114 @@
+"""
+Persistent results of per-archive post-install validation.
+
+The CRT check (Windows) and the architecture check (macOS) run after every
+library over every archive in the install dir, most of which were already
+checked after earlier libraries or in earlier runs. What a check found in an
+archive (the CRT directives it carries, its architectures) is stored in a
+JSON file under `builds/<suffix>/` together with the archive's size, mtime
+and SHA-256:
+
+- same size and mtime: the stored result is used as is;
+- otherwise the archive is hashed, and an unchanged hash still reuses the
+  result (a reinstall that rewrote identical bytes);
+- a changed hash, or an archive never seen, is checked again.
+
+Only raw findings are stored; whether they are acceptable is decided by the
+caller for the current configuration each time. Results are tagged with the
+checker that produced them, so changing how archives are read invalidates
+them.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+from .manifest import file_sha256
+
+CRT_CACHE_FILENAME = ".crt-validation.json"
+ARCH_CACHE_FILENAME = ".arch-validation.json"
+
+# Libraries building in parallel validate into the same install dir.
+_lock = threading.Lock()
+
+
+class ArchiveResultCache:
+    """Check results of archives, keyed on their path, stat and content hash."""
+
+    def __init__(self, path: Path, checker: str):
+        self.path = path
+        self.checker = checker
+        self._entries: Optional[dict[str, dict]] = None
+        self._dirty: dict[str, dict] = {}
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def lookup(self, archive: Path) -> Optional[Any]:
+        """The stored result for `archive` if it has not changed, else None."""
+        with _lock:
+            if self._entries is None:
+                self._entries = self._load()
+            entry = self._entries.get(str(archive))
+        if entry is None or entry.get("checker") != self.checker:
+            return None
+        try:
+            st = archive.stat()
+        except OSError:
+            return None
+        if (st.st_size, st.st_mtime_ns) == (entry["size"], entry["mtime_ns"]):
+            return entry["result"]
+        if st.st_size != entry["size"] or file_sha256(archive) != entry["sha256"]:
+            return None
+        self._remember(archive, {**entry, "mtime_ns": st.st_mtime_ns})
+        return entry["result"]
+
+    def store(self, archive: Path, result: Any) -> None:
+        """Record the result of checking `archive` (as it is on disk now)."""
+        try:
+            st = archive.stat()
+            digest = file_sha256(archive)
+        except OSError:
+            return
+        self._remember(
+            archive,
+            {
+                "checker": self.checker,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "sha256": digest,
+                "result": result,
+            },
+        )
+
+    def _remember(self, archive: Path, entry: dict) -> None:
+        with _lock:
+            self._dirty[str(archive)] = entry
+            if self._entries is not None:
+                self._entries[str(archive)] = entry
+
+    def save(self) -> None:
+        """Write new and refreshed entries, merged with what is on disk."""
+        with _lock:
+            if not self._dirty:
+                return
+            entries = self._load()
+            # Drop archives that are gone (a --clean of the output, a rename).
+            entries = {name: entry for name, entry in entries.items() if os.path.exists(name)}
+            entries.update(self._dirty)
+            self._dirty = {}
+            self._entries = entries
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                text = json.dumps(entries, indent=1, sort_keys=True) + "\n"
+                tmp.write_text(text, encoding="utf-8")
+                os.replace(tmp, self.path)
+            except OSError:
+                pass
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Minimal HTTP server for the remote artifact cache.
+
+A reference implementation of the protocol `build.py --remote-cache` speaks,
+meant for trying the remote cache locally and for small setups:
+
+    GET  /<library>/<fingerprint>.tar.gz   200 with the archive, or 404
+    HEAD /<library>/<fingerprint>.tar.gz   200 or 404
+    PUT  /<library>/<fingerprint>.tar.gz   store the request body (201)
+
+Archives are plain files under --root; uploads are written to a temporary
+file and renamed into place, so concurrent agents uploading the same
+fingerprint never expose a partial archive. There is no authentication and
+no eviction: put a real server (nginx with WebDAV PUT, a Bazel HTTP cache)
+in front of shared CI.
+
+Usage:
+    python cache_server.py                           # serve ./cache-server on 127.0.0.1:8765
+    python cache_server.py --root /data/ext-deps     # where archives are stored
+    python cache_server.py --host 0.0.0.0 --port 80  # listen for other agents
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# <library>/<hex fingerprint>.tar.gz; anything else (including "..") is refused.
+ARCHIVE_PATH_RE = re.compile(r"^/([A-Za-z0-9_.+-]+)/([0-9a-f]{16,128})\.tar\.gz$")
+CHUNK_SIZE = 1 << 20
+
+
+class CacheHandler(BaseHTTPRequestHandler):
+    server_version = "ext-deps-cache/1"
+    root: Path
+
+    def _archive(self) -> Path | None:
+        match = ARCHIVE_PATH_RE.match(self.path)
+        if not match or match.group(1) in (".", ".."):
+            self.send_error(HTTPStatus.BAD_REQUEST, "Expected /<library>/<fingerprint>.tar.gz")
+            return None
+        return self.root / match.group(1) / f"{match.group(2)}.tar.gz"
+
+    def _send_headers(self, archive: Path) -> bool:
+        if not archive.is_file():
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return False
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/gzip")
+        self.send_header("Content-Length", str(archive.stat().st_size))
+        self.end_headers()
+        return True
+
+    def do_HEAD(self) -> None:
+        archive = self._archive()
+        if archive is not None:
+            self._send_headers(archive)
+
+    def do_GET(self) -> None:
+        archive = self._archive()
+        if archive is None or not self._send_headers(archive):
+            return
+        with open(archive, "rb") as f:
+            shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+
+    def do_PUT(self) -> None:
+        archive = self._archive()
+        if archive is None:
+            return
+        length = self.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            self.send_error(HTTPStatus.LENGTH_REQUIRED)
+            return
+
+        remaining = int(length)
+        archive.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=".upload.", dir=archive.parent)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while remaining:
+                    chunk = self.rfile.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise ConnectionError("client closed the connection mid-upload")
+                    out.write(chunk)
+                    remaining -= len(chunk)
+            os.replace(tmp_name, archive)
+        except (OSError, ConnectionError):
+            Path(tmp_name).unlink(missing_ok=True)
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR)
+            return
+
+        self.send_response(HTTPStatus.CREATED)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Serve the remote artifact cache over HTTP",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port (default: 8765)")
+    parser.add_argument(
+        "--root",
+        metavar="PATH",
+        default="cache-server",
+        help="Directory holding the archives (default: ./cache-server)",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    root = Path(args.root).expanduser().resolve()
+    root.mkdir(parents=True, exist_ok=True)
+
+    handler = type("Handler", (CacheHandler,), {"root": root})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Serving {root} on http://{args.host}:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
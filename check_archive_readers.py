@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Check the static library readers against a corpus of tiny archives.
+
+builder/coff.py replaces `dumpbin /directives` for the Windows CRT check and
+builder/macho.py replaces `lipo -info` for the macOS architecture check. This
+runs `python -m builder.coff --expect` and `python -m builder.macho --expect`
+on each archive under testdata/archives/ and fails when a verdict or exit
+code is not the expected one.
+
+The COFF archives were assembled with llvm-mc and packed with llvm-lib or
+GNU `ar` (which llvm-lib rejects for non-COFF members):
+
+- md.lib: x86-64 objects asking for MSVCRT, one with a long member name
+  (MSVC long-name table);
+- mixed.lib: one object asking for LIBCMT among MSVCRT ones;
+- arm.lib: an ARM64 object asking for MSVCRTD;
+- imp.lib: an import library (llvm-dlltool), short import members only;
+- ltcg.lib, ltcg3.lib: /GL anonymous objects, the latter with a GNU long name;
+- bigobj.lib: a LIBCMT object rewritten to the /bigobj header layout;
+- text.lib: not an archive.
+
+The Mach-O archives were assembled with llvm-mc and packed with llvm-ar:
+
+- libarm.a: arm64 objects, one with a BSD `#1/` long name;
+- libx86.a: an x86_64 object;
+- libfat.a: a universal file with an x86_64 and an arm64 archive slice;
+- libgnu.a: the libarm.a objects in a GNU-format archive;
+- libmixed.a: arm64 and x86_64 objects in one archive;
+- libempty.a: an archive without members (a warning, not a failure).
+
+Nothing is built or modified.
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.resolve()
+CORPUS_DIR = ROOT_DIR / "testdata" / "archives"
+
+# (reader module, --expect value, archive, exit code, expected output line)
+CASES = (
+    ("builder.coff", "MSVCRT", "coff/md.lib", 0, "OK: md.lib -> MSVCRT"),
+    ("builder.coff", "MSVCRT", "coff/mixed.lib", 1,
+     "FAIL: mixed.lib: found LIBCMT (expected only MSVCRT)"),
+    ("builder.coff", "MSVCRT", "coff/arm.lib", 1,
+     "FAIL: arm.lib: found MSVCRTD (expected only MSVCRT)"),
+    ("builder.coff", "MSVCRT", "coff/imp.lib", 0, "SKIP: imp.lib (no CRT directives found)"),
+    ("builder.coff", "MSVCRT", "coff/ltcg.lib", 1, "FAIL: ltcg.lib: /GL (LTCG) objects: ltcg.obj"),
+    ("builder.coff", "MSVCRT", "coff/ltcg3.lib", 1,
+     "FAIL: ltcg3.lib: /GL (LTCG) objects: averyveryverylongltcg_member_name.obj"),
+    ("builder.coff", "MSVCRT", "coff/bigobj.lib", 1,
+     "FAIL: bigobj.lib: found LIBCMT (expected only MSVCRT)"),
+    ("builder.coff", "MSVCRT", "coff/text.lib", 1, "Error: text.lib: not an ar archive"),
+    ("builder.macho", "arm64", "macho/libarm.a", 0, "OK: libarm.a -> arm64"),
+    ("builder.macho", "arm64", "macho/libfat.a", 0, "OK: libfat.a -> x86_64, arm64"),
+    ("builder.macho", "arm64", "macho/libgnu.a", 0, "OK: libgnu.a -> arm64"),
+    ("builder.macho", "arm64", "macho/libmixed.a", 1,
+     "FAIL: libmixed.a: found arm64, x86_64 (expected arm64)"),
+    ("builder.macho", "arm64", "macho/libx86.a", 1, "FAIL: libx86.a: found x86_64 (expected arm64)"),
+    ("builder.macho", "arm64", "macho/libempty.a", 0,
+     "Warning: libempty.a: no Mach-O objects found"),
+)
+
+
+def run_case(module: str, expect: str, archive: str) -> tuple[int, list[str]]:
+    """(exit code, output lines) of the reader's CLI on one archive."""
+    result = subprocess.run(
+        [sys.executable, "-m", module, "--expect", expect, str(CORPUS_DIR / archive)],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    lines = [line.strip() for line in (result.stdout + result.stderr).splitlines()]
+    return result.returncode, [line for line in lines if line]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Show the reader's output for every archive",
+    )
+    args = parser.parse_args()
+
+    failures = []
+    for module, expect, archive, want_code, want_line in CASES:
+        code, lines = run_case(module, expect, archive)
+        ok = code == want_code and want_line in lines
+        print(f"{'ok' if ok else 'FAIL':<5} {module:<14} {archive}")
+        if args.verbose or not ok:
+            for line in lines:
+                print(f"        {line}")
+        if not ok:
+            failures.append(
+                f"{archive}: expected exit code {want_code} and '{want_line}', got exit code {code}"
+            )
+
+    if failures:
+        print(file=sys.stderr)
+        for failure in failures:
+            print(f"Error: {failure}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
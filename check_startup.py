@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Startup budget check for build.py's informational commands.
+
+CI planning runs `build.py --list` and `--dry-run` for every configuration, so
+they must not pay for the builders, the artifact cache or the history database.
+This runs each command under `python -X importtime` and fails when:
+
+- the median total import time exceeds the budget (--budget-ms), or
+- a module that only a real build needs is imported.
+
+`--clean` deletes directories, so it is measured as `import build` (everything
+it loads before it starts deleting).
+
+Nothing is built or modified, apart from the registry index under builds/ that
+the first (unmeasured) `--list` run may write.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.resolve()
+
+# Modules the informational commands must not import.
+BUILD_ONLY_MODULES = (
+    "build_cef",
+    "builder.artifact_cache",
+    "builder.autotools_builder",
+    "builder.cmake_builder",
+    "builder.fingerprint",
+    "builder.history",
+    "builder.meson_builder",
+    "builder.msys2_builder",
+    "builder.scheduler",
+    "sqlite3",
+    "urllib.request",
+    # Not needed either once the registry index is current.
+    "yaml",
+)
+
+
+def commands() -> list[tuple[str, list[str]]]:
+    """(label, python arguments) of each measured command."""
+    extra = ["--macos-sdk", "12.0"] if sys.platform == "darwin" else []
+    return [
+        ("--list", ["build.py", "--list", *extra]),
+        ("--dry-run", ["build.py", "--dry-run", *extra]),
+        ("--clean", ["-c", "import build"]),
+    ]
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int, int]]:
+    """(module, self us, cumulative us, nesting depth) from `-X importtime` output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        name = fields[2]
+        # Nested imports are indented by two more spaces per level.
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        modules.append((name.strip(), int(fields[0]), int(fields[1]), depth))
+    return modules
+
+
+def measure(args: list[str]) -> tuple[float, float, str]:
+    """(import ms, wall ms, stderr) of one run of `python -X importtime <args>`."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    wall = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        errors = [l for l in result.stderr.splitlines() if not l.startswith("import time:")]
+        raise RuntimeError("\n".join(errors) or f"exit code {result.returncode}")
+    total = sum(cumulative for _, _, cumulative, depth in parse_importtime(result.stderr) if depth == 0)
+    return total / 1000, wall, result.stderr
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=100.0,
+        help="Maximum median import time per command in milliseconds (default: 100)",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=5,
+        help="Measured runs per command (default: 5)",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Also show the N slowest imports of each command",
+    )
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'Command':<12} {'Imports':>10} {'Wall':>10}  Budget {args.budget_ms:.0f} ms")
+    for label, cmd in commands():
+        try:
+            measure(cmd)  # warm-up: bytecode and registry index
+            runs = [measure(cmd) for _ in range(max(args.runs, 1))]
+        except RuntimeError as e:
+            failures.append(f"{label} failed:\n{e}")
+            continue
+        import_ms = statistics.median(r[0] for r in runs)
+        wall_ms = statistics.median(r[1] for r in runs)
+        modules = parse_importtime(runs[-1][2])
+        imported = {name for name, _, _, _ in modules}
+        unwanted = [name for name in BUILD_ONLY_MODULES if name in imported]
+
+        status = "ok"
+        if import_ms > args.budget_ms:
+            status = "OVER BUDGET"
+            failures.append(f"{label}: {import_ms:.1f} ms of imports (budget {args.budget_ms:.0f} ms)")
+        if unwanted:
+            status = "UNWANTED IMPORTS"
+            failures.append(f"{label} imports {', '.join(unwanted)}")
+        print(f"{label:<12} {import_ms:>7.1f} ms {wall_ms:>7.1f} ms  {status}")
+
+        if args.top:
+            slowest = sorted(modules, key=lambda module: module[1], reverse=True)
+            for name, own, _, _ in slowest[: args.top]:
+                print(f"    {own / 1000:>7.1f} ms  {name}")
+
+    if failures:
+        print(file=sys.stderr)
+        for failure in failures:
+            print(f"Error: {failure}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())